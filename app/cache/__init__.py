@@ -0,0 +1 @@
+# app/cache/__init__.py
@@ -0,0 +1,114 @@
+# cache/datos_fijos.py
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from sqlalchemy.orm import Session
+from models import models
+from config.config import settings
+from core.metrics import registrar_cache
+
+@dataclass(frozen=True)
+class DatosFijosSnapshot:
+    """Copia inmutable del registro de datos fijos, segura entre peticiones"""
+    id: int
+    version: int
+    texto_aqc: Optional[str]
+    texto_remitente: Optional[str]
+    texto_apeticion: Optional[str]
+    texto_atte: Optional[str]
+    texto_sursum: Optional[str]
+    texto_nombrefirma: Optional[str]
+    texto_cargo: Optional[str]
+    texto_msgdigital: Optional[str]
+    texto_ccp: Optional[str]
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+def calcular_version(created_at: Optional[datetime], updated_at: Optional[datetime]) -> int:
+    """
+    La versión se deriva de la última modificación del registro (en milisegundos),
+    así todos los workers obtienen el mismo número para el mismo contenido.
+    """
+    marca = updated_at or created_at
+    return int(marca.timestamp() * 1000) if marca else 0
+
+class DatosFijosCache:
+    """
+    Cache en memoria del registro único de datos fijos.
+    Se refresca al escribir desde los endpoints de datos fijos; además, pasado
+    el intervalo de revalidación se compara updated_at con la base de datos
+    para detectar cambios hechos por otros workers.
+    """
+
+    def __init__(self, intervalo_revalidacion: float):
+        self.intervalo_revalidacion = intervalo_revalidacion
+        self._lock = threading.Lock()
+        self._snapshot: Optional[DatosFijosSnapshot] = None
+        self._marca = None
+        self._revalidado = 0.0
+
+    @property
+    def version(self) -> int:
+        snapshot = self._snapshot
+        return snapshot.version if snapshot else 0
+
+    def actualizar(self, datos_fijos: Optional[models.DatosFijos]) -> Optional[DatosFijosSnapshot]:
+        """Reemplaza el contenido con el registro recién escrito (o None si no existe)"""
+        if datos_fijos is None:
+            snapshot, marca = None, None
+        else:
+            version = calcular_version(datos_fijos.created_at, datos_fijos.updated_at)
+            snapshot = DatosFijosSnapshot(
+                id=datos_fijos.id,
+                version=version,
+                texto_aqc=datos_fijos.texto_aqc,
+                texto_remitente=datos_fijos.texto_remitente,
+                texto_apeticion=datos_fijos.texto_apeticion,
+                texto_atte=datos_fijos.texto_atte,
+                texto_sursum=datos_fijos.texto_sursum,
+                texto_nombrefirma=datos_fijos.texto_nombrefirma,
+                texto_cargo=datos_fijos.texto_cargo,
+                texto_msgdigital=datos_fijos.texto_msgdigital,
+                texto_ccp=datos_fijos.texto_ccp,
+                created_at=datos_fijos.created_at,
+                updated_at=datos_fijos.updated_at
+            )
+            marca = (datos_fijos.id, version)
+
+        with self._lock:
+            self._snapshot = snapshot
+            self._marca = marca
+            self._revalidado = time.monotonic()
+        return snapshot
+
+    def obtener(self, db: Session) -> Optional[DatosFijosSnapshot]:
+        """Retorna los datos fijos vigentes, revalidando contra la BD si hace falta"""
+        with self._lock:
+            if self._marca is not None and time.monotonic() - self._revalidado < self.intervalo_revalidacion:
+                registrar_cache("datos_fijos", True)
+                return self._snapshot
+
+        # Consulta ligera: solo id y fechas para saber si cambió
+        fila = db.query(
+            models.DatosFijos.id,
+            models.DatosFijos.created_at,
+            models.DatosFijos.updated_at
+        ).order_by(models.DatosFijos.id).first()
+
+        if fila is None:
+            return self.actualizar(None)
+
+        marca = (fila.id, calcular_version(fila.created_at, fila.updated_at))
+        with self._lock:
+            if marca == self._marca:
+                self._revalidado = time.monotonic()
+                registrar_cache("datos_fijos", True)
+                return self._snapshot
+
+        registrar_cache("datos_fijos", False)
+        datos_fijos = db.query(models.DatosFijos).filter(models.DatosFijos.id == fila.id).first()
+        return self.actualizar(datos_fijos)
+
+datos_fijos_cache = DatosFijosCache(intervalo_revalidacion=settings.DATOS_FIJOS_REVALIDACION)
@@ -0,0 +1,103 @@
+# cache/edicion_actual.py
+import threading
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from models import models
+from config.config import settings
+from core.metrics import registrar_cache
+
+def _siguiente_cambio(ediciones: List[models.Edicion], hoy: date) -> Optional[date]:
+    """
+    Primer día posterior a hoy en el que alguna edición activa empieza o termina.
+    Hasta ese día la edición actual y su estado no pueden cambiar por fechas.
+    """
+    fechas = []
+    for edicion in ediciones:
+        if edicion.fecha_inicio > hoy:
+            fechas.append(edicion.fecha_inicio)
+        if edicion.fecha_fin >= hoy:
+            fechas.append(edicion.fecha_fin + timedelta(days=1))
+    return min(fechas) if fechas else None
+
+class EdicionActualCache:
+    """
+    Guarda en memoria la edición actual ya resuelta.
+    Expira en el siguiente cambio de fecha de alguna edición, al invalidarse
+    desde los endpoints de escritura de periodos, o al cumplirse el TTL máximo
+    (que acota la desactualización entre distintos workers).
+    """
+
+    def __init__(self, ttl_maximo: int):
+        self.ttl_maximo = ttl_maximo
+        self._lock = threading.Lock()
+        self._generacion = 0
+        self._cargado = False
+        self._valor: Optional[Dict] = None
+        self._vigente_hasta: Optional[date] = None
+        self._expira = 0.0
+
+    def invalidar(self) -> None:
+        with self._lock:
+            self._generacion += 1
+            self._cargado = False
+
+    def _vigente(self, hoy: date, ahora: float) -> bool:
+        if not self._cargado or ahora >= self._expira:
+            return False
+        return self._vigente_hasta is None or hoy < self._vigente_hasta
+
+    def obtener(self, db: Session) -> Optional[Dict]:
+        """Retorna la edición actual (o None si no hay ninguna activa)"""
+        hoy = date.today()
+        with self._lock:
+            if self._vigente(hoy, time.monotonic()):
+                registrar_cache("edicion_actual", True)
+                return self._valor
+            generacion = self._generacion
+
+        registrar_cache("edicion_actual", False)
+
+        valor, vigente_hasta = self._resolver(db, hoy)
+
+        with self._lock:
+            # Si se invalidó mientras consultábamos, no guardar un valor viejo
+            if generacion == self._generacion:
+                self._valor = valor
+                self._vigente_hasta = vigente_hasta
+                self._expira = time.monotonic() + self.ttl_maximo
+                self._cargado = True
+        return valor
+
+    def _resolver(self, db: Session, hoy: date):
+        # Las ediciones activas son pocas: una sola consulta y se elige aquí
+        ediciones = db.query(models.Edicion).filter(
+            models.Edicion.activa == True
+        ).order_by(models.Edicion.id).all()
+
+        vigente_hasta = _siguiente_cambio(ediciones, hoy)
+
+        edicion_actual = next(
+            (e for e in ediciones if e.fecha_inicio <= hoy <= e.fecha_fin),
+            None
+        )
+        if edicion_actual is None and ediciones:
+            # Si no hay edición en curso, usar la más reciente activa
+            edicion_actual = max(ediciones, key=lambda e: e.fecha_inicio)
+
+        if edicion_actual is None:
+            return None, vigente_hasta
+
+        return {
+            "id": edicion_actual.id,
+            "nombre": edicion_actual.nombre,
+            "periodo1": edicion_actual.periodo1,
+            "periodo2": edicion_actual.periodo2,
+            "estado": models.estado_por_fechas(edicion_actual.fecha_inicio, edicion_actual.fecha_fin, hoy),
+            "fecha_inicio": str(edicion_actual.fecha_inicio) if edicion_actual.fecha_inicio else None,
+            "fecha_fin": str(edicion_actual.fecha_fin) if edicion_actual.fecha_fin else None,
+            "activa": edicion_actual.activa
+        }, vigente_hasta
+
+edicion_actual_cache = EdicionActualCache(ttl_maximo=settings.EDICION_ACTUAL_CACHE_TTL)
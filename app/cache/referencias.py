@@ -0,0 +1,191 @@
+# cache/referencias.py
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Dict, List, Optional
+from fastapi import Request
+from sqlalchemy.orm import Session
+from models import models
+from config.config import settings
+from core.metrics import registrar_cache
+
+@dataclass(frozen=True)
+class CategoriaRef:
+    id: int
+    codigo_categoria: str
+    nombre: str
+    asunto: str
+    descripcion: Optional[str]
+    activo: bool
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+@dataclass(frozen=True)
+class EdicionRef:
+    id: int
+    nombre: str
+    periodo1: str
+    periodo2: str
+    fecha_inicio: date
+    fecha_fin: date
+    activa: bool
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    @property
+    def estado(self) -> str:
+        """Estado según las fechas, calculado en cada lectura"""
+        return models.estado_por_fechas(self.fecha_inicio, self.fecha_fin)
+
+def _categoria_ref(c: models.Categoria) -> CategoriaRef:
+    return CategoriaRef(
+        id=c.id,
+        codigo_categoria=c.codigo_categoria,
+        nombre=c.nombre,
+        asunto=c.asunto,
+        descripcion=c.descripcion,
+        activo=c.activo,
+        created_at=c.created_at,
+        updated_at=c.updated_at
+    )
+
+def _edicion_ref(e: models.Edicion) -> EdicionRef:
+    return EdicionRef(
+        id=e.id,
+        nombre=e.nombre,
+        periodo1=e.periodo1,
+        periodo2=e.periodo2,
+        fecha_inicio=e.fecha_inicio,
+        fecha_fin=e.fecha_fin,
+        activa=e.activa,
+        created_at=e.created_at,
+        updated_at=e.updated_at
+    )
+
+def _firma(filas) -> str:
+    """Huella del contenido: igual en todos los workers para los mismos datos"""
+    h = hashlib.sha1()
+    for fila in filas:
+        marca = fila.updated_at or fila.created_at
+        h.update(f"{fila.id}:{marca.isoformat() if marca else ''};".encode())
+    return h.hexdigest()[:16]
+
+class _Tabla:
+    """Filas de una tabla de referencia indexadas por id y por código"""
+
+    def __init__(self, filas: List, campo_codigo: Optional[str] = None):
+        self.filas = sorted(filas, key=lambda f: f.id)
+        self.por_id = {f.id: f for f in self.filas}
+        self.por_codigo = {getattr(f, campo_codigo): f for f in self.filas} if campo_codigo else {}
+        self.firma = _firma(self.filas)
+        self.cargada = time.monotonic()
+
+class ReferenciasCache:
+    """
+    Cache en memoria de los datos de referencia (categorías y ediciones).
+    La usan tanto los endpoints de lectura como la validación al crear
+    solicitudes. Se invalida desde los endpoints de escritura de categorías y
+    periodos; el TTL acota la desactualización entre distintos workers.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._tablas: Dict[str, _Tabla] = {}
+        self._generaciones: Dict[str, int] = {"categorias": 0, "ediciones": 0}
+
+    def invalidar_categorias(self) -> None:
+        self._invalidar("categorias")
+
+    def invalidar_ediciones(self) -> None:
+        self._invalidar("ediciones")
+
+    def _invalidar(self, nombre: str) -> None:
+        with self._lock:
+            self._generaciones[nombre] += 1
+            self._tablas.pop(nombre, None)
+
+    def _tabla(self, db: Session, nombre: str) -> _Tabla:
+        with self._lock:
+            tabla = self._tablas.get(nombre)
+            if tabla is not None and time.monotonic() - tabla.cargada < self.ttl:
+                registrar_cache(nombre, True)
+                return tabla
+            generacion = self._generaciones[nombre]
+
+        registrar_cache(nombre, False)
+
+        if nombre == "categorias":
+            tabla = _Tabla([
+                _categoria_ref(c) for c in db.query(models.Categoria).all()
+            ], campo_codigo="codigo_categoria")
+        else:
+            tabla = _Tabla([
+                _edicion_ref(e) for e in db.query(models.Edicion).all()
+            ])
+
+        with self._lock:
+            # Si se invalidó mientras consultábamos, esta copia ya puede ser vieja
+            if generacion == self._generaciones[nombre]:
+                self._tablas[nombre] = tabla
+        return tabla
+
+    def _buscar(self, db: Session, nombre: str, condicion):
+        """
+        Consulta de una fila cuando no está en la tabla en memoria: pudo
+        crearse en otro worker, cuya invalidación no llega a este. Si existe,
+        se descarta la tabla para que la siguiente lectura la recargue.
+        """
+        modelo, a_ref = (models.Categoria, _categoria_ref) if nombre == "categorias" else (models.Edicion, _edicion_ref)
+        fila = db.query(modelo).filter(condicion).first()
+        if fila is None:
+            return None
+        self._invalidar(nombre)
+        return a_ref(fila)
+
+    # Categorías
+    def categorias(self, db: Session) -> List[CategoriaRef]:
+        return self._tabla(db, "categorias").filas
+
+    def categoria(self, db: Session, categoria_id: int) -> Optional[CategoriaRef]:
+        categoria = self._tabla(db, "categorias").por_id.get(categoria_id)
+        if categoria is None:
+            categoria = self._buscar(db, "categorias", models.Categoria.id == categoria_id)
+        return categoria
+
+    def categoria_por_codigo(self, db: Session, codigo: str) -> Optional[CategoriaRef]:
+        categoria = self._tabla(db, "categorias").por_codigo.get(codigo)
+        if categoria is None:
+            categoria = self._buscar(db, "categorias", models.Categoria.codigo_categoria == codigo)
+        return categoria
+
+    def firma_categorias(self, db: Session) -> str:
+        return self._tabla(db, "categorias").firma
+
+    # Ediciones
+    def ediciones(self, db: Session) -> List[EdicionRef]:
+        return self._tabla(db, "ediciones").filas
+
+    def edicion(self, db: Session, edicion_id: int) -> Optional[EdicionRef]:
+        edicion = self._tabla(db, "ediciones").por_id.get(edicion_id)
+        if edicion is None:
+            edicion = self._buscar(db, "ediciones", models.Edicion.id == edicion_id)
+        return edicion
+
+    def firma_ediciones(self, db: Session) -> str:
+        return self._tabla(db, "ediciones").firma
+
+def generar_etag(*partes) -> str:
+    return '"' + hashlib.sha1(":".join(str(p) for p in partes).encode()).hexdigest()[:20] + '"'
+
+def etag_coincide(request: Request, etag: str) -> bool:
+    """Verifica el encabezado If-None-Match contra el ETag calculado"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    etiquetas = [e.strip().removeprefix("W/") for e in if_none_match.split(",")]
+    return etag in etiquetas or "*" in etiquetas
+
+referencias_cache = ReferenciasCache(ttl=settings.REFERENCIAS_CACHE_TTL)
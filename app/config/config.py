@@ -27,6 +27,87 @@ class Settings:
     DIRECTOR_NAME = "DR. RODY ABRAHAM SOTO ROJO"
     DIRECTOR_TITLE = "DIRECTOR"
     
+    # Prefijo del sub de usuarios importados desde el padrón, se reemplaza
+    # por el sub de Google en su primer inicio de sesión
+    ROSTER_SUB_PREFIX = "roster:"
+    
+    # Segundos máximos que un worker conserva la edición actual en memoria
+    EDICION_ACTUAL_CACHE_TTL = int(os.getenv("EDICION_ACTUAL_CACHE_TTL", "300"))
+    
+    # Segundos entre revalidaciones de los datos fijos contra la base de datos
+    DATOS_FIJOS_REVALIDACION = float(os.getenv("DATOS_FIJOS_REVALIDACION", "5"))
+    
+    # Segundos máximos que un worker conserva categorías y ediciones en memoria
+    REFERENCIAS_CACHE_TTL = int(os.getenv("REFERENCIAS_CACHE_TTL", "60"))
+    
+    # Autenticación: tamaño de la cache de tokens verificados y segundos que
+    # se conservan los datos de un usuario antes de volver a consultarlo
+    AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+    AUTH_USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL", "30"))
+    
+    # Control de admisión de la generación de PDFs (por worker): renders
+    # simultáneos, solicitudes que pueden esperar turno y segundos de espera
+    RENDER_MAX_CONCURRENTES = int(os.getenv("RENDER_MAX_CONCURRENTES", str(os.cpu_count() or 2)))
+    RENDER_MAX_EN_COLA = int(os.getenv("RENDER_MAX_EN_COLA", "20"))
+    RENDER_TIMEOUT_COLA = float(os.getenv("RENDER_TIMEOUT_COLA", "10"))
+    
+    # Perfilado: porcentaje de solicitudes que se perfilan con el perfilador
+    # estadístico (0 = ninguna), directorio donde se guardan sus pilas y
+    # segundos entre muestras
+    PERFIL_PORCENTAJE = float(os.getenv("PERFIL_PORCENTAJE", "0"))
+    PERFIL_DIR = os.getenv("PERFIL_DIR", "perfiles")
+    PERFIL_INTERVALO_MUESTREO = float(os.getenv("PERFIL_INTERVALO_MUESTREO", "0.005"))
+    
+    # Logging: nivel general, niveles por módulo ("modulo=NIVEL,..."),
+    # tamaño de la cola (los registros que no caben se descartan) y
+    # fracción de registros DEBUG que se conservan
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+    LOG_COLA_MAX = int(os.getenv("LOG_COLA_MAX", "10000"))
+    LOG_MUESTREO_DEBUG = float(os.getenv("LOG_MUESTREO_DEBUG", "0.1"))
+    
+    # Consultas lentas: umbral en milisegundos, entradas que se conservan en
+    # memoria y log rotativo (tamaño máximo por archivo y respaldos)
+    CONSULTAS_LENTAS_UMBRAL_MS = float(os.getenv("CONSULTAS_LENTAS_UMBRAL_MS", "200"))
+    CONSULTAS_LENTAS_MAX = int(os.getenv("CONSULTAS_LENTAS_MAX", "500"))
+    # Cada worker escribe su propio archivo: el pid se agrega antes de la extensión
+    CONSULTAS_LENTAS_LOG = os.getenv("CONSULTAS_LENTAS_LOG", "logs/consultas_lentas.log")
+    CONSULTAS_LENTAS_LOG_BYTES = int(os.getenv("CONSULTAS_LENTAS_LOG_BYTES", str(10 * 1024 * 1024)))
+    CONSULTAS_LENTAS_LOG_RESPALDOS = int(os.getenv("CONSULTAS_LENTAS_LOG_RESPALDOS", "5"))
+    
+    # Trabajos de generación en segundo plano: hilos por worker, segundos
+    # entre revisiones de la cola, intentos por constancia, segundos tras los
+    # que una constancia en proceso se considera abandonada y directorio de
+    # los PDFs generados
+    TRABAJOS_HILOS = int(os.getenv("TRABAJOS_HILOS", "2"))
+    TRABAJOS_INTERVALO = float(os.getenv("TRABAJOS_INTERVALO", "2"))
+    TRABAJOS_MAX_INTENTOS = int(os.getenv("TRABAJOS_MAX_INTENTOS", "3"))
+    TRABAJOS_ITEM_TIMEOUT = int(os.getenv("TRABAJOS_ITEM_TIMEOUT", "300"))
+    TRABAJOS_DIR = os.getenv("TRABAJOS_DIR", f"{CONSTANCIAS_DIR}/trabajos")
+    
+    # Progreso de trabajos por Server-Sent Events: segundos entre eventos y
+    # segundos sin cambios tras los que se envía un comentario de latido
+    TRABAJOS_EVENTOS_INTERVALO = float(os.getenv("TRABAJOS_EVENTOS_INTERVALO", "1"))
+    TRABAJOS_EVENTOS_LATIDO = float(os.getenv("TRABAJOS_EVENTOS_LATIDO", "15"))
+    
+    # Pre-generar en segundo plano la constancia de cada solicitud que pasa
+    # a aceptado; la primera descarga se sirve desde ese PDF
+    PRERENDER_ACEPTADAS = os.getenv("PRERENDER_ACEPTADAS", "false").lower() in ("1", "true", "si", "sí")
+    
+    # Programador de tareas de mantenimiento (sincronizar el estado de las
+    # ediciones, limpiar temporales y calentar caches): si se inicia y
+    # segundos entre ejecuciones de cada tarea
+    PROGRAMADOR_ACTIVO = os.getenv("PROGRAMADOR_ACTIVO", "true").lower() in ("1", "true", "si", "sí")
+    PROGRAMADOR_EDICIONES_INTERVALO = float(os.getenv("PROGRAMADOR_EDICIONES_INTERVALO", "600"))
+    PROGRAMADOR_LIMPIEZA_INTERVALO = float(os.getenv("PROGRAMADOR_LIMPIEZA_INTERVALO", "3600"))
+    PROGRAMADOR_CACHES_INTERVALO = float(os.getenv("PROGRAMADOR_CACHES_INTERVALO", "60"))
+    
+    # Antigüedad a partir de la cual se eliminan los PDFs y QRs que no
+    # pertenecen a ninguna constancia registrada y los archivos subidos, y
+    # días que se conservan los PDFs de los trabajos
+    TEMPORALES_MAX_HORAS = float(os.getenv("TEMPORALES_MAX_HORAS", "24"))
+    TRABAJOS_RETENCION_DIAS = float(os.getenv("TRABAJOS_RETENCION_DIAS", "7"))
+    
     # URL base para validación
     VALIDATION_BASE_URL = "http://localhost:8080/validacion/"
     
@@ -0,0 +1,115 @@
+# core/admission.py
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict
+from fastapi import HTTPException
+from config.config import settings
+from core.metrics import render_en_cola, render_en_curso, render_espera, render_rechazos
+
+class LimitadorRender:
+    """
+    Control de admisión para la generación de PDFs dentro de un worker.
+    Permite max_concurrentes renders a la vez y hasta max_en_cola solicitudes
+    esperando turno, cada una como máximo timeout_cola segundos. Lo que no
+    cabe se rechaza de inmediato con 503 y Retry-After, para que el resto de
+    los endpoints no se queden sin CPU.
+    """
+
+    def __init__(self, max_concurrentes: int, max_en_cola: int, timeout_cola: float):
+        self.max_concurrentes = max_concurrentes
+        self.max_en_cola = max_en_cola
+        self.timeout_cola = timeout_cola
+        self._semaforo = asyncio.Semaphore(max_concurrentes)
+        self.en_curso = 0
+        self.en_cola = 0
+        # Métricas acumuladas desde el arranque del worker
+        self.admitidas = 0
+        self.rechazadas_cola_llena = 0
+        self.rechazadas_timeout = 0
+        self.espera_total = 0.0
+        self.espera_maxima = 0.0
+        self.cola_maxima = 0
+        # Promedio móvil de la duración de un render, para estimar Retry-After
+        self.duracion_promedio = 1.0
+
+    def _retry_after(self) -> str:
+        rondas = (self.en_cola + 1) / self.max_concurrentes
+        return str(max(1, math.ceil(self.duracion_promedio * rondas)))
+
+    def _rechazar(self, detalle: str):
+        raise HTTPException(
+            status_code=503,
+            detail=detalle,
+            headers={"Retry-After": self._retry_after()}
+        )
+
+    @asynccontextmanager
+    async def turno(self, tiempos=None):
+        """
+        Espera un lugar para renderizar o rechaza con 503.
+        Si se pasa un TiemposServidor, la espera se registra como etapa "cola".
+        """
+        if self._semaforo.locked() and self.en_cola >= self.max_en_cola:
+            self.rechazadas_cola_llena += 1
+            render_rechazos.labels("cola_llena").inc()
+            self._rechazar("Servidor ocupado generando constancias, intente de nuevo en unos segundos")
+
+        self.en_cola += 1
+        render_en_cola.inc()
+        self.cola_maxima = max(self.cola_maxima, self.en_cola)
+        inicio = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaforo.acquire(), timeout=self.timeout_cola)
+        except asyncio.TimeoutError:
+            self.rechazadas_timeout += 1
+            render_rechazos.labels("timeout").inc()
+            self._rechazar("Tiempo de espera agotado en la cola de generación de constancias")
+        finally:
+            self.en_cola -= 1
+            render_en_cola.dec()
+            espera = time.perf_counter() - inicio
+            render_espera.observe(espera)
+            if tiempos is not None:
+                tiempos.agregar("cola", espera)
+            self.espera_total += espera
+            self.espera_maxima = max(self.espera_maxima, espera)
+
+        self.admitidas += 1
+        self.en_curso += 1
+        render_en_curso.inc()
+        inicio_render = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.en_curso -= 1
+            render_en_curso.dec()
+            self._semaforo.release()
+            duracion = time.perf_counter() - inicio_render
+            self.duracion_promedio = 0.8 * self.duracion_promedio + 0.2 * duracion
+
+    def estadisticas(self) -> Dict:
+        esperas = self.admitidas + self.rechazadas_timeout
+        return {
+            "max_concurrentes": self.max_concurrentes,
+            "max_en_cola": self.max_en_cola,
+            "timeout_cola": self.timeout_cola,
+            "en_curso": self.en_curso,
+            "en_cola": self.en_cola,
+            "cola_maxima": self.cola_maxima,
+            "admitidas": self.admitidas,
+            "rechazadas_cola_llena": self.rechazadas_cola_llena,
+            "rechazadas_timeout": self.rechazadas_timeout,
+            "espera_promedio_ms": round(self.espera_total / esperas * 1000, 2) if esperas else 0.0,
+            "espera_maxima_ms": round(self.espera_maxima * 1000, 2),
+            "duracion_render_promedio_ms": round(self.duracion_promedio * 1000, 2),
+            "pid": os.getpid()
+        }
+
+limitador_render = LimitadorRender(
+    max_concurrentes=settings.RENDER_MAX_CONCURRENTES,
+    max_en_cola=settings.RENDER_MAX_EN_COLA,
+    timeout_cola=settings.RENDER_TIMEOUT_COLA
+)
@@ -0,0 +1,174 @@
+# core/auth.py
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+import jwt
+from dotenv import load_dotenv
+from fastapi import Depends, Header, HTTPException
+from sqlalchemy.orm import Session
+from database.database import get_db
+from models import models
+from config.config import settings
+from core.metrics import registrar_cache
+
+load_dotenv()
+SECRET_KEY = os.getenv("SECRET_KEY")
+ALGORITHM = "HS256"
+
+class CacheLRU:
+    """Diccionario acotado con desalojo LRU y expiración opcional por entrada"""
+
+    def __init__(self, maximo: int, ttl: Optional[float] = None):
+        self.maximo = maximo
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._datos: "OrderedDict[object, tuple]" = OrderedDict()
+
+    def obtener(self, llave):
+        with self._lock:
+            entrada = self._datos.get(llave)
+            if entrada is None:
+                return None
+            valor, expira = entrada
+            if expira is not None and time.monotonic() >= expira:
+                del self._datos[llave]
+                return None
+            self._datos.move_to_end(llave)
+            return valor
+
+    def guardar(self, llave, valor) -> None:
+        expira = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._datos[llave] = (valor, expira)
+            self._datos.move_to_end(llave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+
+    def eliminar(self, llave) -> None:
+        with self._lock:
+            self._datos.pop(llave, None)
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._datos.clear()
+
+# Tokens ya verificados, por hash del token (nunca se guarda el token en claro)
+tokens_cache = CacheLRU(maximo=settings.AUTH_TOKEN_CACHE_SIZE)
+# Datos mínimos del usuario, con TTL corto para acotar cambios hechos en otros workers
+usuarios_cache = CacheLRU(maximo=settings.AUTH_TOKEN_CACHE_SIZE, ttl=settings.AUTH_USER_CACHE_TTL)
+
+def invalidar_usuario(user_id: int) -> None:
+    """Descartar el usuario en memoria después de modificarlo"""
+    usuarios_cache.eliminar(user_id)
+
+def invalidar_usuarios() -> None:
+    """Descartar todos los usuarios en memoria (por ejemplo, tras una importación)"""
+    usuarios_cache.limpiar()
+
+def decodificar_token(authorization: str) -> Dict:
+    """
+    Extrae y valida el access token del header Authorization.
+    Retorna el payload del token; los tokens válidos se guardan en cache.
+    """
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Authorization header missing")
+
+    # Extraer el token (formato: "Bearer <token>")
+    try:
+        scheme, token = authorization.split(' ', 1)
+        if scheme.lower() != "bearer":
+            raise HTTPException(status_code=401, detail="Invalid authentication scheme")
+    except ValueError:
+        raise HTTPException(status_code=401, detail="Invalid authorization header format")
+
+    llave = hashlib.sha256(token.encode()).digest()
+    payload = tokens_cache.obtener(llave)
+    registrar_cache("tokens", payload is not None)
+
+    if payload is not None:
+        # Los tokens actuales no expiran, pero se respeta exp si lo traen
+        if "exp" in payload and payload["exp"] <= time.time():
+            tokens_cache.eliminar(llave)
+            raise HTTPException(status_code=401, detail="Access token expired")
+        return payload
+
+    # Decodificar el token
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Access token expired")
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid access token")
+
+    # Verificar que es un access token
+    if payload.get("type") != "access":
+        raise HTTPException(status_code=401, detail="Invalid token type")
+
+    if not payload.get("user_id"):
+        raise HTTPException(status_code=401, detail="Invalid token payload")
+
+    tokens_cache.guardar(llave, payload)
+    return payload
+
+def obtener_usuario(db: Session, user_id: int) -> Dict:
+    """Datos del usuario desde la cache o, si no están, desde la base de datos"""
+    usuario = usuarios_cache.obtener(user_id)
+    registrar_cache("usuarios", usuario is not None)
+    if usuario is not None:
+        return usuario
+
+    user = db.query(models.User).filter(models.User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    usuario = {
+        "user_id": user.id,
+        "admin": user.admin,
+        "sub": user.sub,
+        "email": user.email,
+        "nombre": user.nombre,
+        "genero": user.genero,
+        "tipo_empleado": user.tipo_empleado
+    }
+    usuarios_cache.guardar(user_id, usuario)
+    return usuario
+
+def resolver_usuario(authorization: str, db: Session) -> Dict:
+    """Valida el header Authorization y retorna los datos del usuario autenticado"""
+    payload = decodificar_token(authorization)
+    return obtener_usuario(db, payload["user_id"])
+
+# Función auxiliar para extraer y validar el token
+def get_current_user_id(authorization: str = Header(..., alias="Authorization")) -> int:
+    """
+    Extrae y valida el token de autorización, devuelve el user_id
+    """
+    return decodificar_token(authorization)["user_id"]
+
+async def get_current_user(
+    authorization: str = Header(..., alias="Authorization"),
+    db: Session = Depends(get_db)
+) -> Dict:
+    """
+    Extrae y valida el access token del header Authorization.
+    Retorna los datos del usuario autenticado.
+    """
+    try:
+        return resolver_usuario(authorization, db)
+    except HTTPException:
+        raise  # Re-lanzar HTTPExceptions
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+# FUNCIÓN PARA VERIFICAR PERMISOS DE ADMINISTRADOR
+async def get_admin_user(current_user: Dict = Depends(get_current_user)) -> Dict:
+    """
+    Verifica que el usuario actual sea administrador.
+    Basado en el campo 'admin' del usuario autenticado.
+    """
+    if not current_user.get("admin", False):
+        raise HTTPException(status_code=403, detail="Se requieren permisos de administrador para esta operación")
+    return current_user
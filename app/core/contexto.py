@@ -0,0 +1,70 @@
+# core/contexto.py
+import re
+import uuid
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+@dataclass
+class ContextoSolicitud:
+    """Datos de la solicitud en curso, visibles desde logs y hooks de la BD"""
+    request_id: str
+    scope: dict
+
+    @property
+    def ruta(self) -> Optional[str]:
+        # El router agrega la ruta al mismo scope después de entrar al middleware
+        ruta = self.scope.get("route")
+        return getattr(ruta, "path", None) or self.scope.get("path")
+
+    @property
+    def metodo(self) -> Optional[str]:
+        return self.scope.get("method")
+
+solicitud_actual: ContextVar[Optional[ContextoSolicitud]] = ContextVar("solicitud_actual", default=None)
+
+# Solo se acepta un X-Request-ID entrante con forma razonable
+PATRON_REQUEST_ID = re.compile(r"^[A-Za-z0-9._\-]{1,64}$")
+
+def contexto_actual() -> Optional[ContextoSolicitud]:
+    return solicitud_actual.get()
+
+def request_id_actual() -> Optional[str]:
+    contexto = solicitud_actual.get()
+    return contexto.request_id if contexto else None
+
+class ContextoSolicitudMiddleware:
+    """
+    Middleware ASGI que asigna un request id a cada solicitud (o respeta el
+    X-Request-ID que venga del proxy), lo deja en una ContextVar junto con el
+    scope y lo devuelve en el encabezado X-Request-ID.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for nombre, valor in scope.get("headers", []):
+            if nombre == b"x-request-id":
+                candidato = valor.decode("latin-1")
+                if PATRON_REQUEST_ID.match(candidato):
+                    request_id = candidato
+                break
+        request_id = request_id or uuid.uuid4().hex
+
+        async def send_con_id(mensaje):
+            if mensaje["type"] == "http.response.start":
+                mensaje.setdefault("headers", [])
+                mensaje["headers"] = list(mensaje["headers"]) + [(b"x-request-id", request_id.encode())]
+            await send(mensaje)
+
+        token = solicitud_actual.set(ContextoSolicitud(request_id=request_id, scope=scope))
+        try:
+            await self.app(scope, receive, send_con_id)
+        finally:
+            solicitud_actual.reset(token)
@@ -0,0 +1,135 @@
+# core/logging_config.py
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import traceback
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+from config.config import settings
+from core.contexto import contexto_actual
+
+# Atributos propios de LogRecord; lo demás viene de extra= y va al JSON
+_ATRIBUTOS_RECORD = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener: Optional[QueueListener] = None
+
+class FormatoJSON(logging.Formatter):
+    """Una línea JSON por registro, con request id, ruta y los campos de extra="""
+
+    def format(self, record: logging.LogRecord) -> str:
+        datos = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensaje": record.getMessage(),
+        }
+        for campo, valor in vars(record).items():
+            if campo not in _ATRIBUTOS_RECORD and not campo.startswith("_"):
+                datos[campo] = valor
+        if record.exc_text:
+            datos["excepcion"] = record.exc_text
+        elif record.exc_info:
+            datos["excepcion"] = self.formatException(record.exc_info)
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+class FiltroContexto(logging.Filter):
+    """Agrega request_id y ruta de la solicitud en curso (se ejecuta en el hilo que registra)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        contexto = contexto_actual()
+        if contexto is not None:
+            record.request_id = contexto.request_id
+            record.ruta = contexto.ruta
+        return True
+
+class FiltroMuestreoDebug(logging.Filter):
+    """Deja pasar solo una fracción de los registros DEBUG, que son los de mayor volumen"""
+
+    def __init__(self, tasa: float):
+        super().__init__()
+        self.tasa = tasa
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.tasa >= 1:
+            return True
+        return random.random() < self.tasa
+
+class QueueHandlerSinBloqueo(QueueHandler):
+    """
+    Encola el registro sin esperar nunca: si la cola está llena el registro
+    se descarta y se cuenta. Así escribir un log no bloquea una solicitud
+    aunque la salida esté lenta.
+    """
+
+    def __init__(self, cola: queue.Queue):
+        super().__init__(cola)
+        self.descartados = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolver el mensaje y el traceback aquí (el listener corre en otro
+        # hilo) sin perder los campos de extra= como hace el prepare base
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = "".join(traceback.format_exception(*record.exc_info)).rstrip()
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+def _niveles_por_modulo(valor: str) -> Dict[str, str]:
+    """Interpreta LOG_LEVELS, p. ej. "endpoints.periodos=DEBUG,sqlalchemy.engine=WARNING" """
+    niveles = {}
+    for parte in valor.split(","):
+        if "=" in parte:
+            modulo, nivel = parte.split("=", 1)
+            niveles[modulo.strip()] = nivel.strip().upper()
+    return niveles
+
+def configurar_logging() -> None:
+    """
+    Configura el logging de la aplicación: los registros se encolan en una
+    cola acotada y un QueueListener en segundo plano los escribe como JSON
+    en stdout. Es idempotente.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    cola: queue.Queue = queue.Queue(maxsize=settings.LOG_COLA_MAX)
+
+    salida = logging.StreamHandler(sys.stdout)
+    salida.setFormatter(FormatoJSON())
+
+    handler = QueueHandlerSinBloqueo(cola)
+    handler.addFilter(FiltroContexto())
+    handler.addFilter(FiltroMuestreoDebug(settings.LOG_MUESTREO_DEBUG))
+
+    raiz = logging.getLogger()
+    for anterior in list(raiz.handlers):
+        raiz.removeHandler(anterior)
+    raiz.addHandler(handler)
+    raiz.setLevel(settings.LOG_LEVEL.upper())
+
+    for modulo, nivel in _niveles_por_modulo(settings.LOG_LEVELS).items():
+        logging.getLogger(modulo).setLevel(nivel)
+
+    _listener = QueueListener(cola, salida, respect_handler_level=True)
+    _listener.start()
+    atexit.register(detener_logging)
+
+def detener_logging() -> None:
+    """Vacía la cola y detiene el listener (al salir del proceso)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
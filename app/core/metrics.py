@@ -0,0 +1,161 @@
+# core/metrics.py
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram,
+    REGISTRY, generate_latest, multiprocess
+)
+from database.database import engine
+
+# Con varios workers de uvicorn cada proceso escribe sus valores en
+# PROMETHEUS_MULTIPROC_DIR y /metrics los agrega. El directorio debe
+# vaciarse al arrancar el despliegue.
+MULTIPROCESO = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+# Rutas sin plantilla (404) se agrupan en una sola etiqueta
+RUTA_DESCONOCIDA = "sin_ruta"
+
+BUCKETS_HTTP = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BUCKETS_ETAPAS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+http_duracion = Histogram(
+    "http_request_duration_seconds",
+    "Duración de las solicitudes HTTP por plantilla de ruta y estado",
+    ["method", "route", "status"],
+    buckets=BUCKETS_HTTP
+)
+http_en_curso = Gauge(
+    "http_requests_in_progress",
+    "Solicitudes HTTP en curso",
+    multiprocess_mode="livesum"
+)
+
+etapa_duracion = Histogram(
+    "constancia_stage_duration_seconds",
+    "Duración de cada etapa de la generación de constancias",
+    ["stage"],
+    buckets=BUCKETS_ETAPAS
+)
+etapa_errores = Counter(
+    "constancia_stage_errors_total",
+    "Etapas de la generación de constancias que terminaron con error",
+    ["stage"]
+)
+
+cache_consultas = Counter(
+    "cache_requests_total",
+    "Consultas a las caches en memoria por resultado (hit/miss)",
+    ["cache", "result"]
+)
+
+render_en_cola = Gauge(
+    "render_queue_depth",
+    "Solicitudes esperando turno para renderizar",
+    multiprocess_mode="livesum"
+)
+render_en_curso = Gauge(
+    "render_in_flight",
+    "Renders de PDF en curso",
+    multiprocess_mode="livesum"
+)
+render_espera = Histogram(
+    "render_queue_wait_seconds",
+    "Tiempo de espera en la cola de renders",
+    buckets=BUCKETS_ETAPAS
+)
+render_rechazos = Counter(
+    "render_rejections_total",
+    "Solicitudes de render rechazadas con 503",
+    ["reason"]
+)
+
+trabajos_items = Counter(
+    "job_items_total",
+    "Constancias procesadas por los trabajos en segundo plano por resultado",
+    ["result"]
+)
+
+pool_conexiones = Gauge(
+    "db_pool_connections",
+    "Conexiones del pool de SQLAlchemy por estado",
+    ["state"],
+    multiprocess_mode="livesum"
+)
+
+@contextmanager
+def medir_etapa(etapa: str, tiempos=None):
+    """
+    Registra la duración de una etapa de la generación (y si falló).
+    Si se pasa un TiemposServidor, la etapa también queda en el desglose
+    de la solicitud.
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        etapa_errores.labels(etapa).inc()
+        raise
+    finally:
+        duracion = time.perf_counter() - inicio
+        etapa_duracion.labels(etapa).observe(duracion)
+        if tiempos is not None:
+            tiempos.agregar(etapa, duracion)
+
+def registrar_cache(cache: str, acierto: bool) -> None:
+    cache_consultas.labels(cache, "hit" if acierto else "miss").inc()
+
+def actualizar_pool() -> None:
+    """Copia el estado actual del pool a los gauges"""
+    pool = engine.pool
+    try:
+        pool_conexiones.labels("size").set(pool.size())
+        pool_conexiones.labels("checked_out").set(pool.checkedout())
+        pool_conexiones.labels("idle").set(pool.checkedin())
+        pool_conexiones.labels("overflow").set(max(pool.overflow(), 0))
+    except AttributeError:
+        # Pools sin tamaño fijo (NullPool, StaticPool)
+        pass
+
+def generar_metricas() -> bytes:
+    actualizar_pool()
+    if MULTIPROCESO:
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+        return generate_latest(registro)
+    return generate_latest(REGISTRY)
+
+class MetricasMiddleware:
+    """
+    Middleware ASGI que mide cada solicitud HTTP. La etiqueta de ruta es la
+    plantilla (/solicitudes/{solicitud_id}), no la URL, para no disparar la
+    cardinalidad.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        estado = {"codigo": 500}
+
+        async def send_con_estado(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado["codigo"] = mensaje["status"]
+            await send(mensaje)
+
+        inicio = time.perf_counter()
+        http_en_curso.inc()
+        try:
+            await self.app(scope, receive, send_con_estado)
+        finally:
+            http_en_curso.dec()
+            ruta = scope.get("route")
+            plantilla = getattr(ruta, "path", None) or RUTA_DESCONOCIDA
+            http_duracion.labels(scope["method"], plantilla, str(estado["codigo"])).observe(
+                time.perf_counter() - inicio
+            )
+            actualizar_pool()
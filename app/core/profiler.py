@@ -0,0 +1,308 @@
+# core/profiler.py
+import asyncio
+import contextvars
+import cProfile
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Optional
+from urllib.parse import parse_qs
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from config.config import settings
+from database.database import SessionLocal
+from core.auth import resolver_usuario
+
+# Modos que puede pedir un administrador con X-Perfilar o ?perfilar=
+MODO_CPROFILE = "cprofile"
+MODO_MUESTREO = "muestreo"
+MODOS = (MODO_CPROFILE, MODO_MUESTREO)
+
+# Un solo perfilador a la vez en el proceso: cProfile y el muestreo ven
+# todo lo que ejecuta el intérprete, dos a la vez se estorban
+_lock_perfil = threading.Lock()
+
+# Marca de la solicitud perfilada; la heredan las tareas que crea y el
+# trabajo que envía al threadpool (anyio copia el contexto)
+_perfil_actual: contextvars.ContextVar[Optional[object]] = contextvars.ContextVar("perfil_actual", default=None)
+
+class FiltroSolicitud:
+    """
+    Decide qué pilas pertenecen a la solicitud perfilada: la del event loop
+    solo mientras corre su tarea (o una tarea creada por ella) y las de los
+    hilos del threadpool de anyio que ejecutan trabajo enviado por ella.
+    Se crea dentro de la tarea de la solicitud.
+    """
+
+    def __init__(self):
+        self.marca = object()
+        self.loop = asyncio.get_running_loop()
+        self.hilo_loop = threading.get_ident()
+        self.tarea = asyncio.current_task()
+
+    def activar(self) -> contextvars.Token:
+        return _perfil_actual.set(self.marca)
+
+    def tarea_en_curso(self) -> bool:
+        """Si la tarea que corre ahora en el event loop es de la solicitud"""
+        tarea = asyncio.current_task(self.loop)
+        if tarea is None:
+            return False
+        if tarea is self.tarea:
+            return True
+        # Tareas hijas (p. ej. las de StreamingResponse); get_context existe desde 3.12
+        obtener_contexto = getattr(tarea, "get_context", None)
+        return obtener_contexto is not None and obtener_contexto().get(_perfil_actual) is self.marca
+
+    def es_trabajo(self, frame, llamado) -> bool:
+        """
+        Si el frame es el WorkerThread.run de anyio ejecutando un trabajo de
+        la solicitud. Mientras espera el siguiente trabajo (llamado es
+        queue.get) su variable context aún tiene el anterior.
+        """
+        codigo = frame.f_code
+        if codigo.co_name != "run" or "anyio" not in codigo.co_filename:
+            return False
+        if llamado is None or os.path.basename(llamado.f_code.co_filename) == "queue.py":
+            return False
+        contexto = frame.f_locals.get("context")
+        return isinstance(contexto, contextvars.Context) and contexto.get(_perfil_actual) is self.marca
+
+class MuestreadorPilas:
+    """
+    Perfilador estadístico: un hilo toma las pilas de los hilos cada
+    intervalo y las acumula en formato "collapsed" (una línea por pila con
+    su conteo), compatible con flamegraph.pl y speedscope. Ve también el
+    trabajo que corre en el threadpool (renders de reportlab). Con un
+    FiltroSolicitud solo cuenta las pilas de esa solicitud; sin él, las de
+    todos los hilos del proceso.
+    """
+
+    def __init__(self, intervalo: float, filtro: Optional[FiltroSolicitud] = None):
+        self.intervalo = intervalo
+        self.filtro = filtro
+        self.pilas: Counter = Counter()
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, name="muestreador-perfil", daemon=True)
+
+    def iniciar(self) -> None:
+        self._hilo.start()
+
+    def detener(self) -> None:
+        self._detener.set()
+        self._hilo.join()
+
+    def _muestrear(self) -> None:
+        propio = threading.get_ident()
+        nombres = {}
+        while not self._detener.wait(self.intervalo):
+            for hilo in threading.enumerate():
+                nombres[hilo.ident] = hilo.name
+            for ident, frame in sys._current_frames().items():
+                if ident == propio:
+                    continue
+                filtro = self.filtro
+                if filtro is not None and ident == filtro.hilo_loop:
+                    if not filtro.tarea_en_curso():
+                        continue
+                    filtro = None
+                partes = []
+                llamado = None
+                while frame is not None:
+                    if filtro is not None and filtro.es_trabajo(frame, llamado):
+                        filtro = None
+                    codigo = frame.f_code
+                    partes.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}:{frame.f_lineno}")
+                    llamado, frame = frame, frame.f_back
+                if filtro is not None:
+                    # Hilo que no trabaja para la solicitud perfilada
+                    continue
+                partes.append(nombres.get(ident, str(ident)))
+                self.pilas[";".join(reversed(partes))] += 1
+
+    def como_texto(self) -> str:
+        return "".join(f"{pila} {conteo}\n" for pila, conteo in self.pilas.most_common())
+
+def _bytes_pstats(perfil: cProfile.Profile) -> bytes:
+    """Serializa el perfil en el formato que lee pstats.Stats / snakeviz"""
+    with tempfile.NamedTemporaryFile(suffix=".pstats", delete=False) as archivo:
+        ruta = archivo.name
+    try:
+        perfil.dump_stats(ruta)
+        with open(ruta, "rb") as archivo:
+            return archivo.read()
+    finally:
+        os.remove(ruta)
+
+def _guardar_texto(ruta: str, texto: str) -> None:
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        archivo.write(texto)
+
+def _nombre_archivo(scope, estado: int, duracion: float, extension: str) -> str:
+    ruta = getattr(scope.get("route"), "path", None) or scope.get("path", "")
+    ruta = re.sub(r"[^A-Za-z0-9]+", "_", ruta).strip("_") or "raiz"
+    marca = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    return f"{marca}_{scope['method']}_{ruta}_{estado}_{int(duracion * 1000)}ms.{extension}"
+
+def _modo_solicitado(scope) -> Optional[str]:
+    for nombre, valor in scope.get("headers", []):
+        if nombre == b"x-perfilar":
+            return valor.decode("latin-1").strip().lower() or MODO_MUESTREO
+    parametros = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    if "perfilar" in parametros:
+        return parametros["perfilar"][0].strip().lower() or MODO_MUESTREO
+    return None
+
+def _authorization(scope) -> str:
+    for nombre, valor in scope.get("headers", []):
+        if nombre == b"authorization":
+            return valor.decode("latin-1")
+    return ""
+
+def _verificar_admin(authorization: str) -> Optional[Dict]:
+    """Mismo criterio que get_admin_user; retorna None si no es administrador"""
+    try:
+        with SessionLocal() as db:
+            usuario = resolver_usuario(authorization, db)
+    except HTTPException:
+        return None
+    return usuario if usuario.get("admin", False) else None
+
+async def _responder_json(send, estado: int, cuerpo: Dict) -> None:
+    contenido = json.dumps(cuerpo).encode()
+    await send({
+        "type": "http.response.start",
+        "status": estado,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(contenido)).encode())]
+    })
+    await send({"type": "http.response.body", "body": contenido})
+
+class PerfiladorMiddleware:
+    """
+    Perfilado de solicitudes bajo demanda y por muestreo.
+
+    - Bajo demanda: un administrador agrega el header X-Perfilar (o el query
+      ?perfilar=) con "muestreo" (el valor por omisión) o "cprofile" y
+      recibe, en lugar de la respuesta, el perfil de su solicitud como
+      archivo descargable (pilas "collapsed" para flamegraph o .pstats). El
+      estado original va en X-Perfil-Estado-Original.
+    - Por muestreo: PERFIL_PORCENTAJE por ciento de las solicitudes se
+      perfilan con el muestreador y las pilas se guardan en PERFIL_DIR, sin
+      cambiar la respuesta.
+
+    El muestreador se filtra a la solicitud: su tarea en el event loop y su
+    trabajo en el threadpool. cProfile se activa en el hilo del event loop
+    durante toda la solicitud, así que también cuenta las corrutinas de
+    otras solicitudes que corren mientras tanto y no ve el threadpool; esos
+    perfiles se marcan con X-Perfil-Incluye-Concurrentes y la extensión
+    .concurrente.pstats.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.porcentaje = settings.PERFIL_PORCENTAJE
+        self.directorio = settings.PERFIL_DIR
+        self.intervalo = settings.PERFIL_INTERVALO_MUESTREO
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        modo = _modo_solicitado(scope)
+        if modo is not None:
+            await self._bajo_demanda(scope, receive, send, modo)
+        elif self.porcentaje > 0 and random.random() * 100 < self.porcentaje:
+            await self._muestreado(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+    async def _bajo_demanda(self, scope, receive, send, modo: str):
+        if modo not in MODOS:
+            await _responder_json(send, 400, {"detail": f"Modo de perfilado inválido, use uno de: {', '.join(MODOS)}"})
+            return
+        usuario = await run_in_threadpool(_verificar_admin, _authorization(scope))
+        if usuario is None:
+            await _responder_json(send, 403, {"detail": "Se requieren permisos de administrador para perfilar solicitudes"})
+            return
+        if not _lock_perfil.acquire(blocking=False):
+            await _responder_json(send, 409, {"detail": "Ya hay un perfilado en curso, intente de nuevo"})
+            return
+
+        estado = {"codigo": 500}
+
+        async def send_descartando(mensaje):
+            # La respuesta original se descarta: se envía el perfil en su lugar
+            if mensaje["type"] == "http.response.start":
+                estado["codigo"] = mensaje["status"]
+
+        inicio = time.perf_counter()
+        try:
+            if modo == MODO_CPROFILE:
+                perfil = cProfile.Profile()
+                perfil.enable()
+                try:
+                    await self.app(scope, receive, send_descartando)
+                finally:
+                    perfil.disable()
+                contenido = _bytes_pstats(perfil)
+                extension, tipo = "concurrente.pstats", b"application/octet-stream"
+            else:
+                contenido = (await self._muestrear(scope, receive, send_descartando)).encode()
+                extension, tipo = "folded.txt", b"text/plain; charset=utf-8"
+        finally:
+            _lock_perfil.release()
+
+        nombre = _nombre_archivo(scope, estado["codigo"], time.perf_counter() - inicio, extension)
+        encabezados = [
+            (b"content-type", tipo),
+            (b"content-length", str(len(contenido)).encode()),
+            (b"content-disposition", f'attachment; filename="{nombre}"'.encode()),
+            (b"x-perfil-estado-original", str(estado["codigo"]).encode())
+        ]
+        if modo == MODO_CPROFILE:
+            encabezados.append((b"x-perfil-incluye-concurrentes", b"1"))
+        await send({"type": "http.response.start", "status": 200, "headers": encabezados})
+        await send({"type": "http.response.body", "body": contenido})
+
+    async def _muestrear(self, scope, receive, send) -> str:
+        """Ejecuta la solicitud con el muestreador filtrado a ella"""
+        filtro = FiltroSolicitud()
+        token = filtro.activar()
+        muestreador = MuestreadorPilas(self.intervalo, filtro)
+        muestreador.iniciar()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            muestreador.detener()
+            _perfil_actual.reset(token)
+        return muestreador.como_texto()
+
+    async def _muestreado(self, scope, receive, send):
+        # Si ya hay otro perfil en curso, esta solicitud simplemente no se perfila
+        if not _lock_perfil.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        estado = {"codigo": 500}
+
+        async def send_con_estado(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado["codigo"] = mensaje["status"]
+            await send(mensaje)
+
+        inicio = time.perf_counter()
+        try:
+            pilas = await self._muestrear(scope, receive, send_con_estado)
+        finally:
+            _lock_perfil.release()
+        nombre = _nombre_archivo(scope, estado["codigo"], time.perf_counter() - inicio, "folded.txt")
+        os.makedirs(self.directorio, exist_ok=True)
+        await run_in_threadpool(_guardar_texto, os.path.join(self.directorio, nombre), pilas)
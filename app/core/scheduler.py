@@ -0,0 +1,154 @@
+# core/scheduler.py
+import logging
+import threading
+import time
+import zlib
+from typing import Callable, List, Optional
+from sqlalchemy import func, select, text
+from database.database import engine, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+class Tarea:
+    """Tarea periódica del programador"""
+
+    def __init__(self, nombre: str, funcion: Callable, cada: float, solo_lider: bool):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.cada = cada
+        self.solo_lider = solo_lider
+        self.proxima = 0.0  # Se ejecuta en cuanto el worker puede hacerlo
+        self.ejecuciones = 0
+        self.errores = 0
+        self.ultima_duracion: Optional[float] = None
+
+class Programador:
+    """
+    Programador de tareas de mantenimiento en un hilo del worker.
+    Las tareas solo_lider (escrituras en la BD, limpieza de archivos) las
+    ejecuta únicamente el worker que tiene el advisory lock de PostgreSQL;
+    lo conserva en una conexión dedicada mientras viva, y si el worker muere
+    la conexión se cierra y otro toma el relevo. Las demás (calentar caches
+    en memoria) se ejecutan en todos los workers.
+    """
+
+    def __init__(self, nombre_lock: str, revision: float = 1.0, reintento_lider: float = 10.0):
+        self.clave_lock = zlib.crc32(nombre_lock.encode())
+        self.revision = revision
+        self.reintento_lider = reintento_lider
+        self.tareas: List[Tarea] = []
+        self._conexion_lider = None
+        self._proximo_intento_lider = 0.0
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+    @property
+    def es_lider(self) -> bool:
+        return self._conexion_lider is not None
+
+    def agregar(self, nombre: str, funcion: Callable, cada: float, solo_lider: bool = True) -> None:
+        """Registrar una tarea; funcion recibe una sesión de la BD"""
+        self.tareas.append(Tarea(nombre, funcion, cada, solo_lider))
+
+    def iniciar(self) -> None:
+        if self._hilo is not None:
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ciclo, name="programador", daemon=True)
+        self._hilo.start()
+
+    def detener(self, timeout: float = 10) -> None:
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+            self._hilo = None
+        self._soltar_liderazgo()
+
+    def _ciclo(self) -> None:
+        while not self._detener.is_set():
+            self._revisar_liderazgo()
+            ahora = time.monotonic()
+            for tarea in self.tareas:
+                if self._detener.is_set():
+                    break
+                if ahora < tarea.proxima or (tarea.solo_lider and not self.es_lider):
+                    continue
+                self._ejecutar(tarea)
+                tarea.proxima = time.monotonic() + tarea.cada
+            self._detener.wait(self.revision)
+
+    def _ejecutar(self, tarea: Tarea) -> None:
+        inicio = time.perf_counter()
+        try:
+            with SessionLocal() as db:
+                tarea.funcion(db)
+            tarea.ejecuciones += 1
+        except Exception:
+            tarea.errores += 1
+            logger.exception("Error en la tarea programada %s", tarea.nombre)
+        finally:
+            tarea.ultima_duracion = time.perf_counter() - inicio
+            logger.debug(
+                "Tarea programada %s terminada en %.3f s", tarea.nombre, tarea.ultima_duracion,
+                extra={"tarea": tarea.nombre, "duracion_s": round(tarea.ultima_duracion, 3)}
+            )
+
+    def _revisar_liderazgo(self) -> None:
+        """Cada reintento_lider segundos: confirmar que la conexión del lock sigue viva o intentar tomarlo"""
+        ahora = time.monotonic()
+        if ahora < self._proximo_intento_lider:
+            return
+        self._proximo_intento_lider = ahora + self.reintento_lider
+
+        if self._conexion_lider is not None:
+            try:
+                self._conexion_lider.execute(text("SELECT 1"))
+                self._conexion_lider.commit()
+                return
+            except Exception:
+                logger.warning("Se perdió la conexión del lock del programador")
+                self._soltar_liderazgo()
+
+        conexion = None
+        try:
+            conexion = engine.connect()
+            obtenido = conexion.execute(select(func.pg_try_advisory_lock(self.clave_lock))).scalar()
+            # El lock es de sesión: sobrevive al fin de la transacción
+            conexion.commit()
+        except Exception:
+            logger.exception("No se pudo consultar el lock del programador")
+            obtenido = False
+        if not obtenido:
+            if conexion is not None:
+                conexion.close()
+            return
+        self._conexion_lider = conexion
+        logger.info("Este worker ejecuta las tareas programadas")
+
+    def _soltar_liderazgo(self) -> None:
+        conexion, self._conexion_lider = self._conexion_lider, None
+        if conexion is None:
+            return
+        # Cerrar la conexión física (no devolverla al pool) libera el lock
+        try:
+            conexion.invalidate()
+            conexion.close()
+        except Exception:
+            logger.exception("Error al liberar el lock del programador")
+
+    def estado(self) -> List[dict]:
+        ahora = time.monotonic()
+        return [
+            {
+                "nombre": t.nombre,
+                "solo_lider": t.solo_lider,
+                "cada_s": t.cada,
+                "proxima_en_s": max(0.0, round(t.proxima - ahora, 1)),
+                "ejecuciones": t.ejecuciones,
+                "errores": t.errores,
+                "ultima_duracion_s": round(t.ultima_duracion, 3) if t.ultima_duracion is not None else None
+            }
+            for t in self.tareas
+        ]
+
+programador = Programador("constancias:programador")
@@ -0,0 +1,90 @@
+# core/serializacion.py
+from typing import Dict, List
+
+# Serializadores de las respuestas de listado. Reciben filas de consultas
+# por columnas (o las referencias de la cache, que ya son datos confiables)
+# y arman los dicts una sola vez; se devuelven con ORJSONResponse, que no
+# pasa por jsonable_encoder ni vuelve a validar con pydantic. Las llaves
+# siguen el orden de los esquemas; orjson escribe date/datetime en ISO 8601
+# (UTC como +00:00).
+
+def filas_a_dicts(resultado) -> List[Dict]:
+    """Filas planas de un select por columnas, con los nombres de las columnas como llaves"""
+    llaves = tuple(resultado.keys())
+    return [dict(zip(llaves, fila)) for fila in resultado]
+
+def solicitud_listado(fila) -> Dict:
+    """Solicitud con usuario, categoría y edición para GET /solicitudes"""
+    return {
+        "id": fila.id,
+        "user_id": fila.user_id,
+        "categoria_id": fila.categoria_id,
+        "edicion_id": fila.edicion_id,
+        "periodo": fila.periodo,
+        "grado_academico": fila.grado_academico,
+        "descripcion": fila.descripcion,
+        "fecha_solicitud": fila.fecha_solicitud,
+        "estado": fila.estado,
+        "created_at": fila.created_at,
+        "updated_at": fila.updated_at,
+        # Datos relacionados
+        "usuario": {
+            "nombre": fila.usuario_nombre,
+            "email": fila.usuario_email,
+            "genero": fila.usuario_genero,
+            "grado_academico": fila.usuario_grado_academico
+        },
+        "categoria": {
+            "codigo_categoria": fila.codigo_categoria,
+            "nombre": fila.categoria_nombre
+        },
+        "edicion": {
+            "nombre": fila.edicion_nombre
+        }
+    }
+
+def solicitud_de_usuario(fila) -> Dict:
+    """Solicitud resumida (sin descripción ni datos del usuario) para GET /usuarios/{id}/solicitudes"""
+    return {
+        "id": fila.id,
+        "fecha_solicitud": fila.fecha_solicitud,
+        "estado": fila.estado,
+        "grado_academico": fila.grado_academico,
+        "periodo": fila.periodo,
+        "created_at": fila.created_at,
+        # Datos relacionados
+        "categoria": {
+            "codigo_categoria": fila.codigo_categoria,
+            "nombre": fila.categoria_nombre
+        },
+        "edicion": {
+            "nombre": fila.edicion_nombre
+        }
+    }
+
+def categoria_a_dict(categoria) -> Dict:
+    return {
+        "codigo_categoria": categoria.codigo_categoria,
+        "nombre": categoria.nombre,
+        "asunto": categoria.asunto,
+        "descripcion": categoria.descripcion,
+        "activo": categoria.activo,
+        "id": categoria.id,
+        "created_at": categoria.created_at,
+        "updated_at": categoria.updated_at
+    }
+
+def edicion_a_dict(edicion) -> Dict:
+    """Edición de la cache de referencias, con su estado calculado por fechas"""
+    return {
+        "nombre": edicion.nombre,
+        "periodo1": edicion.periodo1,
+        "periodo2": edicion.periodo2,
+        "fecha_inicio": edicion.fecha_inicio,
+        "fecha_fin": edicion.fecha_fin,
+        "estado": edicion.estado,
+        "activa": edicion.activa,
+        "id": edicion.id,
+        "created_at": edicion.created_at,
+        "updated_at": edicion.updated_at
+    }
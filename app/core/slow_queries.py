@@ -0,0 +1,171 @@
+# core/slow_queries.py
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from logging.handlers import QueueListener, RotatingFileHandler
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from config.config import settings
+from core.contexto import contexto_actual
+from core.logging_config import FormatoJSON, QueueHandlerSinBloqueo
+
+# Listas largas de parámetros (IN (...), VALUES (...), (...)) se colapsan
+PATRON_LISTA_PARAMETROS = re.compile(r"(%\(\w+\)s)(\s*,\s*%\(\w+\)s)+")
+_FILA_PARAMETROS = r"\((?:\s*%\(\w+\)s\s*,?)+\)"
+PATRON_FILAS_VALUES = re.compile(rf"({_FILA_PARAMETROS})(\s*,\s*{_FILA_PARAMETROS})+")
+PATRON_ESPACIOS = re.compile(r"\s+")
+
+def normalizar_sql(sql: str) -> str:
+    """SQL en una sola línea y con las listas de parámetros colapsadas"""
+    sql = PATRON_ESPACIOS.sub(" ", sql).strip()
+    sql = PATRON_FILAS_VALUES.sub(r"\1, ...", sql)
+    return PATRON_LISTA_PARAMETROS.sub(r"\1, ...", sql)
+
+def _redactar_valor(valor):
+    # Se conservan números, fechas y booleanos (ids, rangos); los textos
+    # pueden traer datos personales y solo se reporta su longitud
+    if valor is None or isinstance(valor, (bool, int, float, Decimal)):
+        return valor
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    if isinstance(valor, (str, bytes)):
+        return f"<{type(valor).__name__} len={len(valor)}>"
+    if isinstance(valor, (list, tuple)):
+        return f"<{type(valor).__name__} len={len(valor)}>"
+    return f"<{type(valor).__name__}>"
+
+def redactar_parametros(parametros, executemany: bool):
+    if executemany and isinstance(parametros, (list, tuple)):
+        primera = redactar_parametros(parametros[0], False) if parametros else None
+        return {"filas": len(parametros), "primera": primera}
+    if isinstance(parametros, dict):
+        return {nombre: _redactar_valor(valor) for nombre, valor in parametros.items()}
+    if isinstance(parametros, (list, tuple)):
+        return [_redactar_valor(valor) for valor in parametros]
+    return _redactar_valor(parametros)
+
+def ruta_log_worker(ruta: str) -> str:
+    """
+    Archivo del log de este worker: logs/consultas_lentas.log se vuelve
+    logs/consultas_lentas.<pid>.log. RotatingFileHandler no es seguro entre
+    procesos; con un archivo por worker cada uno rota solo el suyo.
+    """
+    base, extension = os.path.splitext(ruta)
+    return f"{base}.{os.getpid()}{extension}"
+
+class RegistroConsultasLentas:
+    """
+    Registra las sentencias que tardan más que el umbral, con la ruta de
+    FastAPI que las ejecutó. Las últimas se guardan en un buffer circular en
+    memoria (por worker) y todas se escriben en un log rotativo por worker.
+    """
+
+    def __init__(self, umbral_ms: float, maximo: int):
+        self.umbral_ms = umbral_ms
+        self._lock = threading.Lock()
+        self._entradas: deque = deque(maxlen=maximo)
+        self.total = 0
+        self._logger = logging.getLogger("consultas_lentas")
+        self._listener: Optional[QueueListener] = None
+        self._pid: Optional[int] = None
+
+    def instalar(self, engine: Engine) -> None:
+        """Conecta los eventos del engine; el log se abre con la primera consulta lenta"""
+        event.listen(engine, "before_cursor_execute", self._antes)
+        event.listen(engine, "after_cursor_execute", self._despues)
+        event.listen(engine, "handle_error", self._error)
+
+    def _abrir_log(self) -> None:
+        """
+        Abre el log de este proceso. Se revisa el pid porque la app se puede
+        importar antes de crear los workers (gunicorn --preload): cada worker
+        abre su propio archivo y su hilo escritor.
+        """
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # El manejador heredado del proceso padre no tiene hilo escritor
+            self._logger.handlers.clear()
+            self._abrir_log_worker()
+            self._pid = os.getpid()
+
+    def _abrir_log_worker(self) -> None:
+        directorio = os.path.dirname(settings.CONSULTAS_LENTAS_LOG)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        archivo = RotatingFileHandler(
+            ruta_log_worker(settings.CONSULTAS_LENTAS_LOG),
+            maxBytes=settings.CONSULTAS_LENTAS_LOG_BYTES,
+            backupCount=settings.CONSULTAS_LENTAS_LOG_RESPALDOS,
+            encoding="utf-8"
+        )
+        archivo.setFormatter(FormatoJSON())
+        # Igual que el log general: se encola y un hilo escribe el archivo
+        cola: queue.Queue = queue.Queue(maxsize=settings.LOG_COLA_MAX)
+        self._logger.addHandler(QueueHandlerSinBloqueo(cola))
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+        self._listener = QueueListener(cola, archivo)
+        self._listener.start()
+
+    def _antes(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("inicio_consultas", []).append(time.perf_counter())
+
+    def _despues(self, conn, cursor, statement, parameters, context, executemany):
+        inicios = conn.info.get("inicio_consultas")
+        if not inicios:
+            return
+        duracion_ms = (time.perf_counter() - inicios.pop()) * 1000
+        if duracion_ms < self.umbral_ms:
+            return
+
+        contexto = contexto_actual()
+        entrada = {
+            "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "duracion_ms": round(duracion_ms, 2),
+            "sql": normalizar_sql(statement),
+            "parametros": redactar_parametros(parameters, executemany),
+            "filas": cursor.rowcount,
+            "metodo": contexto.metodo if contexto else None,
+            "ruta": contexto.ruta if contexto else None,
+            "request_id": contexto.request_id if contexto else None,
+            "pid": os.getpid()
+        }
+        with self._lock:
+            self._entradas.append(entrada)
+            self.total += 1
+        self._abrir_log()
+        self._logger.info("Consulta lenta (%.1f ms) en %s", duracion_ms, entrada["ruta"], extra=entrada)
+
+    def _error(self, contexto_excepcion):
+        # Si la sentencia falló no hay after_cursor_execute: descartar su inicio
+        conexion = contexto_excepcion.connection
+        if conexion is not None and conexion.info.get("inicio_consultas"):
+            conexion.info["inicio_consultas"].pop()
+
+    def entradas(self, limite: int, orden: str = "reciente") -> List[Dict]:
+        with self._lock:
+            entradas = list(self._entradas)
+        if orden == "duracion":
+            entradas.sort(key=lambda e: e["duracion_ms"], reverse=True)
+        else:
+            entradas.reverse()
+        return entradas[:limite]
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+
+consultas_lentas = RegistroConsultasLentas(
+    umbral_ms=settings.CONSULTAS_LENTAS_UMBRAL_MS,
+    maximo=settings.CONSULTAS_LENTAS_MAX
+)
@@ -0,0 +1,41 @@
+# core/tiempos.py
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+class TiemposServidor:
+    """
+    Duraciones por etapa de una sola solicitud. El endpoint crea una instancia
+    y la pasa explícitamente a las funciones que quiere medir; al final se
+    devuelve en el encabezado Server-Timing y se escribe en el log.
+    """
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.etapas: List[Tuple[str, float]] = []
+
+    def agregar(self, etapa: str, duracion: float) -> None:
+        self.etapas.append((etapa, duracion))
+
+    @contextmanager
+    def medir(self, etapa: str):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.agregar(etapa, time.perf_counter() - inicio)
+
+    def total(self) -> float:
+        return time.perf_counter() - self.inicio
+
+    def como_dict(self) -> Dict[str, float]:
+        """Milisegundos por etapa (las etapas repetidas se suman) más el total"""
+        resultado: Dict[str, float] = {}
+        for etapa, duracion in self.etapas:
+            resultado[etapa] = resultado.get(etapa, 0.0) + duracion * 1000
+        resultado["total"] = self.total() * 1000
+        return {etapa: round(ms, 2) for etapa, ms in resultado.items()}
+
+    def encabezado(self) -> str:
+        """Valor del encabezado Server-Timing, p. ej. 'qr;dur=4.1, pdf_build;dur=38.0, total;dur=51.3'"""
+        return ", ".join(f"{etapa};dur={ms:.1f}" for etapa, ms in self.como_dict().items())
@@ -0,0 +1,434 @@
+# core/trabajos.py
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from config.config import settings
+from database.database import SessionLocal
+from models.models import (
+    Categoria, ConstanciaGenerada, DatosFijos, Edicion, Solicitud, TrabajoGeneracion, TrabajoItem, User
+)
+from core.metrics import trabajos_items
+from generacion import (
+    ErrorGeneracion, generar_constancia_de_solicitud, generar_constancia_individual,
+    pregenerar_constancia_de_solicitud
+)
+
+logger = logging.getLogger(__name__)
+
+# Prioridades de la cola: los lotes pedidos por un usuario van antes que el
+# trabajo especulativo
+PRIORIDAD_LOTE = 10
+PRIORIDAD_PRERENDER = 0
+
+ESTADOS_ITEM = ("pendiente", "en_proceso", "completado", "fallido")
+
+def crear_trabajo(db: Session, tipo: str, items: Iterable[Dict], creado_por: Optional[int] = None,
+                  prioridad: int = PRIORIDAD_LOTE) -> TrabajoGeneracion:
+    """
+    Registrar un trabajo y sus constancias en una sola transacción.
+    Cada item es un dict con solicitud_id o datos; si trae "error" se
+    registra directamente como fallido (por ejemplo, solicitud no aceptada).
+    """
+    items = list(items)
+    trabajo = TrabajoGeneracion(id=uuid.uuid4().hex, tipo=tipo, total=len(items), creado_por=creado_por)
+    db.add(trabajo)
+    db.flush()
+    db.bulk_insert_mappings(TrabajoItem, [
+        {
+            "trabajo_id": trabajo.id,
+            "posicion": posicion,
+            "prioridad": prioridad,
+            "estado": "fallido" if item.get("error") else "pendiente",
+            "solicitud_id": item.get("solicitud_id"),
+            "datos": item.get("datos"),
+            "error": item.get("error"),
+            "intentos": 0
+        }
+        for posicion, item in enumerate(items)
+    ])
+    db.commit()
+    return trabajo
+
+def contar_items(db: Session, trabajo_id: str) -> Dict[str, int]:
+    """Constancias del trabajo por estado"""
+    conteos = dict.fromkeys(ESTADOS_ITEM, 0)
+    filas = db.execute(
+        select(TrabajoItem.estado, func.count())
+        .where(TrabajoItem.trabajo_id == trabajo_id)
+        .group_by(TrabajoItem.estado)
+    ).all()
+    for estado, cantidad in filas:
+        conteos[estado] = cantidad
+    return conteos
+
+def estado_trabajo(conteos: Dict[str, int]) -> str:
+    """El estado del trabajo se deriva de sus constancias, no se guarda"""
+    if conteos["pendiente"] or conteos["en_proceso"]:
+        if conteos["en_proceso"] or conteos["completado"] or conteos["fallido"]:
+            return "en_proceso"
+        return "pendiente"
+    if conteos["fallido"] == 0:
+        return "completado"
+    if conteos["completado"] == 0:
+        return "fallido"
+    return "completado_con_errores"
+
+def encolar_prerender(db: Session, solicitud_ids: Iterable[int]) -> Optional[TrabajoGeneracion]:
+    """
+    Encolar con prioridad baja la constancia de solicitudes recién aceptadas
+    (si PRERENDER_ACEPTADAS está activo). Se omiten las que ya esperan en la cola.
+    """
+    solicitud_ids = list(dict.fromkeys(solicitud_ids))
+    if not settings.PRERENDER_ACEPTADAS or not solicitud_ids:
+        return None
+    en_cola = set(db.execute(
+        select(TrabajoItem.solicitud_id)
+        .join(TrabajoGeneracion, TrabajoItem.trabajo_id == TrabajoGeneracion.id)
+        .where(
+            TrabajoGeneracion.tipo == "prerender",
+            TrabajoItem.solicitud_id.in_(solicitud_ids),
+            TrabajoItem.estado.in_(("pendiente", "en_proceso"))
+        )
+    ).scalars())
+    nuevas = [{"solicitud_id": i} for i in solicitud_ids if i not in en_cola]
+    if not nuevas:
+        return None
+    trabajo = crear_trabajo(db, "prerender", nuevas, prioridad=PRIORIDAD_PRERENDER)
+    gestor_trabajos.despertar()
+    return trabajo
+
+def vigente_desde_prerender():
+    """
+    Última modificación de lo que aparece en el PDF pre-generado de una
+    solicitud: la solicitud, el usuario, la categoría, la edición y los datos
+    fijos. Expresión SQL para un UPDATE de trabajos_items que ya cruza con
+    esas tablas (GREATEST ignora los NULL).
+    """
+    datos_fijos = select(func.max(func.coalesce(DatosFijos.updated_at, DatosFijos.created_at))).scalar_subquery()
+    return func.greatest(
+        Solicitud.created_at, Solicitud.updated_at,
+        User.created_at, User.updated_at,
+        Categoria.created_at, Categoria.updated_at,
+        Edicion.created_at, Edicion.updated_at,
+        datos_fijos
+    )
+
+def soltar_prerenders(db: Session, *condiciones):
+    """
+    Quitar el PDF (archivo_pdf = NULL) de los prerender completados que
+    cumplen las condiciones y retornarlos con "vigente" (si el PDF es
+    posterior a vigente_desde_prerender). El UPDATE bloquea las filas, así
+    dos descargas simultáneas no se llevan el mismo archivo.
+    """
+    vigente = (TrabajoItem.updated_at >= vigente_desde_prerender()).label("vigente")
+    return db.execute(
+        update(TrabajoItem)
+        .where(
+            TrabajoItem.trabajo_id == TrabajoGeneracion.id,
+            TrabajoGeneracion.tipo == "prerender",
+            TrabajoItem.estado == "completado",
+            TrabajoItem.archivo_pdf.isnot(None),
+            TrabajoItem.solicitud_id == Solicitud.id,
+            Solicitud.user_id == User.id,
+            Solicitud.categoria_id == Categoria.id,
+            Solicitud.edicion_id == Edicion.id,
+            *condiciones
+        )
+        .values(archivo_pdf=None)
+        .returning(TrabajoItem.id, TrabajoItem.archivo_pdf, TrabajoItem.qr_id, TrabajoItem.datos, vigente)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+def tomar_prerender(db: Session, solicitud: Solicitud) -> Optional[str]:
+    """
+    Reclamar el PDF pre-generado de la solicitud. Solo vale si se generó
+    después del último cambio de lo que aparece en él; la fecha de emisión es
+    la del render (el día en que se aceptó la solicitud). La constancia se
+    registra aquí, al entregarla: los PDFs que nunca se descargan no dejan un
+    QR válido. Los pre-generados que quedaron viejos se eliminan.
+    """
+    filas = soltar_prerenders(db, TrabajoItem.solicitud_id == solicitud.id)
+    db.commit()
+    vigentes = [f for f in filas if f.vigente and os.path.exists(f.archivo_pdf)]
+    elegido = max(vigentes, key=lambda f: f.id) if vigentes else None
+    for fila in filas:
+        if fila is not elegido and os.path.exists(fila.archivo_pdf):
+            os.remove(fila.archivo_pdf)
+    if elegido is None:
+        return None
+
+    try:
+        db.add(ConstanciaGenerada(
+            qr_id=elegido.qr_id,
+            archivo_pdf=elegido.archivo_pdf,
+            es_valida=True,
+            **elegido.datos
+        ))
+        db.commit()
+    except IntegrityError:
+        # El qr_id se asignó a otra constancia mientras el PDF esperaba
+        db.rollback()
+        os.remove(elegido.archivo_pdf)
+        return None
+    return elegido.archivo_pdf
+
+def leer_cambios(trabajo_id: str, ventana_s: Optional[float]):
+    """
+    Lectura para el stream de progreso: conteos por estado y las constancias
+    no pendientes modificadas en los últimos ventana_s segundos (todas si es
+    None). Solo lectura; quien llama descarta las que ya envió.
+    """
+    # Las constancias fallidas al crear el trabajo no tienen updated_at
+    modificado = func.coalesce(TrabajoItem.updated_at, TrabajoItem.created_at)
+    with SessionLocal() as db:
+        conteos = contar_items(db, trabajo_id)
+        consulta = (
+            select(
+                TrabajoItem.id, TrabajoItem.posicion, TrabajoItem.estado,
+                TrabajoItem.solicitud_id, TrabajoItem.error
+            )
+            .where(TrabajoItem.trabajo_id == trabajo_id, TrabajoItem.estado != "pendiente")
+            .order_by(modificado, TrabajoItem.id)
+        )
+        if ventana_s is not None:
+            consulta = consulta.where(modificado >= func.clock_timestamp() - timedelta(seconds=ventana_s))
+        cambios = db.execute(consulta).all()
+    return conteos, cambios
+
+class ProgresoTrabajo:
+    """
+    Rendimiento y tiempo estimado de un trabajo a partir de los conteos
+    observados. Usa una ventana deslizante de ventana_s segundos; mientras no
+    hay suficientes observaciones, el promedio desde que se creó el trabajo.
+    """
+
+    def __init__(self, creado: Optional[datetime], ventana_s: float = 30):
+        self.creado = creado
+        self.ventana_s = ventana_s
+        self._muestras = deque()
+
+    def actualizar(self, conteos: Dict[str, int]) -> Dict:
+        terminados = conteos["completado"] + conteos["fallido"]
+        restantes = conteos["pendiente"] + conteos["en_proceso"]
+        ahora = time.monotonic()
+        self._muestras.append((ahora, terminados))
+        while len(self._muestras) > 2 and ahora - self._muestras[0][0] > self.ventana_s:
+            self._muestras.popleft()
+
+        rendimiento = None
+        inicio, terminados_inicio = self._muestras[0]
+        if ahora - inicio >= 1 and terminados > terminados_inicio:
+            rendimiento = (terminados - terminados_inicio) / (ahora - inicio)
+        elif self.creado is not None and terminados:
+            transcurrido = (datetime.now(timezone.utc) - self.creado).total_seconds()
+            if transcurrido > 0:
+                rendimiento = terminados / transcurrido
+
+        eta = None
+        if restantes == 0:
+            eta = 0
+        elif rendimiento:
+            eta = round(restantes / rendimiento, 1)
+
+        return {
+            "estado": estado_trabajo(conteos),
+            "total": terminados + restantes,
+            "completados": conteos["completado"],
+            "fallidos": conteos["fallido"],
+            "pendientes": conteos["pendiente"],
+            "en_proceso": conteos["en_proceso"],
+            "por_minuto": round(rendimiento * 60, 1) if rendimiento else None,
+            "eta_s": eta
+        }
+
+class GestorTrabajos:
+    """
+    Hilos que atienden la cola de constancias guardada en trabajos_items.
+    Cada constancia se toma con UPDATE ... FOR UPDATE SKIP LOCKED, así que
+    varios workers de uvicorn (o varios servidores) pueden compartir la cola
+    sin broker. Las constancias que quedaron en proceso cuando un worker se
+    detuvo se devuelven a la cola tras item_timeout segundos.
+    """
+
+    def __init__(self, hilos: int, intervalo: float, max_intentos: int, item_timeout: int, directorio: str):
+        self.hilos = hilos
+        self.intervalo = intervalo
+        self.max_intentos = max_intentos
+        self.item_timeout = item_timeout
+        self.directorio = directorio
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._lock_revision = threading.Lock()
+        self._proxima_revision = 0.0
+        self._hilos: List[threading.Thread] = []
+
+    def iniciar(self) -> None:
+        if self._hilos or self.hilos <= 0:
+            return
+        os.makedirs(self.directorio, exist_ok=True)
+        self._detener.clear()
+        self._recuperar_abandonados()
+        for numero in range(self.hilos):
+            hilo = threading.Thread(target=self._ciclo, name=f"trabajos-{numero}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+        logger.info("Gestor de trabajos iniciado con %d hilos", self.hilos)
+
+    def detener(self, timeout: float = 30) -> None:
+        """Los hilos terminan la constancia en curso y salen"""
+        self._detener.set()
+        self._despertar.set()
+        for hilo in self._hilos:
+            hilo.join(timeout)
+        self._hilos = []
+
+    def despertar(self) -> None:
+        """Avisar que hay constancias nuevas sin esperar al siguiente sondeo"""
+        self._despertar.set()
+
+    def _ciclo(self) -> None:
+        while not self._detener.is_set():
+            try:
+                self._revisar_abandonados()
+                item = self._tomar()
+            except Exception:
+                logger.exception("Error al leer la cola de trabajos")
+                item = None
+            if item is None:
+                self._despertar.wait(self.intervalo)
+                self._despertar.clear()
+                continue
+            try:
+                self._procesar(item)
+            except Exception:
+                # No se pudo guardar el resultado (por ejemplo, se cayó la BD);
+                # el item queda en proceso y _recuperar_abandonados lo devuelve
+                # a la cola, pero el hilo sigue atendiendo
+                logger.exception("Error al registrar el resultado del item %s", item.id)
+
+    def _tomar(self):
+        """Marcar como en proceso la siguiente constancia pendiente y devolverla"""
+        siguiente = (
+            select(TrabajoItem.id)
+            .where(TrabajoItem.estado == "pendiente")
+            .order_by(TrabajoItem.prioridad.desc(), TrabajoItem.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        with SessionLocal() as db:
+            item = db.execute(
+                update(TrabajoItem)
+                .where(TrabajoItem.id == siguiente)
+                .values(
+                    estado="en_proceso",
+                    intentos=TrabajoItem.intentos + 1,
+                    worker=self.worker,
+                    tomado_at=func.now(),
+                    updated_at=func.now()
+                )
+                .returning(
+                    TrabajoItem.id, TrabajoItem.trabajo_id, TrabajoItem.solicitud_id,
+                    TrabajoItem.datos, TrabajoItem.intentos,
+                    select(TrabajoGeneracion.tipo)
+                    .where(TrabajoGeneracion.id == TrabajoItem.trabajo_id)
+                    .scalar_subquery().label("tipo")
+                )
+                .execution_options(synchronize_session=False)
+            ).one_or_none()
+            db.commit()
+        return item
+
+    def _procesar(self, item) -> None:
+        directorio = f"{self.directorio}/{item.trabajo_id}"
+        # La transacción empieza antes del render; clock_timestamp marca el
+        # momento real del cambio para el stream de progreso
+        valores = {"updated_at": func.clock_timestamp()}
+        with SessionLocal() as db:
+            try:
+                if item.tipo == "prerender":
+                    # Se registra al reclamarlo (tomar_prerender) con las variables guardadas en datos
+                    qr_id, archivo_pdf, variables = pregenerar_constancia_de_solicitud(
+                        db, item.solicitud_id, directorio
+                    )
+                    resultado = {"qr_id": qr_id, "archivo_pdf": archivo_pdf, "datos": variables}
+                else:
+                    if item.solicitud_id is not None:
+                        constancia = generar_constancia_de_solicitud(db, item.solicitud_id, directorio)
+                    else:
+                        constancia = generar_constancia_individual(db, item.datos, directorio)
+                    resultado = {"qr_id": constancia.qr_id, "archivo_pdf": constancia.archivo_pdf}
+            except ErrorGeneracion as e:
+                # Reintentar no cambiaría el resultado
+                db.rollback()
+                valores.update(estado="fallido", error=str(e))
+            except Exception as e:
+                logger.exception("Error al generar la constancia del item %s", item.id)
+                # La transacción pudo quedar abortada antes de llegar a
+                # generar_y_registrar (que hace su propio rollback)
+                db.rollback()
+                reintentar = item.intentos < self.max_intentos
+                valores.update(estado="pendiente" if reintentar else "fallido", error=str(e))
+            else:
+                valores.update(estado="completado", error=None, **resultado)
+            db.execute(
+                update(TrabajoItem)
+                .where(TrabajoItem.id == item.id)
+                .values(**valores)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        trabajos_items.labels(valores["estado"]).inc()
+
+    def _revisar_abandonados(self) -> None:
+        """Un solo hilo por worker revisa cada item_timeout / 2 segundos"""
+        ahora = time.monotonic()
+        if ahora < self._proxima_revision or not self._lock_revision.acquire(blocking=False):
+            return
+        try:
+            self._proxima_revision = ahora + self.item_timeout / 2
+            self._recuperar_abandonados()
+        finally:
+            self._lock_revision.release()
+
+    def _recuperar_abandonados(self) -> None:
+        """Devolver a la cola (o dar por fallidas) las constancias en proceso hace demasiado"""
+        limite = func.now() - timedelta(seconds=self.item_timeout)
+        abandonado = (TrabajoItem.estado == "en_proceso") & (TrabajoItem.tomado_at < limite)
+        with SessionLocal() as db:
+            fallidos = db.execute(
+                update(TrabajoItem)
+                .where(abandonado, TrabajoItem.intentos >= self.max_intentos)
+                .values(estado="fallido", error="Tiempo de procesamiento agotado", updated_at=func.now())
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            reintentos = db.execute(
+                update(TrabajoItem)
+                .where(abandonado)
+                .values(estado="pendiente", updated_at=func.now())
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+        if fallidos or reintentos:
+            logger.warning(
+                "Constancias abandonadas: %d devueltas a la cola, %d fallidas", reintentos, fallidos,
+                extra={"reintentos": reintentos, "fallidos": fallidos}
+            )
+
+gestor_trabajos = GestorTrabajos(
+    hilos=settings.TRABAJOS_HILOS,
+    intervalo=settings.TRABAJOS_INTERVALO,
+    max_intentos=settings.TRABAJOS_MAX_INTENTOS,
+    item_timeout=settings.TRABAJOS_ITEM_TIMEOUT,
+    directorio=settings.TRABAJOS_DIR
+)
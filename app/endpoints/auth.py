@@ -1,27 +1,28 @@
 from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.orm import Session
+from sqlalchemy import func, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from typing import List, Dict
 from database.database import get_db
 from models import models  # Importar modelos SQLAlchemy
+from config.config import settings
+from core.auth import SECRET_KEY, ALGORITHM, get_current_user_id, obtener_usuario, invalidar_usuario
 import jwt
+import logging
 from jwt.exceptions import InvalidTokenError
 from datetime import datetime, timedelta
-import os
-from dotenv import load_dotenv
 from fastapi import Header
 from pydantic import BaseModel, constr
 from schemas.schemas import (
     CredentialRequest, User, UserCreate, UserUpdate  # Estos son esquemas Pydantic
 )
 
-load_dotenv()
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = "HS256"
+router = APIRouter()
+logger = logging.getLogger(__name__)
 
 if not SECRET_KEY:
-    print("SECRET_KEY no encontrada en las variables de entorno.")
-
-router = APIRouter()
+    logger.warning("SECRET_KEY no encontrada en las variables de entorno.")
 
 def create_access_token(data: Dict) -> str:
     to_encode = data.copy()
@@ -50,35 +51,51 @@ async def verify_credential(request: CredentialRequest, db: Session = Depends(ge
         if not google_sub or not email:
             raise HTTPException(status_code=400, detail="Invalid credential: missing required fields")
         
-        # Buscar usuario existente por sub (usando el modelo SQLAlchemy)
-        existing_user = db.query(models.User).filter(models.User.sub == google_sub).first()
-        
-        if existing_user:
-            # Usuario ya existe, usar datos existentes
-            user_id = existing_user.id
-            is_admin = existing_user.admin
-            genero = existing_user.genero
-            tipo_empleado = existing_user.tipo_empleado
-        else:
-            # Crear nuevo usuario (usando el modelo SQLAlchemy)
-            new_user = models.User(
-                sub=google_sub,
-                nombre=nombre_completo,
-                email=email,
-                genero=None,  # Será None por defecto
-                tipo_empleado=None,  # Nueva columna: será None por defecto
-                grado_academico=None,
-                admin=False  # Por defecto False
-            )
-            
-            db.add(new_user)
+        # Crear el usuario o, si ya existe (mismo sub), obtener sus datos con una
+        # sola sentencia. El DO UPDATE no cambia nada, pero hace que RETURNING
+        # devuelva la fila existente y resuelve la carrera entre primeros logins.
+        stmt = pg_insert(models.User).values(
+            sub=google_sub,
+            nombre=nombre_completo,
+            email=email,
+            genero=None,  # Será None por defecto
+            tipo_empleado=None,  # Nueva columna: será None por defecto
+            grado_academico=None,
+            admin=False  # Por defecto False
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[models.User.sub],
+            set_={"sub": stmt.excluded.sub}
+        ).returning(
+            models.User.id, models.User.admin, models.User.genero, models.User.tipo_empleado
+        )
+        
+        try:
+            usuario = db.execute(stmt).one()
+            db.commit()
+        except IntegrityError:
+            # El email ya existe con otro sub: usuario importado desde el padrón,
+            # se vincula con su cuenta de Google
+            db.rollback()
+            usuario = db.execute(
+                update(models.User)
+                .where(
+                    func.lower(models.User.email) == email.lower(),
+                    models.User.sub.startswith(settings.ROSTER_SUB_PREFIX)
+                )
+                .values(sub=google_sub)
+                .returning(models.User.id, models.User.admin, models.User.genero, models.User.tipo_empleado)
+            ).one_or_none()
+            if usuario is None:
+                db.rollback()
+                raise HTTPException(status_code=409, detail="El email ya está registrado con otra cuenta")
             db.commit()
-            db.refresh(new_user)
-            
-            user_id = new_user.id
-            is_admin = new_user.admin
-            genero = new_user.genero
-            tipo_empleado = new_user.tipo_empleado
+            invalidar_usuario(usuario.id)
+        
+        user_id = usuario.id
+        is_admin = usuario.admin
+        genero = usuario.genero
+        tipo_empleado = usuario.tipo_empleado
         
         # Crear token JWT de larga duración
         token_data = {
@@ -99,6 +116,8 @@ async def verify_credential(request: CredentialRequest, db: Session = Depends(ge
             "expires": "never"
         }
         
+    except HTTPException:
+        raise
     except InvalidTokenError as e:
         raise HTTPException(status_code=400, detail=f"Invalid credential: {str(e)}")
     except Exception as e:
@@ -113,39 +132,6 @@ class UpdateGenderRequest(BaseModel):
 class UpdateEmployeeTypeRequest(BaseModel):
     tipo_empleado: constr(pattern=r'^(Docente|Administrativo)$')  
 
-# Función auxiliar para extraer y validar el token
-def get_current_user_id(authorization: str = Header(..., alias="Authorization")) -> int:
-    """
-    Extrae y valida el token de autorización, devuelve el user_id
-    """
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Authorization header missing")
-    
-    # Extraer el token (formato: "Bearer <token>")
-    try:
-        scheme, token = authorization.split(' ', 1)
-        if scheme.lower() != "bearer":
-            raise HTTPException(status_code=401, detail="Invalid authentication scheme")
-    except ValueError:
-        raise HTTPException(status_code=401, detail="Invalid authorization header format")
-    
-    # Decodificar el token
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        
-        # Verificar que es un access token
-        if payload.get("type") != "access":
-            raise HTTPException(status_code=401, detail="Invalid token type")
-        
-        user_id = payload.get("user_id")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token payload")
-        
-        return user_id
-            
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid access token")
-
 # Endpoint para actualizar género
 @router.put("/update-gender")
 async def update_gender(
@@ -177,6 +163,7 @@ async def update_gender(
         # Guardar cambios
         db.commit()
         db.refresh(user)
+        invalidar_usuario(user.id)
         
         return {
             "message": "Género actualizado exitosamente",
@@ -222,6 +209,7 @@ async def update_employee_type(
         # Guardar cambios
         db.commit()
         db.refresh(user)
+        invalidar_usuario(user.id)
         
         return {
             "message": "Tipo de empleado actualizado exitosamente",
@@ -248,19 +236,17 @@ async def verify_token(
     try:
         user_id = get_current_user_id(authorization)
         
-        # Buscar el usuario en la base de datos
-        user = db.query(models.User).filter(models.User.id == user_id).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
+        # Buscar el usuario (en memoria o en la base de datos)
+        user = obtener_usuario(db, user_id)
         
         return {
             "valid": True,
-            "user_id": user.id,
-            "admin": user.admin,
-            "genero": user.genero,
-            "tipo_empleado": user.tipo_empleado,
-            "email": user.email,
-            "nombre": user.nombre
+            "user_id": user["user_id"],
+            "admin": user["admin"],
+            "genero": user["genero"],
+            "tipo_empleado": user["tipo_empleado"],
+            "email": user["email"],
+            "nombre": user["nombre"]
         }
         
     except HTTPException:
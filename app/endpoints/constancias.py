@@ -1,126 +1,31 @@
 # routes/constancias.py - Versión con IDs compatibles
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response
 from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, validator
-from sqlalchemy.orm import joinedload
 from fastapi import BackgroundTasks
-from pdf_generator import PDFGenerator
 from config.config import settings
 from database.database import get_db
-from models.models import DatosFijos, Solicitud, ConstanciaGenerada
+from models.models import Solicitud, ConstanciaGenerada
+from cache.datos_fijos import datos_fijos_cache
+from core.admission import limitador_render
+from core.auth import get_admin_user
+from core.metrics import medir_etapa
+from core.tiempos import TiemposServidor
+from core.trabajos import tomar_prerender
 from sqlalchemy import Boolean
+from generacion import (
+    asignar_qr_id, cargar_solicitud, datos_constancia_solicitud, formatear_fecha,
+    renderizar_constancia
+)
+import logging
 import os
-import secrets
-import string
 from datetime import datetime
+from typing import Dict, Optional
 
 router = APIRouter()
-pdf_generator = PDFGenerator()
-
-def generar_id_compatible(longitud=20):
-    """Generar ID compatible con el sistema original"""
-    caracteres = string.ascii_letters + string.digits
-    return ''.join(secrets.choice(caracteres) for _ in range(longitud))
-
-def formatear_fecha(fecha_str: str) -> str:
-    """Convertir fecha de dd/mm/yyyy a formato textual completo"""
-    # ... tu función existente de formateo de fecha ...
-    try:
-        fecha_obj = datetime.strptime(fecha_str, "%d/%m/%Y")
-        
-        meses = {
-            1: "enero", 2: "febrero", 3: "marzo", 4: "abril",
-            5: "mayo", 6: "junio", 7: "julio", 8: "agosto",
-            9: "septiembre", 10: "octubre", 11: "noviembre", 12: "diciembre"
-        }
-        
-        unidades = {
-            0: "", 1: "un", 2: "dos", 3: "tres", 4: "cuatro", 5: "cinco",
-            6: "seis", 7: "siete", 8: "ocho", 9: "nueve"
-        }
-        
-        decenas = {
-            10: "diez", 11: "once", 12: "doce", 13: "trece", 14: "catorce",
-            15: "quince", 16: "dieciséis", 17: "diecisiete", 18: "dieciocho",
-            19: "diecinueve", 20: "veinte", 30: "treinta"
-        }
-        
-        def numero_a_texto(num):
-            if num == 0:
-                return "cero"
-            elif 1 <= num <= 9:
-                return unidades[num]
-            elif 10 <= num <= 20:
-                return decenas[num]
-            elif 21 <= num <= 29:
-                return f"veinti{unidades[num - 20]}"
-            elif num == 30:
-                return "treinta"
-            elif 31 <= num <= 31:
-                return f"treinta y {unidades[num - 30]}"
-            else:
-                return str(num)
-        
-        def año_a_texto(año):
-            if año >= 2000 and año <= 2099:
-                decena = año - 2000
-                if decena == 0:
-                    return "dos mil"
-                elif 1 <= decena <= 9:
-                    return f"dos mil {unidades[decena]}"
-                elif decena == 10:
-                    return "dos mil diez"
-                elif 11 <= decena <= 19:
-                    return f"dos mil {decenas[decena]}"
-                elif decena == 20:
-                    return "dos mil veinte"
-                elif 21 <= decena <= 29:
-                    return f"dos mil veinti{unidades[decena - 20]}"
-                elif decena == 30:
-                    return "dos mil treinta"
-                elif 31 <= decena <= 39:
-                    return f"dos mil treinta y {unidades[decena - 30]}"
-                elif decena == 40:
-                    return "dos mil cuarenta"
-                elif 41 <= decena <= 49:
-                    return f"dos mil cuarenta y {unidades[decena - 40]}"
-                elif decena == 50:
-                    return "dos mil cincuenta"
-                elif 51 <= decena <= 59:
-                    return f"dos mil cincuenta y {unidades[decena - 50]}"
-                elif decena == 60:
-                    return "dos mil sesenta"
-                elif 61 <= decena <= 69:
-                    return f"dos mil sesenta y {unidades[decena - 60]}"
-                elif decena == 70:
-                    return "dos mil setenta"
-                elif 71 <= decena <= 79:
-                    return f"dos mil setenta y {unidades[decena - 70]}"
-                elif decena == 80:
-                    return "dos mil ochenta"
-                elif 81 <= decena <= 89:
-                    return f"dos mil ochenta y {unidades[decena - 80]}"
-                elif decena == 90:
-                    return "dos mil noventa"
-                elif 91 <= decena <= 99:
-                    return f"dos mil noventa y {unidades[decena - 90]}"
-            return str(año)
-        
-        dia = fecha_obj.day
-        mes = fecha_obj.month
-        año = fecha_obj.year
-        
-        dia_texto = numero_a_texto(dia)
-        mes_texto = meses[mes]
-        año_texto = año_a_texto(año)
-        
-        dia_palabra = "día" if dia == 1 else "días"
-        
-        return f"{dia_texto} {dia_palabra} del mes de {mes_texto} del año {año_texto}"
-        
-    except ValueError:
-        return fecha_str
+logger = logging.getLogger(__name__)
 
 class ConstanciaRequest(BaseModel):
     pseudonimo: str
@@ -143,25 +48,23 @@ class ConstanciaResponse(BaseModel):
     status: str
 
 @router.post("/constancia/individual", response_model=ConstanciaResponse)
-async def generar_constancia_individual(constancia: ConstanciaRequest, db: Session = Depends(get_db)):
+async def generar_constancia_individual(
+    constancia: ConstanciaRequest,
+    response: Response,
+    db: Session = Depends(get_db)
+):
     """Generar una constancia individual con datos simplificados"""
+    # Desglose por etapa para el encabezado Server-Timing
+    tiempos = TiemposServidor()
     try:
         # Obtener datos fijos de la base de datos
-        datos_fijos = db.query(DatosFijos).first()
+        with medir_etapa("datos_fijos", tiempos):
+            datos_fijos = datos_fijos_cache.obtener(db)
         if not datos_fijos:
             raise HTTPException(status_code=500, detail="No se encontraron datos fijos en la base de datos")
         
         # CAMBIO IMPORTANTE: Generar ID compatible con el sistema original
-        idqrcode = generar_id_compatible(20)  # Genera algo como: vyBjmTqw4EwapcC6FuWg
-        
-        # Verificar que el ID no exista ya en la BD (por si acaso)
-        existing = db.query(ConstanciaGenerada).filter(ConstanciaGenerada.qr_id == idqrcode).first()
-        while existing:
-            idqrcode = generar_id_compatible(20)
-            existing = db.query(ConstanciaGenerada).filter(ConstanciaGenerada.qr_id == idqrcode).first()
-        
-        # Generar QR code
-        pdf_generator.generar_qrcode(idqrcode)
+        idqrcode = asignar_qr_id(db, tiempos)
         
         # Generar nombre de archivo
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -173,26 +76,21 @@ async def generar_constancia_individual(constancia: ConstanciaRequest, db: Sessi
         # Formatear el asunto
         asunto_formateado = f"ASUNTO: {constancia.texto_asunto}"
         
-        # Generar constancia con datos fijos y variables
-        pdf_generator.generar_constancia_simplificada(
-            idqrcode=idqrcode,
-            archivo_pdf=archivo_pdf,
-            texto_aqc=datos_fijos.texto_aqc,
-            texto_remitente=datos_fijos.texto_remitente,
-            texto_apeticion=datos_fijos.texto_apeticion,
-            texto_atte=datos_fijos.texto_atte,
-            texto_sursum=datos_fijos.texto_sursum,
-            texto_nombrefirma=datos_fijos.texto_nombrefirma,
-            texto_cargo=datos_fijos.texto_cargo,
-            texto_msgdigital=datos_fijos.texto_msgdigital,
-            texto_ccp=datos_fijos.texto_ccp,
-            pseudonimo=constancia.pseudonimo,
-            grado=constancia.grado.upper(),
-            nombre=constancia.nombre.upper(),
-            texto_asunto=asunto_formateado,
-            texto_consta=constancia.texto_consta,
-            fecha_emision=fecha_formateada,
-        )
+        # Generar QR y constancia con datos fijos y variables (503 si no hay turno)
+        async with limitador_render.turno(tiempos):
+            await run_in_threadpool(
+                renderizar_constancia,
+                idqrcode,
+                archivo_pdf,
+                datos_fijos,
+                tiempos,
+                pseudonimo=constancia.pseudonimo,
+                grado=constancia.grado.upper(),
+                nombre=constancia.nombre.upper(),
+                texto_asunto=asunto_formateado,
+                texto_consta=constancia.texto_consta,
+                fecha_emision=fecha_formateada,
+            )
         
         # Guardar la constancia en la base de datos
         nueva_constancia = ConstanciaGenerada(
@@ -207,9 +105,17 @@ async def generar_constancia_individual(constancia: ConstanciaRequest, db: Sessi
             es_valida=True
         )
         
-        db.add(nueva_constancia)
-        db.commit()
-        db.refresh(nueva_constancia)
+        with medir_etapa("db_insert", tiempos):
+            db.add(nueva_constancia)
+            db.commit()
+            db.refresh(nueva_constancia)
+        
+        server_timing = tiempos.encabezado()
+        response.headers["Server-Timing"] = server_timing
+        logger.info(
+            "Constancia individual %s generada: %s", idqrcode, server_timing,
+            extra={"qr_id": idqrcode, "tiempos": tiempos.como_dict()}
+        )
         
         return ConstanciaResponse(
             id=idqrcode,
@@ -220,10 +126,21 @@ async def generar_constancia_individual(constancia: ConstanciaRequest, db: Sessi
             status="success"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al generar constancia: {str(e)}")
 
+def eliminar_archivo(*rutas: str) -> None:
+    """Eliminar archivos temporales después de enviar la respuesta"""
+    try:
+        for ruta in rutas:
+            if os.path.exists(ruta):
+                os.remove(ruta)
+    except Exception as e:
+        logger.warning("Error al eliminar archivos temporales: %s", e)
+
 @router.get("/solicitudes/{solicitud_id}/constancia")
 async def obtener_constancia_solicitud(
     solicitud_id: int, 
@@ -231,13 +148,12 @@ async def obtener_constancia_solicitud(
     background_tasks: BackgroundTasks = BackgroundTasks()
 ):
     """Obtener PDF de constancia para una solicitud específica"""
+    # Desglose por etapa para el encabezado Server-Timing
+    tiempos = TiemposServidor()
     try:
         # Buscar la solicitud con sus relaciones
-        solicitud = db.query(Solicitud).options(
-            joinedload(Solicitud.usuario),
-            joinedload(Solicitud.categoria),
-            joinedload(Solicitud.edicion)
-        ).filter(Solicitud.id == solicitud_id).first()
+        with medir_etapa("solicitud", tiempos):
+            solicitud = cargar_solicitud(db, solicitud_id)
         
         if not solicitud:
             raise HTTPException(status_code=404, detail="Solicitud no encontrada")
@@ -245,109 +161,87 @@ async def obtener_constancia_solicitud(
         if solicitud.estado.lower() != 'aceptado':
             raise HTTPException(status_code=400, detail="La constancia solo está disponible para solicitudes aceptadas")
         
+        # Si se pre-generó al aceptar la solicitud, servir ese PDF sin renderizar
+        if settings.PRERENDER_ACEPTADAS:
+            with medir_etapa("prerender", tiempos):
+                archivo_previo = tomar_prerender(db, solicitud)
+            if archivo_previo:
+                background_tasks.add_task(eliminar_archivo, archivo_previo)
+                server_timing = tiempos.encabezado()
+                logger.info(
+                    "Constancia pre-generada de la solicitud %s entregada: %s", solicitud_id, server_timing,
+                    extra={"solicitud_id": solicitud_id, "tiempos": tiempos.como_dict()}
+                )
+                return FileResponse(
+                    path=archivo_previo,
+                    filename=f"Constancia_Solicitud_{solicitud_id}.pdf",
+                    media_type='application/pdf',
+                    headers={"Server-Timing": server_timing},
+                    background=background_tasks
+                )
+        
         # Obtener datos fijos de la base de datos
-        datos_fijos = db.query(DatosFijos).first()
+        with medir_etapa("datos_fijos", tiempos):
+            datos_fijos = datos_fijos_cache.obtener(db)
         if not datos_fijos:
             raise HTTPException(status_code=500, detail="No se encontraron datos fijos en la base de datos")
         
         # CAMBIO IMPORTANTE: Usar ID compatible en lugar del formato largo
-        idqrcode = generar_id_compatible(20)
-        
-        # Verificar que el ID no exista ya
-        existing = db.query(ConstanciaGenerada).filter(ConstanciaGenerada.qr_id == idqrcode).first()
-        while existing:
-            idqrcode = generar_id_compatible(20)
-            existing = db.query(ConstanciaGenerada).filter(ConstanciaGenerada.qr_id == idqrcode).first()
-        
-        # Generar QR code
-        pdf_generator.generar_qrcode(idqrcode)
+        idqrcode = asignar_qr_id(db, tiempos)
         
         # Generar nombre de archivo temporal
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         archivo_pdf = f"{settings.CONSTANCIAS_DIR}/Constancia_Solicitud_{solicitud_id}_{timestamp}.pdf"
         qr_path = f"{settings.QR_DIR}/{idqrcode}.png"
         
-        # Formatear la fecha de emisión (usar fecha actual)
-        fecha_actual = datetime.now().strftime("%d/%m/%Y")
-        fecha_formateada = formatear_fecha(fecha_actual)
-        
-        # Formatear el asunto usando el asunto de la categoría
-        asunto_formateado = f"ASUNTO: {solicitud.categoria.asunto}"
-        
-        # Generar texto de constancia basado en la descripción de la solicitud
-        texto_consta = solicitud.descripcion or f"Constancia para {solicitud.categoria.nombre} - {solicitud.edicion.nombre} - {solicitud.periodo}"
-        
-        # Determinar pseudónimo basado en género
-        if solicitud.usuario.genero and solicitud.usuario.genero.lower() == 'masculino':
-            pseudonimo = "el"
-        elif solicitud.usuario.genero and solicitud.usuario.genero.lower() == 'femenino':
-            pseudonimo = "la"
-        else:
-            pseudonimo = "el/la"
-        
-        # Usar el grado académico de la solicitud o del usuario
-        grado = (solicitud.grado_academico or solicitud.usuario.grado_academico or "").upper()
-        
-        # Guardar en BD antes de generar PDF
-        nueva_constancia = ConstanciaGenerada(
-            qr_id=idqrcode,
-            nombre=solicitud.usuario.nombre.upper(),
-            grado=grado,
-            pseudonimo=pseudonimo,
-            texto_asunto=asunto_formateado,
-            texto_consta=texto_consta,
-            fecha_emision=fecha_formateada,
-            archivo_pdf=archivo_pdf,
-            es_valida=True
-        )
-        
-        db.add(nueva_constancia)
-        db.commit()
-        db.refresh(nueva_constancia)
-        
-        # Generar constancia
-        pdf_generator.generar_constancia_simplificada(
-            idqrcode=idqrcode,
-            archivo_pdf=archivo_pdf,
-            texto_aqc=datos_fijos.texto_aqc,
-            texto_remitente=datos_fijos.texto_remitente,
-            texto_apeticion=datos_fijos.texto_apeticion,
-            texto_atte=datos_fijos.texto_atte,
-            texto_sursum=datos_fijos.texto_sursum,
-            texto_nombrefirma=datos_fijos.texto_nombrefirma,
-            texto_cargo=datos_fijos.texto_cargo,
-            texto_msgdigital=datos_fijos.texto_msgdigital,
-            texto_ccp=datos_fijos.texto_ccp,
-            pseudonimo=pseudonimo,
-            grado=grado,
-            nombre=solicitud.usuario.nombre.upper(),
-            texto_asunto=asunto_formateado,
-            texto_consta=texto_consta,
-            fecha_emision=fecha_formateada,
-        )
+        # Textos de la constancia (pseudónimo, grado, asunto, fecha, etc.)
+        variables = datos_constancia_solicitud(solicitud)
+        
+        # Esperar turno para renderizar antes de escribir en la BD: si el
+        # servidor está saturado se responde 503 sin dejar registros huérfanos
+        async with limitador_render.turno(tiempos):
+            # Guardar en BD antes de generar PDF
+            nueva_constancia = ConstanciaGenerada(
+                qr_id=idqrcode,
+                archivo_pdf=archivo_pdf,
+                es_valida=True,
+                **variables
+            )
+            
+            with medir_etapa("db_insert", tiempos):
+                db.add(nueva_constancia)
+                db.commit()
+                db.refresh(nueva_constancia)
+            
+            # Generar QR y constancia
+            await run_in_threadpool(
+                renderizar_constancia,
+                idqrcode,
+                archivo_pdf,
+                datos_fijos,
+                tiempos,
+                **variables
+            )
         
         # Verificar que el archivo se haya generado
         if not os.path.exists(archivo_pdf):
             raise HTTPException(status_code=500, detail="Error al generar el PDF")
 
-        # Función para eliminar archivos temporales
-        def eliminar_archivos_temporales():
-            try:
-                if os.path.exists(archivo_pdf):
-                    os.remove(archivo_pdf)
-                if os.path.exists(qr_path):
-                    os.remove(qr_path)
-            except Exception as e:
-                print(f"Error al eliminar archivos temporales: {str(e)}")
-
-        # Agregar tarea en segundo plano para eliminar los archivos
-        background_tasks.add_task(eliminar_archivos_temporales)
+        # Agregar tarea en segundo plano para eliminar los archivos temporales
+        background_tasks.add_task(eliminar_archivo, archivo_pdf, qr_path)
+        
+        server_timing = tiempos.encabezado()
+        logger.info(
+            "Constancia de la solicitud %s generada: %s", solicitud_id, server_timing,
+            extra={"solicitud_id": solicitud_id, "qr_id": idqrcode, "tiempos": tiempos.como_dict()}
+        )
         
         # Retornar el archivo PDF
         return FileResponse(
             path=archivo_pdf,
             filename=f"Constancia_Solicitud_{solicitud_id}.pdf",
             media_type='application/pdf',
+            headers={"Server-Timing": server_timing},
             background=background_tasks
         )
         
@@ -366,6 +260,11 @@ async def obtener_constancia_solicitud(
         raise HTTPException(status_code=500, detail=f"Error al generar constancia: {str(e)}")
 
 # Resto de tus endpoints existentes...
+@router.get("/constancia/cola")
+async def estado_cola_render(current_user: Dict = Depends(get_admin_user)):
+    """Profundidad de la cola y tiempos de espera de la generación de PDFs (solo administradores)"""
+    return limitador_render.estadisticas()
+
 @router.get("/constancia/download/{filename}")
 async def descargar_constancia(filename: str):
     """Descargar archivo de constancia"""
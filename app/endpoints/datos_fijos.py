@@ -1,95 +1,22 @@
-from fastapi import APIRouter, HTTPException, Depends, Header, File, UploadFile
+from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Response
 from sqlalchemy.orm import Session
 from typing import Dict, Optional
 from database.database import get_db
 from models import models
+from core.auth import get_current_user, get_admin_user
+from cache.datos_fijos import datos_fijos_cache
 from schemas.schemas import (
     DatosFijos, DatosFijosUpdate
 )
-import jwt
-from jwt.exceptions import InvalidTokenError
-import os
-from dotenv import load_dotenv
 import shutil
 from pathlib import Path
 
-load_dotenv()
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = "HS256"
-
 router = APIRouter()
 
 # Configuración de rutas de archivos
 ASSETS_DIR = Path(__file__).resolve().parent.parent.parent / "assets"
 ASSETS_DIR.mkdir(exist_ok=True)
 
-# Función auxiliar para extraer y validar el access token
-async def get_current_user(
-    authorization: str = Header(..., alias="Authorization"),
-    db: Session = Depends(get_db)
-) -> Dict:
-    """
-    Extrae y valida el access token del header Authorization.
-    Retorna los datos del usuario autenticado.
-    """
-    try:
-        # Verificar que el header Authorization existe
-        if not authorization:
-            raise HTTPException(status_code=401, detail="Authorization header missing")
-        
-        # Extraer el token (formato: "Bearer <token>")
-        try:
-            scheme, token = authorization.split(' ', 1)
-            if scheme.lower() != "bearer":
-                raise HTTPException(status_code=401, detail="Invalid authentication scheme")
-        except ValueError:
-            raise HTTPException(status_code=401, detail="Invalid authorization header format")
-        
-        # Decodificar el token
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            
-            # Verificar que es un access token
-            if payload.get("type") != "access":
-                raise HTTPException(status_code=401, detail="Invalid token type")
-            
-            user_id = payload.get("user_id")
-            if not user_id:
-                raise HTTPException(status_code=401, detail="Invalid token payload")
-                
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(status_code=401, detail="Access token expired")
-        except jwt.InvalidTokenError:
-            raise HTTPException(status_code=401, detail="Invalid access token")
-        
-        # Buscar el usuario en la base de datos
-        user = db.query(models.User).filter(models.User.id == user_id).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        return {
-            "user_id": user.id,
-            "admin": user.admin,
-            "sub": user.sub,
-            "email": user.email,
-            "nombre": user.nombre
-        }
-        
-    except HTTPException:
-        raise  # Re-lanzar HTTPExceptions
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
-
-# FUNCIÓN PARA VERIFICAR PERMISOS DE ADMINISTRADOR
-async def get_admin_user(current_user: Dict = Depends(get_current_user)) -> Dict:
-    """
-    Verifica que el usuario actual sea administrador.
-    Basado en el campo 'admin' del access_token decodificado.
-    """
-    if not current_user.get("admin", False):
-        raise HTTPException(status_code=403, detail="Se requieren permisos de administrador para esta operación")
-    return current_user
-
 # Función auxiliar para validar archivos PNG
 def validar_archivo_png(file: UploadFile) -> None:
     """
@@ -108,6 +35,7 @@ def validar_archivo_png(file: UploadFile) -> None:
 
 @router.get("/datos-fijos", response_model=Optional[DatosFijos])
 async def obtener_datos_fijos(
+    response: Response,
     db: Session = Depends(get_db),
     current_user: Dict = Depends(get_current_user)
 ):
@@ -115,18 +43,32 @@ async def obtener_datos_fijos(
     Obtener los datos fijos - Requiere autenticación
     Todos los usuarios autenticados pueden ver los datos
     """
-    # Obtener el primer (y único) registro de datos fijos
-    datos_fijos = db.query(models.DatosFijos).first()
+    # Obtener el primer (y único) registro de datos fijos desde la cache
+    datos_fijos = datos_fijos_cache.obtener(db)
     
     # Si no existe, crear uno vacío
     if not datos_fijos:
-        datos_fijos = models.DatosFijos()
-        db.add(datos_fijos)
+        nuevo = models.DatosFijos()
+        db.add(nuevo)
         db.commit()
-        db.refresh(datos_fijos)
+        db.refresh(nuevo)
+        datos_fijos = datos_fijos_cache.actualizar(nuevo)
     
+    response.headers["X-Datos-Fijos-Version"] = str(datos_fijos.version)
     return datos_fijos
 
+@router.get("/datos-fijos/version")
+async def obtener_version_datos_fijos(
+    db: Session = Depends(get_db),
+    current_user: Dict = Depends(get_current_user)
+):
+    """
+    Obtener la versión vigente de los datos fijos - Requiere autenticación
+    Cambia cada vez que se modifican, sirve como llave de cache
+    """
+    datos_fijos_cache.obtener(db)
+    return {"version": datos_fijos_cache.version}
+
 @router.put("/datos-fijos", response_model=DatosFijos)
 async def actualizar_datos_fijos(
     datos_fijos_update: DatosFijosUpdate,
@@ -150,6 +92,7 @@ async def actualizar_datos_fijos(
     
     db.commit()
     db.refresh(datos_fijos)
+    datos_fijos_cache.actualizar(datos_fijos)
     
     return datos_fijos
 
@@ -182,6 +125,7 @@ async def inicializar_datos_fijos(
     db.add(datos_fijos)
     db.commit()
     db.refresh(datos_fijos)
+    datos_fijos_cache.actualizar(datos_fijos)
     
     return datos_fijos
 
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, Query
+from typing import Dict
+import os
+from core.auth import get_admin_user
+from core.slow_queries import consultas_lentas
+from core.scheduler import programador
+
+router = APIRouter()
+
+@router.get("/admin/consultas-lentas")
+async def listar_consultas_lentas(
+    limite: int = Query(50, ge=1, le=1000),
+    orden: str = Query("reciente", pattern=r"^(reciente|duracion)$"),
+    current_user: Dict = Depends(get_admin_user)
+):
+    """
+    Consultas SQL más lentas que el umbral registradas por este worker.
+    Solo muestra el buffer en memoria del worker que atiende la petición
+    (su pid va en la respuesta); con varios workers, las de todos están en
+    los logs por worker (CONSULTAS_LENTAS_LOG con el pid antes de la extensión).
+    """
+    return {
+        "pid": os.getpid(),
+        "umbral_ms": consultas_lentas.umbral_ms,
+        "total_registradas": consultas_lentas.total,
+        "consultas": consultas_lentas.entradas(limite, orden)
+    }
+
+@router.delete("/admin/consultas-lentas")
+async def limpiar_consultas_lentas(current_user: Dict = Depends(get_admin_user)):
+    """Vaciar el buffer de consultas lentas de este worker"""
+    consultas_lentas.limpiar()
+    return {"message": "Buffer de consultas lentas vaciado"}
+
+@router.get("/admin/programador")
+async def estado_programador(current_user: Dict = Depends(get_admin_user)):
+    """Tareas programadas de este worker y si tiene el lock para ejecutar las exclusivas"""
+    return {
+        "pid": os.getpid(),
+        "lider": programador.es_lider,
+        "tareas": programador.estado()
+    }
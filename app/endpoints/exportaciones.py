@@ -0,0 +1,173 @@
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from typing import Dict, Optional
+from datetime import datetime
+from database.database import SessionLocal
+from models import models
+from core.auth import get_admin_user
+from openpyxl import Workbook
+import tempfile
+import csv
+import io
+
+router = APIRouter()
+
+# Filas que se piden al cursor del servidor en cada viaje
+TAMANO_LOTE = 1000
+# Tamaño de los bloques que se envían al cliente
+TAMANO_BLOQUE = 64 * 1024
+
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+ENCABEZADOS_SOLICITUDES = [
+    "id", "nombre", "email", "genero", "grado_academico", "codigo_categoria",
+    "categoria", "edicion", "periodo", "descripcion", "fecha_solicitud",
+    "estado", "created_at", "updated_at"
+]
+
+ENCABEZADOS_CONSTANCIAS = [
+    "qr_id", "nombre", "grado", "pseudonimo", "texto_asunto", "texto_consta",
+    "fecha_emision", "fecha_creacion", "archivo_pdf", "es_valida"
+]
+
+def iterar_filas(stmt):
+    """
+    Recorre el resultado con un cursor del lado del servidor (yield_per),
+    manteniendo en memoria solo un lote de filas a la vez.
+    Usa su propia sesión porque se consume mientras se envía la respuesta.
+    """
+    db = SessionLocal()
+    try:
+        for fila in db.execute(stmt.execution_options(yield_per=TAMANO_LOTE)):
+            yield fila
+    finally:
+        db.close()
+
+def generar_csv(encabezados, filas):
+    """Escribe el CSV de forma incremental; el encabezado sale antes de consultar la BD"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    # BOM para que Excel abra correctamente el archivo en UTF-8
+    buffer.write("\ufeff")
+    writer.writerow(encabezados)
+
+    for fila in filas:
+        if buffer.tell() >= TAMANO_BLOQUE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        writer.writerow(fila)
+
+    yield buffer.getvalue()
+
+def _valor_excel(valor):
+    # Excel no admite fechas con zona horaria
+    if isinstance(valor, datetime) and valor.tzinfo is not None:
+        return valor.replace(tzinfo=None)
+    return valor
+
+def generar_xlsx(encabezados, filas, titulo: str):
+    """
+    Genera el XLSX con openpyxl en modo write-only, que vuelca las filas a disco
+    en lugar de mantenerlas en memoria. El formato ZIP solo puede enviarse al
+    terminar de escribirse, después se transmite por bloques.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=titulo)
+    ws.append(encabezados)
+
+    for fila in filas:
+        ws.append([_valor_excel(valor) for valor in fila])
+
+    with tempfile.TemporaryFile() as archivo:
+        wb.save(archivo)
+        archivo.seek(0)
+        while True:
+            bloque = archivo.read(TAMANO_BLOQUE)
+            if not bloque:
+                break
+            yield bloque
+
+def respuesta_exportacion(encabezados, stmt, formato: str, nombre: str) -> StreamingResponse:
+    """Construye la respuesta en streaming según el formato solicitado"""
+    if formato not in FORMATOS:
+        raise HTTPException(status_code=400, detail=f"Formato no válido. Opciones: {', '.join(FORMATOS)}")
+
+    filas = iterar_filas(stmt)
+    if formato == "csv":
+        contenido = generar_csv(encabezados, filas)
+    else:
+        contenido = generar_xlsx(encabezados, filas, titulo=nombre)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return StreamingResponse(
+        contenido,
+        media_type=FORMATOS[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nombre}_{timestamp}.{formato}"'}
+    )
+
+# ENDPOINTS DE EXPORTACIÓN - Solo administradores
+@router.get("/exportar/solicitudes")
+async def exportar_solicitudes(
+    formato: str = "csv",
+    edicion_id: Optional[int] = None,
+    estado: Optional[str] = None,
+    admin_user: Dict = Depends(get_admin_user)
+):
+    """Exportar las solicitudes (opcionalmente de una edición) en CSV o XLSX"""
+    stmt = select(
+        models.Solicitud.id,
+        models.User.nombre,
+        models.User.email,
+        models.User.genero,
+        models.Solicitud.grado_academico,
+        models.Categoria.codigo_categoria,
+        models.Categoria.nombre,
+        models.Edicion.nombre,
+        models.Solicitud.periodo,
+        models.Solicitud.descripcion,
+        models.Solicitud.fecha_solicitud,
+        models.Solicitud.estado,
+        models.Solicitud.created_at,
+        models.Solicitud.updated_at
+    ).join(models.User, models.Solicitud.user_id == models.User.id)\
+        .join(models.Categoria, models.Solicitud.categoria_id == models.Categoria.id)\
+        .join(models.Edicion, models.Solicitud.edicion_id == models.Edicion.id)\
+        .order_by(models.Solicitud.id)
+
+    if edicion_id is not None:
+        stmt = stmt.where(models.Solicitud.edicion_id == edicion_id)
+    if estado is not None:
+        stmt = stmt.where(models.Solicitud.estado == estado)
+
+    return respuesta_exportacion(ENCABEZADOS_SOLICITUDES, stmt, formato, "solicitudes")
+
+@router.get("/exportar/constancias")
+async def exportar_constancias(
+    formato: str = "csv",
+    solo_validas: bool = False,
+    admin_user: Dict = Depends(get_admin_user)
+):
+    """Exportar las constancias generadas en CSV o XLSX"""
+    stmt = select(
+        models.ConstanciaGenerada.qr_id,
+        models.ConstanciaGenerada.nombre,
+        models.ConstanciaGenerada.grado,
+        models.ConstanciaGenerada.pseudonimo,
+        models.ConstanciaGenerada.texto_asunto,
+        models.ConstanciaGenerada.texto_consta,
+        models.ConstanciaGenerada.fecha_emision,
+        models.ConstanciaGenerada.fecha_creacion,
+        models.ConstanciaGenerada.archivo_pdf,
+        models.ConstanciaGenerada.es_valida
+    ).order_by(models.ConstanciaGenerada.id)
+
+    if solo_validas:
+        stmt = stmt.where(models.ConstanciaGenerada.es_valida == True)
+
+    return respuesta_exportacion(ENCABEZADOS_CONSTANCIAS, stmt, formato, "constancias")
@@ -0,0 +1,272 @@
+from fastapi import APIRouter, HTTPException, Depends, File, UploadFile
+from sqlalchemy.orm import Session
+from sqlalchemy import func, insert, literal_column, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from pydantic import ValidationError
+from typing import Dict, Iterator, List, Tuple
+from datetime import date
+from database.database import get_db
+from models import models
+from cache.referencias import referencias_cache
+from config.config import settings
+from core.auth import get_admin_user, invalidar_usuarios
+from endpoints.solicitudes import formatear_grado_academico
+from plantillas import compilar_plantilla
+from schemas.schemas import UsuarioImportacion, SolicitudImportacion, ResultadoImportacion
+from openpyxl import load_workbook
+import csv
+import io
+
+router = APIRouter()
+
+# Filas que se validan e insertan por sentencia
+TAMANO_LOTE = 500
+
+COLUMNAS_SOLICITUD = set(SolicitudImportacion.model_fields)
+
+def leer_filas(archivo: UploadFile) -> Iterator[Tuple[int, Dict]]:
+    """
+    Lee un archivo CSV o XLSX y devuelve (número de fila, datos) por cada renglón.
+    Los encabezados se normalizan a minúsculas, los valores se convierten a texto
+    y las celdas vacías quedan como None.
+    """
+    nombre = (archivo.filename or "").lower()
+
+    if nombre.endswith(".csv"):
+        texto = io.TextIOWrapper(archivo.file, encoding="utf-8-sig", newline="")
+        renglones = csv.reader(texto)
+    elif nombre.endswith(".xlsx"):
+        wb = load_workbook(archivo.file, read_only=True, data_only=True)
+        renglones = wb.active.iter_rows(values_only=True)
+    else:
+        raise HTTPException(status_code=400, detail="Solo se permiten archivos CSV o XLSX")
+
+    encabezados = next(renglones, None)
+    if not encabezados:
+        raise HTTPException(status_code=400, detail="El archivo está vacío")
+    encabezados = [str(e).strip().lower() if e is not None else "" for e in encabezados]
+
+    # La fila 1 es el encabezado
+    for numero, renglon in enumerate(renglones, start=2):
+        datos = {}
+        for encabezado, valor in zip(encabezados, renglon):
+            if not encabezado:
+                continue
+            # Todo se valida como texto, como llegaría desde un CSV
+            if isinstance(valor, float) and valor.is_integer():
+                valor = int(valor)
+            if valor is not None:
+                valor = str(valor).strip()
+            datos[encabezado] = valor or None
+
+        # Ignorar renglones completamente vacíos
+        if any(v is not None for v in datos.values()):
+            yield numero, datos
+
+def en_lotes(filas, tamano: int = TAMANO_LOTE) -> Iterator[List]:
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+def errores_validacion(error: ValidationError) -> List[str]:
+    return [f"{'.'.join(str(c) for c in e['loc'])}: {e['msg']}" for e in error.errors()]
+
+@router.post("/importar/usuarios", response_model=ResultadoImportacion)
+async def importar_usuarios(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    admin_user: Dict = Depends(get_admin_user)
+):
+    """
+    Importar el padrón de usuarios desde CSV/XLSX - Solo administradores
+    Columnas: nombre, email, genero, tipo_empleado, grado_academico
+    Los usuarios existentes (mismo email, sin distinguir mayúsculas) conservan
+    su nombre y solo se actualizan los campos que vienen con valor en el archivo.
+    """
+    procesadas = insertados = actualizados = 0
+    rechazados = []
+    vistos = set()
+
+    try:
+        for lote in en_lotes(leer_filas(file)):
+            valores = []
+            for numero, datos in lote:
+                procesadas += 1
+                try:
+                    usuario = UsuarioImportacion.model_validate(datos)
+                except ValidationError as e:
+                    rechazados.append({"fila": numero, "email": datos.get("email"), "errores": errores_validacion(e)})
+                    continue
+
+                email = usuario.email.lower()
+                # ON CONFLICT no puede afectar la misma fila dos veces en una sentencia
+                if email in vistos:
+                    rechazados.append({"fila": numero, "email": email, "errores": ["Email duplicado en el archivo"]})
+                    continue
+                vistos.add(email)
+
+                valores.append({
+                    "sub": f"{settings.ROSTER_SUB_PREFIX}{email}",
+                    "nombre": usuario.nombre,
+                    "email": email,
+                    "genero": usuario.genero,
+                    "tipo_empleado": usuario.tipo_empleado,
+                    "grado_academico": formatear_grado_academico(usuario.grado_academico),
+                    "admin": False
+                })
+
+            if not valores:
+                continue
+
+            stmt = pg_insert(models.User).values(valores)
+            stmt = stmt.on_conflict_do_update(
+                # Índice único sobre lower(email): coincide aunque el usuario
+                # existente se haya guardado con mayúsculas
+                index_elements=[func.lower(models.User.email)],
+                set_={
+                    "genero": func.coalesce(stmt.excluded.genero, models.User.genero),
+                    "tipo_empleado": func.coalesce(stmt.excluded.tipo_empleado, models.User.tipo_empleado),
+                    "grado_academico": func.coalesce(stmt.excluded.grado_academico, models.User.grado_academico),
+                    "updated_at": func.now()
+                }
+            ).returning(literal_column("(xmax = 0)").label("insertado"))
+
+            for fila in db.execute(stmt):
+                if fila.insertado:
+                    insertados += 1
+                else:
+                    actualizados += 1
+
+        db.commit()
+        # Los usuarios existentes pudieron cambiar de género o tipo de empleado
+        if actualizados:
+            invalidar_usuarios()
+
+    except HTTPException:
+        db.rollback()
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error al importar usuarios: {str(e)}")
+    finally:
+        file.file.close()
+
+    return {
+        "mensaje": "Importación de usuarios completada",
+        "procesadas": procesadas,
+        "insertados": insertados,
+        "actualizados": actualizados,
+        "rechazados": rechazados
+    }
+
+@router.post("/importar/solicitudes", response_model=ResultadoImportacion)
+async def importar_solicitudes(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    admin_user: Dict = Depends(get_admin_user)
+):
+    """
+    Importar solicitudes desde CSV/XLSX - Solo administradores
+    Columnas: email, codigo_categoria, edicion_id, periodo y opcionalmente
+    grado_academico, descripcion y estado. Si no viene la descripción, se genera
+    con la plantilla de la categoría usando el resto de las columnas.
+    """
+    procesadas = insertados = 0
+    rechazados = []
+    hoy = date.today()
+
+    try:
+        for lote in en_lotes(leer_filas(file)):
+            validas = []
+            for numero, datos in lote:
+                procesadas += 1
+                try:
+                    solicitud = SolicitudImportacion.model_validate(datos)
+                except ValidationError as e:
+                    rechazados.append({"fila": numero, "email": datos.get("email"), "errores": errores_validacion(e)})
+                    continue
+
+                errores = []
+                categoria = referencias_cache.categoria_por_codigo(db, solicitud.codigo_categoria)
+                if categoria is None:
+                    errores.append(f"Categoría '{solicitud.codigo_categoria}' no encontrada")
+                edicion = referencias_cache.edicion(db, solicitud.edicion_id)
+                if edicion is None:
+                    errores.append(f"Edición {solicitud.edicion_id} no encontrada")
+                elif solicitud.periodo not in [edicion.periodo1, edicion.periodo2]:
+                    errores.append("Período no válido para la edición seleccionada")
+
+                if errores:
+                    rechazados.append({"fila": numero, "email": solicitud.email, "errores": errores})
+                    continue
+
+                validas.append((numero, datos, solicitud, categoria))
+
+            if not validas:
+                continue
+
+            # Una consulta por lote para resolver los usuarios
+            emails = {s.email.lower() for _, _, s, _ in validas}
+            usuarios = {
+                u.email.lower(): u for u in db.execute(
+                    select(models.User.id, models.User.email, models.User.grado_academico)
+                    .where(func.lower(models.User.email).in_(emails))
+                )
+            }
+
+            valores = []
+            for numero, datos, solicitud, categoria in validas:
+                usuario = usuarios.get(solicitud.email.lower())
+                if usuario is None:
+                    rechazados.append({"fila": numero, "email": solicitud.email, "errores": ["Usuario no registrado"]})
+                    continue
+
+                descripcion = solicitud.descripcion
+                if descripcion is None:
+                    campos = {k: v for k, v in datos.items() if k not in COLUMNAS_SOLICITUD and v is not None}
+                    descripcion, faltantes = compilar_plantilla(categoria.descripcion or "").renderizar(campos)
+                    if faltantes:
+                        rechazados.append({
+                            "fila": numero,
+                            "email": solicitud.email,
+                            "errores": [f"Faltan campos de la plantilla: {', '.join(faltantes)}"]
+                        })
+                        continue
+
+                valores.append({
+                    "user_id": usuario.id,
+                    "categoria_id": categoria.id,
+                    "edicion_id": solicitud.edicion_id,
+                    "periodo": solicitud.periodo,
+                    "grado_academico": formatear_grado_academico(solicitud.grado_academico or usuario.grado_academico or ""),
+                    "descripcion": descripcion,
+                    "fecha_solicitud": hoy,
+                    "estado": solicitud.estado or "pendiente"
+                })
+
+            if valores:
+                db.execute(insert(models.Solicitud), valores)
+                insertados += len(valores)
+
+        db.commit()
+
+    except HTTPException:
+        db.rollback()
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error al importar solicitudes: {str(e)}")
+    finally:
+        file.file.close()
+
+    return {
+        "mensaje": "Importación de solicitudes completada",
+        "procesadas": procesadas,
+        "insertados": insertados,
+        "rechazados": rechazados
+    }
@@ -1,165 +1,88 @@
-from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
+from sqlalchemy import update
 from typing import List, Dict
 from database.database import get_db
 from models import models
+from core.auth import get_current_user, get_admin_user
+from cache.edicion_actual import edicion_actual_cache
+from cache.referencias import referencias_cache, generar_etag, etag_coincide
+from core.serializacion import edicion_a_dict
 from schemas.schemas import (
     Periodo, PeriodoCreate, PeriodoUpdate,
 )
-import jwt
-from jwt.exceptions import InvalidTokenError
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = "HS256"
+from datetime import date
+import logging
 
 router = APIRouter()
-
-# Función auxiliar para extraer y validar el access token
-async def get_current_user(
-    authorization: str = Header(..., alias="Authorization"),
-    db: Session = Depends(get_db)
-) -> Dict:
-    """
-    Extrae y valida el access token del header Authorization.
-    Retorna los datos del usuario autenticado.
-    """
-    try:
-        if not authorization:
-            raise HTTPException(status_code=401, detail="Authorization header missing")
-        
-        try:
-            scheme, token = authorization.split(' ', 1)
-            if scheme.lower() != "bearer":
-                raise HTTPException(status_code=401, detail="Invalid authentication scheme")
-        except ValueError:
-            raise HTTPException(status_code=401, detail="Invalid authorization header format")
-        
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            
-            if payload.get("type") != "access":
-                raise HTTPException(status_code=401, detail="Invalid token type")
-            
-            user_id = payload.get("user_id")
-            if not user_id:
-                raise HTTPException(status_code=401, detail="Invalid token payload")
-                
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(status_code=401, detail="Access token expired")
-        except jwt.InvalidTokenError:
-            raise HTTPException(status_code=401, detail="Invalid access token")
-        
-        user = db.query(models.User).filter(models.User.id == user_id).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        return {
-            "user_id": user.id,
-            "admin": user.admin,
-            "sub": user.sub,
-            "email": user.email,
-            "nombre": user.nombre
-        }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
-
-async def get_admin_user(current_user: Dict = Depends(get_current_user)) -> Dict:
-    """Verifica que el usuario actual sea administrador."""
-    if not current_user.get("admin", False):
-        raise HTTPException(status_code=403, detail="Se requieren permisos de administrador para esta operación")
-    return current_user
+logger = logging.getLogger(__name__)
 
 def calcular_estado_periodo(fecha_inicio: str, fecha_fin: str) -> str:
     """Calcula el estado del período basado en las fechas y la fecha actual."""
-    from datetime import datetime, date
+    from datetime import datetime
     
     if isinstance(fecha_inicio, str):
         fecha_inicio = datetime.strptime(fecha_inicio, "%Y-%m-%d").date()
     if isinstance(fecha_fin, str):
         fecha_fin = datetime.strptime(fecha_fin, "%Y-%m-%d").date()
     
-    hoy = date.today()
-    
-    if hoy < fecha_inicio:
-        return "programado"
-    elif fecha_inicio <= hoy <= fecha_fin:
-        return "activo"
-    else:
-        return "finalizado"
+    return models.estado_por_fechas(fecha_inicio, fecha_fin)
+
+def invalidar_caches_ediciones() -> None:
+    """Descartar las ediciones en memoria después de cualquier escritura"""
+    edicion_actual_cache.invalidar()
+    referencias_cache.invalidar_ediciones()
+
+def sincronizar_estados_ediciones(db: Session) -> int:
+    """
+    Actualiza en una sola sentencia el estado guardado de las ediciones
+    cuyo estado por fechas cambió. Retorna cuántas se actualizaron.
+    """
+    resultado = db.execute(
+        update(models.Edicion)
+        .where(models.Edicion.estado.is_distinct_from(models.Edicion.estado_actual))
+        # El estado guardado solo refleja las fechas: no es una edición de
+        # los datos, así que no cambia updated_at (lo usa la vigencia de los
+        # PDFs pre-generados)
+        .values(estado=models.Edicion.estado_actual, updated_at=models.Edicion.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return resultado.rowcount
 
 # ✅ ENDPOINT ACTUALIZADO
 @router.get("/periodos/edicion-actual")
 async def obtener_edicion_actual(db: Session = Depends(get_db)):
-    """Obtener la edición que está actualmente en curso Y ACTIVA"""
+    """
+    Obtener la edición que está actualmente en curso Y ACTIVA.
+    Se sirve desde memoria hasta el siguiente cambio de fechas o hasta
+    que se modifique alguna edición.
+    """
     try:
-        from datetime import date
-        
-        hoy = date.today()
-        print(f"[DEBUG] Fecha actual: {hoy}")
-        
-        # Solo buscar ediciones activas
-        edicion_actual = db.query(models.Edicion).filter(
-            models.Edicion.fecha_inicio <= hoy,
-            models.Edicion.fecha_fin >= hoy,
-            models.Edicion.activa == True
-        ).first()
-        
-        print(f"[DEBUG] Edición encontrada: {edicion_actual}")
+        edicion_actual = edicion_actual_cache.obtener(db)
         
         if edicion_actual is None:
-            # Si no hay edición activa en curso, buscar la más reciente activa
-            edicion_actual = db.query(models.Edicion).filter(
-                models.Edicion.activa == True
-            ).order_by(
-                models.Edicion.fecha_inicio.desc()
-            ).first()
-            
-            if edicion_actual is None:
-                raise HTTPException(
-                    status_code=404, 
-                    detail="No hay ninguna edición activa disponible en el sistema"
-                )
-        
-        try:
-            estado_actual = calcular_estado_periodo(edicion_actual.fecha_inicio, edicion_actual.fecha_fin)
-            if edicion_actual.estado != estado_actual:
-                edicion_actual.estado = estado_actual
-                db.commit()
-                db.refresh(edicion_actual)
-        except Exception as e:
-            print(f"[WARNING] Error al calcular estado: {e}")
+            raise HTTPException(
+                status_code=404, 
+                detail="No hay ninguna edición activa disponible en el sistema"
+            )
         
-        return {
-            "id": edicion_actual.id,
-            "nombre": edicion_actual.nombre,
-            "periodo1": edicion_actual.periodo1,
-            "periodo2": edicion_actual.periodo2,
-            "estado": edicion_actual.estado,
-            "fecha_inicio": str(edicion_actual.fecha_inicio) if edicion_actual.fecha_inicio else None,
-            "fecha_fin": str(edicion_actual.fecha_fin) if edicion_actual.fecha_fin else None,
-            "activa": edicion_actual.activa
-        }
+        return edicion_actual
         
     except HTTPException:
         raise
     except Exception as e:
-        print(f"[ERROR] Error en obtener_edicion_actual: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error en obtener_edicion_actual")
         raise HTTPException(
             status_code=500,
             detail=f"Error interno del servidor: {str(e)}"
         )
 
 # ✅ ENDPOINT ACTUALIZADO
-@router.get("/periodos", response_model=List[Periodo])
+@router.get("/periodos", response_model=List[Periodo], response_class=ORJSONResponse)
 async def listar_periodos(
+    request: Request,
     skip: int = 0, 
     limit: int = 100, 
     incluir_inactivas: bool = True,
@@ -167,21 +90,24 @@ async def listar_periodos(
     current_user: Dict = Depends(get_current_user)
 ):
     """Listar ediciones - Requiere autenticación"""
-    query = db.query(models.Edicion)
+    # El estado se calcula por fechas al leer, nunca se escribe en un GET
+    ediciones = referencias_cache.ediciones(db)
     
     if not incluir_inactivas:
-        query = query.filter(models.Edicion.activa == True)
-    
-    ediciones = query.offset(skip).limit(limit).all()
+        ediciones = [e for e in ediciones if e.activa]
     
-    # Actualizar estados
-    for edicion in ediciones:
-        estado_actual = calcular_estado_periodo(edicion.fecha_inicio, edicion.fecha_fin)
-        if edicion.estado != estado_actual:
-            edicion.estado = estado_actual
-            db.commit()
+    # El estado depende del día, por eso la fecha forma parte del ETag
+    etag = generar_etag(
+        "periodos", referencias_cache.firma_ediciones(db), date.today(),
+        skip, limit, incluir_inactivas
+    )
+    if etag_coincide(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
     
-    return ediciones
+    return ORJSONResponse(
+        [edicion_a_dict(e) for e in ediciones[skip:skip + limit]],
+        headers={"ETag": etag}
+    )
 
 @router.get("/periodos/{periodo_id}", response_model=Periodo)
 async def obtener_periodo(
@@ -190,7 +116,7 @@ async def obtener_periodo(
     current_user: Dict = Depends(get_current_user)
 ):
     """Obtener una edición por ID - Requiere autenticación"""
-    edicion = db.query(models.Edicion).filter(models.Edicion.id == periodo_id).first()
+    edicion = referencias_cache.edicion(db, periodo_id)
     if edicion is None:
         raise HTTPException(status_code=404, detail="Edición no encontrada")
     return edicion
@@ -239,6 +165,7 @@ async def crear_periodo(
     db.add(db_edicion)
     db.commit()
     db.refresh(db_edicion)
+    invalidar_caches_ediciones()
     return db_edicion
 
 # ✅ ENDPOINT ACTUALIZADO
@@ -304,6 +231,7 @@ async def actualizar_periodo(
     
     db.commit()
     db.refresh(db_edicion)
+    invalidar_caches_ediciones()
     return db_edicion
 
 # ✅ NUEVO ENDPOINT: Toggle activa/inactiva
@@ -340,6 +268,7 @@ async def toggle_edicion_activa(
     db_edicion.activa = not db_edicion.activa
     db.commit()
     db.refresh(db_edicion)
+    invalidar_caches_ediciones()
     
     accion = "activada" if db_edicion.activa else "desactivada"
     return {"mensaje": f"Edición {accion} exitosamente", "edicion": db_edicion}
@@ -367,9 +296,11 @@ async def eliminar_periodo(
         db_edicion.activa = False
         db.commit()
         db.refresh(db_edicion)
+        invalidar_caches_ediciones()
         return {"mensaje": "Edición desactivada exitosamente (tiene solicitudes asociadas)"}
     else:
         # Si no hay solicitudes, permitir eliminación física
         db.delete(db_edicion)
         db.commit()
+        invalidar_caches_ediciones()
         return {"mensaje": "Edición eliminada exitosamente"}
\ No newline at end of file
@@ -1,16 +1,27 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
+from sqlalchemy import select, update, insert, func, any_, bindparam, BigInteger
+from sqlalchemy.dialects.postgresql import ARRAY
 from typing import List
-import re
+import logging
 from datetime import date
 from database.database import get_db
 from models import models
+from core.auth import invalidar_usuario
+from core.trabajos import encolar_prerender
+from core.serializacion import solicitud_listado, solicitud_de_usuario
+from cache.referencias import referencias_cache
+from plantillas import compilar_plantilla
 from schemas.schemas import (
     Solicitud, SolicitudCreate, SolicitudUpdate, SolicitudFormulario,
-    CamposDinamicos, Categoria
+    CamposDinamicos, Categoria, SolicitudesEstadoUpdate, SolicitudFormularioLote
 )
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+ESTADOS_SOLICITUD = ("pendiente", "aceptado", "rechazado")
 
 def extraer_campos_de_plantilla(descripcion: str) -> List[str]:
     """
@@ -20,10 +31,8 @@ def extraer_campos_de_plantilla(descripcion: str) -> List[str]:
     if not descripcion:
         return []
     
-    # Buscar todos los patrones {campo}
-    patron = r'\{([^}]+)\}'
-    campos = re.findall(patron, descripcion)
-    return campos
+    # La plantilla compilada ya conoce sus campos
+    return list(compilar_plantilla(descripcion).campos)
 
 def reemplazar_campos_en_plantilla(plantilla: str, datos: dict) -> str:
     """
@@ -32,10 +41,7 @@ def reemplazar_campos_en_plantilla(plantilla: str, datos: dict) -> str:
     if not plantilla:
         return ""
     
-    descripcion_final = plantilla
-    for campo, valor in datos.items():
-        descripcion_final = descripcion_final.replace(f"{{{campo}}}", str(valor))
-    
+    descripcion_final, _ = compilar_plantilla(plantilla).renderizar(datos)
     return descripcion_final
 
 # # ENDPOINTS PARA USUARIOS
@@ -142,49 +148,39 @@ def formatear_grado_academico(grado: str) -> str:
     
     return grado_formateado
 
-@router.get("/solicitudes")
+@router.get("/solicitudes", response_class=ORJSONResponse)
 async def listar_solicitudes(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     """Listar todas las solicitudes con datos relacionados"""
-    solicitudes = db.query(models.Solicitud)\
-        .join(models.User)\
-        .join(models.Categoria)\
-        .join(models.Edicion)\
-        .offset(skip)\
-        .limit(limit)\
-        .all()
-    
-    # Formatear la respuesta para incluir los datos relacionados
-    resultado = []
-    for solicitud in solicitudes:
-        resultado.append({
-            "id": solicitud.id,
-            "user_id": solicitud.user_id,
-            "categoria_id": solicitud.categoria_id,
-            "edicion_id": solicitud.edicion_id,
-            "periodo": solicitud.periodo,
-            "grado_academico": solicitud.grado_academico,
-            "descripcion": solicitud.descripcion,
-            "fecha_solicitud": solicitud.fecha_solicitud,
-            "estado": solicitud.estado,
-            "created_at": solicitud.created_at,
-            "updated_at": solicitud.updated_at,
-            # Datos relacionados
-            "usuario": {
-                "nombre": solicitud.usuario.nombre,
-                "email": solicitud.usuario.email,
-                "genero": solicitud.usuario.genero,
-                "grado_academico": solicitud.usuario.grado_academico
-            },
-            "categoria": {
-                "codigo_categoria": solicitud.categoria.codigo_categoria,
-                "nombre": solicitud.categoria.nombre
-            },
-            "edicion": {
-                "nombre": solicitud.edicion.nombre
-            }
-        })
+    # Solo las columnas que se devuelven, en una consulta con joins
+    filas = db.execute(
+        select(
+            models.Solicitud.id,
+            models.Solicitud.user_id,
+            models.Solicitud.categoria_id,
+            models.Solicitud.edicion_id,
+            models.Solicitud.periodo,
+            models.Solicitud.grado_academico,
+            models.Solicitud.descripcion,
+            models.Solicitud.fecha_solicitud,
+            models.Solicitud.estado,
+            models.Solicitud.created_at,
+            models.Solicitud.updated_at,
+            models.User.nombre.label("usuario_nombre"),
+            models.User.email.label("usuario_email"),
+            models.User.genero.label("usuario_genero"),
+            models.User.grado_academico.label("usuario_grado_academico"),
+            models.Categoria.codigo_categoria,
+            models.Categoria.nombre.label("categoria_nombre"),
+            models.Edicion.nombre.label("edicion_nombre")
+        )
+        .join(models.User, models.Solicitud.user_id == models.User.id)
+        .join(models.Categoria, models.Solicitud.categoria_id == models.Categoria.id)
+        .join(models.Edicion, models.Solicitud.edicion_id == models.Edicion.id)
+        .offset(skip)
+        .limit(limit)
+    )
     
-    return resultado
+    return ORJSONResponse([solicitud_listado(fila) for fila in filas])
 
 @router.post("/solicitudes/formulario")
 async def crear_solicitud_desde_formulario(solicitud_form: SolicitudFormulario, db: Session = Depends(get_db)):
@@ -192,12 +188,12 @@ async def crear_solicitud_desde_formulario(solicitud_form: SolicitudFormulario,
     Crear una nueva solicitud procesando la plantilla de la categoría
     """
     # Obtener la categoría para acceder a la plantilla
-    categoria = db.query(models.Categoria).filter(models.Categoria.id == solicitud_form.categoria_id).first()
+    categoria = referencias_cache.categoria(db, solicitud_form.categoria_id)
     if categoria is None:
         raise HTTPException(status_code=404, detail="Categoría no encontrada")
     
     # Verificar que la edición existe
-    edicion = db.query(models.Edicion).filter(models.Edicion.id == solicitud_form.edicion_id).first()
+    edicion = referencias_cache.edicion(db, solicitud_form.edicion_id)
     if edicion is None:
         raise HTTPException(status_code=404, detail="Edición no encontrada")
     
@@ -206,8 +202,7 @@ async def crear_solicitud_desde_formulario(solicitud_form: SolicitudFormulario,
         raise HTTPException(status_code=400, detail="Período no válido para la edición seleccionada")
     
     # Procesar la plantilla
-    descripcion_final = reemplazar_campos_en_plantilla(
-        categoria.descripcion or "", 
+    descripcion_final, campos_faltantes = compilar_plantilla(categoria.descripcion or "").renderizar(
         solicitud_form.datos_dinamicos
     )
     
@@ -224,13 +219,72 @@ async def crear_solicitud_desde_formulario(solicitud_form: SolicitudFormulario,
     )
     
     db.add(db_solicitud)
+    # El id llega con el INSERT ... RETURNING, no hace falta refrescar
+    db.flush()
+    solicitud_id = db_solicitud.id
     db.commit()
-    db.refresh(db_solicitud)
     
     return {
         "mensaje": "Solicitud creada exitosamente",
-        "solicitud_id": db_solicitud.id,
-        "descripcion_generada": descripcion_final
+        "solicitud_id": solicitud_id,
+        "descripcion_generada": descripcion_final,
+        "campos_faltantes": campos_faltantes
+    }
+
+@router.post("/solicitudes/formulario/lote")
+async def crear_solicitudes_desde_formulario_lote(lote: SolicitudFormularioLote, db: Session = Depends(get_db)):
+    """
+    Crear muchas solicitudes de la misma categoría y edición.
+    La plantilla se compila una vez y se renderiza para cada conjunto de datos;
+    todas las solicitudes se insertan en una sola sentencia.
+    """
+    categoria = referencias_cache.categoria(db, lote.categoria_id)
+    if categoria is None:
+        raise HTTPException(status_code=404, detail="Categoría no encontrada")
+    
+    edicion = referencias_cache.edicion(db, lote.edicion_id)
+    if edicion is None:
+        raise HTTPException(status_code=404, detail="Edición no encontrada")
+    
+    if lote.periodo not in [edicion.periodo1, edicion.periodo2]:
+        raise HTTPException(status_code=400, detail="Período no válido para la edición seleccionada")
+    
+    plantilla = compilar_plantilla(categoria.descripcion or "")
+    renderizados = plantilla.renderizar_lote(lote.datos)
+    hoy = date.today()
+    
+    valores = []
+    rechazadas = []
+    for indice, (datos, (descripcion_final, campos_faltantes)) in enumerate(zip(lote.datos, renderizados)):
+        if not datos.get("user_id"):
+            rechazadas.append({"indice": indice, "error": "Falta user_id"})
+            continue
+        valores.append({
+            "user_id": datos["user_id"],
+            "categoria_id": lote.categoria_id,
+            "edicion_id": lote.edicion_id,
+            "periodo": lote.periodo,
+            "grado_academico": formatear_grado_academico(datos.get("grado", "")),
+            "descripcion": descripcion_final,
+            "fecha_solicitud": hoy,
+            "estado": "pendiente"
+        })
+    
+    ids = []
+    if valores:
+        try:
+            stmt = insert(models.Solicitud).returning(models.Solicitud.id, sort_by_parameter_order=True)
+            ids = [row.id for row in db.execute(stmt, valores)]
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            raise HTTPException(status_code=500, detail=f"Error al crear solicitudes: {str(e)}")
+    
+    return {
+        "mensaje": f"{len(ids)} solicitudes creadas exitosamente",
+        "solicitud_ids": ids,
+        "rechazadas": rechazadas,
+        "campos_plantilla": list(plantilla.campos)
     }
 
 @router.post("/solicitudes", response_model=Solicitud)
@@ -240,9 +294,7 @@ async def crear_solicitud(solicitud: SolicitudCreate, db: Session = Depends(get_
     
     # Si viene con datos_formulario, procesar la plantilla
     if solicitud_data.get("datos_formulario"):
-        categoria = db.query(models.Categoria).filter(
-            models.Categoria.id == solicitud_data["categoria_id"]
-        ).first()
+        categoria = referencias_cache.categoria(db, solicitud_data["categoria_id"])
         
         if categoria and categoria.descripcion:
             descripcion_final = reemplazar_campos_en_plantilla(
@@ -260,6 +312,14 @@ async def crear_solicitud(solicitud: SolicitudCreate, db: Session = Depends(get_
     db.refresh(db_solicitud)
     return db_solicitud
 
+def prerender_aceptadas(db: Session, solicitud_ids: List[int]) -> None:
+    """Encolar la constancia de las solicitudes que pasaron a aceptado; si falla, el cambio de estado ya quedó guardado"""
+    try:
+        encolar_prerender(db, solicitud_ids)
+    except Exception:
+        db.rollback()
+        logger.exception("No se pudo encolar la pre-generación de constancias")
+
 @router.get("/solicitudes/{solicitud_id}", response_model=Solicitud)
 async def obtener_solicitud(solicitud_id: int, db: Session = Depends(get_db)):
     """Obtener una solicitud por ID"""
@@ -275,13 +335,77 @@ async def actualizar_solicitud(solicitud_id: int, solicitud: SolicitudUpdate, db
     if db_solicitud is None:
         raise HTTPException(status_code=404, detail="Solicitud no encontrada")
     
+    estado_anterior = (db_solicitud.estado or "").lower()
     for field, value in solicitud.dict(exclude_unset=True).items():
         setattr(db_solicitud, field, value)
     
     db.commit()
     db.refresh(db_solicitud)
+    
+    if estado_anterior != "aceptado" and (db_solicitud.estado or "").lower() == "aceptado":
+        prerender_aceptadas(db, [db_solicitud.id])
     return db_solicitud
 
+@router.patch("/solicitudes/estado")
+async def actualizar_estado_solicitudes(cambio: SolicitudesEstadoUpdate, db: Session = Depends(get_db)):
+    """
+    Cambiar el estado de varias solicitudes con una sola sentencia UPDATE.
+    Se pueden indicar los ids o filtrar por edición, categoría y estado actual.
+    """
+    if cambio.estado not in ESTADOS_SOLICITUD:
+        raise HTTPException(status_code=400, detail=f"Estado no válido. Opciones: {', '.join(ESTADOS_SOLICITUD)}")
+    
+    stmt = update(models.Solicitud).values(estado=cambio.estado, updated_at=func.now())
+    
+    if cambio.ids:
+        # Quitar duplicados conservando el orden para reportar cada id una vez
+        ids = list(dict.fromkeys(cambio.ids))
+        stmt = stmt.where(
+            models.Solicitud.id == any_(bindparam("ids", value=ids, type_=ARRAY(BigInteger)))
+        )
+    else:
+        ids = None
+        filtros = []
+        if cambio.edicion_id is not None:
+            filtros.append(models.Solicitud.edicion_id == cambio.edicion_id)
+        if cambio.categoria_id is not None:
+            filtros.append(models.Solicitud.categoria_id == cambio.categoria_id)
+        if cambio.estado_actual is not None:
+            filtros.append(models.Solicitud.estado == cambio.estado_actual)
+        
+        # Evitar actualizar toda la tabla por accidente
+        if not filtros:
+            raise HTTPException(status_code=400, detail="Debe indicar los ids o al menos un filtro")
+        stmt = stmt.where(*filtros)
+    
+    stmt = stmt.returning(models.Solicitud.id).execution_options(synchronize_session=False)
+    
+    try:
+        actualizadas = [row.id for row in db.execute(stmt)]
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error al actualizar solicitudes: {str(e)}")
+    
+    if cambio.estado == "aceptado":
+        prerender_aceptadas(db, actualizadas)
+    
+    if ids is None:
+        resultados = [{"id": solicitud_id, "resultado": "actualizado"} for solicitud_id in actualizadas]
+    else:
+        encontradas = set(actualizadas)
+        resultados = [
+            {"id": solicitud_id, "resultado": "actualizado" if solicitud_id in encontradas else "no_encontrado"}
+            for solicitud_id in ids
+        ]
+    
+    return {
+        "mensaje": f"{len(actualizadas)} solicitudes actualizadas a '{cambio.estado}'",
+        "estado": cambio.estado,
+        "actualizadas": len(actualizadas),
+        "resultados": resultados
+    }
+
 @router.delete("/solicitudes/{solicitud_id}")
 async def eliminar_solicitud(solicitud_id: int, db: Session = Depends(get_db)):
     """Eliminar una solicitud"""
@@ -293,41 +417,29 @@ async def eliminar_solicitud(solicitud_id: int, db: Session = Depends(get_db)):
     db.commit()
     return {"mensaje": "Solicitud eliminada exitosamente"}
 
-@router.get("/usuarios/{user_id}/solicitudes")
+@router.get("/usuarios/{user_id}/solicitudes", response_class=ORJSONResponse)
 async def listar_solicitudes_usuario(user_id: int, db: Session = Depends(get_db)):
     """Listar solicitudes de un usuario específico con datos relacionados"""
-    solicitudes = db.query(models.Solicitud)\
-        .join(models.User)\
-        .join(models.Categoria)\
-        .join(models.Edicion)\
-        .filter(models.Solicitud.user_id == user_id)\
-        .order_by(models.Solicitud.created_at.desc())\
-        .all()
-    
-    # Formatear la respuesta (SIN incluir descripción)
-    resultado = []
-    for solicitud in solicitudes:
-        resultado.append({
-            "id": solicitud.id,
-            "fecha_solicitud": solicitud.fecha_solicitud,
-            "estado": solicitud.estado,
-            "grado_academico": solicitud.grado_academico,
-            "periodo": solicitud.periodo,
-            "created_at": solicitud.created_at,
-            # Datos relacionados
-            "categoria": {
-                "codigo_categoria": solicitud.categoria.codigo_categoria,
-                "nombre": solicitud.categoria.nombre
-            },
-            "edicion": {
-                "nombre": solicitud.edicion.nombre
-            }
-            # Nota: NO incluimos descripción ni datos completos del usuario
-        })
+    # Sin descripción ni datos completos del usuario
+    filas = db.execute(
+        select(
+            models.Solicitud.id,
+            models.Solicitud.fecha_solicitud,
+            models.Solicitud.estado,
+            models.Solicitud.grado_academico,
+            models.Solicitud.periodo,
+            models.Solicitud.created_at,
+            models.Categoria.codigo_categoria,
+            models.Categoria.nombre.label("categoria_nombre"),
+            models.Edicion.nombre.label("edicion_nombre")
+        )
+        .join(models.Categoria, models.Solicitud.categoria_id == models.Categoria.id)
+        .join(models.Edicion, models.Solicitud.edicion_id == models.Edicion.id)
+        .where(models.Solicitud.user_id == user_id)
+        .order_by(models.Solicitud.created_at.desc())
+    )
     
-    return resultado
-
-
+    return ORJSONResponse([solicitud_de_usuario(fila) for fila in filas])
 
 
 @router.put("/usuarios/{user_id}/grado-academico")
@@ -369,6 +481,7 @@ async def actualizar_datos_personales(user_id: int, nombre: str, genero: str, db
     
     db.commit()
     db.refresh(usuario)
+    invalidar_usuario(user_id)
     
     return {
         "mensaje": "Datos personales actualizados exitosamente",
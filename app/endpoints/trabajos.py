@@ -0,0 +1,242 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from typing import Dict, List
+import asyncio
+import json
+import os
+import time
+from config.config import settings
+from database.database import get_db
+from models import models
+from core.auth import get_current_user, get_admin_user
+from core.trabajos import (
+    gestor_trabajos, crear_trabajo, contar_items, estado_trabajo, leer_cambios, ProgresoTrabajo
+)
+from schemas.schemas import TrabajoConstanciasCreate, TrabajoCreado, TrabajoEstado, TrabajoItemEstado
+
+router = APIRouter()
+
+# Segundos hacia atrás que revisa cada lectura del stream además del
+# intervalo, para no perder cambios confirmados con retraso
+MARGEN_CAMBIOS = 5
+
+def items_de_solicitudes(db: Session, solicitud_ids: List[int]) -> List[Dict]:
+    """Items para las solicitudes pedidas; las inexistentes o no aceptadas quedan como fallidas"""
+    solicitud_ids = list(dict.fromkeys(solicitud_ids))
+    estados = dict(db.execute(
+        select(models.Solicitud.id, models.Solicitud.estado)
+        .where(models.Solicitud.id.in_(solicitud_ids))
+    ).all())
+    items = []
+    for solicitud_id in solicitud_ids:
+        item = {"solicitud_id": solicitud_id if solicitud_id in estados else None}
+        if solicitud_id not in estados:
+            item["error"] = f"Solicitud {solicitud_id} no encontrada"
+        elif (estados[solicitud_id] or "").lower() != "aceptado":
+            item["error"] = "La constancia solo está disponible para solicitudes aceptadas"
+        items.append(item)
+    return items
+
+def obtener_trabajo_autorizado(db: Session, trabajo_id: str, current_user: Dict) -> models.TrabajoGeneracion:
+    """El trabajo solo lo consultan los administradores o quien lo creó"""
+    trabajo = db.query(models.TrabajoGeneracion).filter(models.TrabajoGeneracion.id == trabajo_id).first()
+    if not trabajo:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    if not current_user.get("admin", False) and trabajo.creado_por != current_user["user_id"]:
+        raise HTTPException(status_code=403, detail="No tienes permiso para consultar este trabajo")
+    return trabajo
+
+@router.post("/jobs/constancias", response_model=TrabajoCreado, status_code=202)
+async def crear_trabajo_constancias(
+    peticion: TrabajoConstanciasCreate,
+    db: Session = Depends(get_db),
+    admin_user: Dict = Depends(get_admin_user)
+):
+    """
+    Encolar la generación de constancias y responder de inmediato con el id
+    del trabajo. Acepta ids de solicitudes, una edición completa (sus
+    solicitudes aceptadas) o constancias individuales; el progreso se
+    consulta en GET /jobs/{id}.
+    """
+    items = []
+    if peticion.solicitud_ids:
+        items.extend(items_de_solicitudes(db, peticion.solicitud_ids))
+    if peticion.edicion_id is not None:
+        ids_edicion = db.execute(
+            select(models.Solicitud.id)
+            .where(
+                models.Solicitud.edicion_id == peticion.edicion_id,
+                func.lower(models.Solicitud.estado) == "aceptado"
+            )
+            .order_by(models.Solicitud.id)
+        ).scalars().all()
+        ya_incluidas = {item["solicitud_id"] for item in items}
+        items.extend({"solicitud_id": i} for i in ids_edicion if i not in ya_incluidas)
+    if peticion.constancias:
+        items.extend({"datos": c.dict()} for c in peticion.constancias)
+
+    if not items:
+        raise HTTPException(status_code=400, detail="El trabajo no incluye ninguna constancia")
+
+    individuales = len(peticion.constancias or [])
+    if individuales == len(items):
+        tipo = "individuales"
+    elif individuales:
+        tipo = "mixto"
+    else:
+        tipo = "solicitudes"
+    trabajo = crear_trabajo(db, tipo, items, creado_por=admin_user["user_id"])
+    gestor_trabajos.despertar()
+
+    return TrabajoCreado(
+        id=trabajo.id,
+        estado=estado_trabajo(contar_items(db, trabajo.id)),
+        total=trabajo.total,
+        url_estado=f"/jobs/{trabajo.id}"
+    )
+
+@router.get("/jobs/{trabajo_id}", response_model=TrabajoEstado)
+async def obtener_estado_trabajo(
+    trabajo_id: str,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: Dict = Depends(get_current_user)
+):
+    """Progreso del trabajo, ubicación de los PDFs y errores por constancia"""
+    trabajo = obtener_trabajo_autorizado(db, trabajo_id, current_user)
+    conteos = contar_items(db, trabajo_id)
+
+    items = db.query(models.TrabajoItem).filter(
+        models.TrabajoItem.trabajo_id == trabajo_id
+    ).order_by(models.TrabajoItem.posicion).offset(skip).limit(limit).all()
+
+    return TrabajoEstado(
+        id=trabajo.id,
+        tipo=trabajo.tipo,
+        estado=estado_trabajo(conteos),
+        total=trabajo.total,
+        pendientes=conteos["pendiente"],
+        en_proceso=conteos["en_proceso"],
+        completados=conteos["completado"],
+        fallidos=conteos["fallido"],
+        created_at=trabajo.created_at,
+        items=[
+            TrabajoItemEstado(
+                id=item.id,
+                posicion=item.posicion,
+                estado=item.estado,
+                solicitud_id=item.solicitud_id,
+                qr_id=item.qr_id,
+                url_pdf=f"/jobs/{trabajo_id}/items/{item.id}/pdf" if item.estado == "completado" else None,
+                error=item.error,
+                intentos=item.intentos,
+                updated_at=item.updated_at
+            )
+            for item in items
+        ]
+    )
+
+def evento_sse(evento: str, datos) -> str:
+    return f"event: {evento}\ndata: {json.dumps(datos, default=str, ensure_ascii=False)}\n\n"
+
+async def eventos_trabajo(request: Request, trabajo_id: str, creado):
+    """
+    Genera los eventos del stream. Cada intervalo se hace una lectura (conteos
+    y constancias modificadas recientemente) y se envía a lo sumo un
+    evento "progreso" y uno "items"; si nada cambió solo se envía un latido
+    de vez en cuando. Termina con "fin" cuando no quedan constancias pendientes.
+    """
+    progreso = ProgresoTrabajo(creado)
+    ventana = None  # La primera lectura trae todas las constancias ya procesadas
+    enviados: Dict[int, str] = {}
+    anterior = None
+    ultimo_envio = time.monotonic()
+
+    while not await request.is_disconnected():
+        conteos, cambios = await run_in_threadpool(leer_cambios, trabajo_id, ventana)
+        ventana = settings.TRABAJOS_EVENTOS_INTERVALO + MARGEN_CAMBIOS
+
+        items = []
+        for fila in cambios:
+            if enviados.get(fila.id) == fila.estado:
+                continue
+            enviados[fila.id] = fila.estado
+            items.append({
+                "id": fila.id,
+                "posicion": fila.posicion,
+                "estado": fila.estado,
+                "solicitud_id": fila.solicitud_id,
+                "error": fila.error,
+                "url_pdf": f"/jobs/{trabajo_id}/items/{fila.id}/pdf" if fila.estado == "completado" else None
+            })
+
+        resumen = progreso.actualizar(conteos)
+        if items:
+            yield evento_sse("items", items)
+        if resumen != anterior:
+            yield evento_sse("progreso", resumen)
+            anterior = resumen
+            ultimo_envio = time.monotonic()
+        elif items:
+            ultimo_envio = time.monotonic()
+        elif time.monotonic() - ultimo_envio >= settings.TRABAJOS_EVENTOS_LATIDO:
+            yield ": latido\n\n"
+            ultimo_envio = time.monotonic()
+
+        if resumen["pendientes"] == 0 and resumen["en_proceso"] == 0:
+            yield evento_sse("fin", resumen)
+            return
+
+        await asyncio.sleep(settings.TRABAJOS_EVENTOS_INTERVALO)
+
+@router.get("/jobs/{trabajo_id}/eventos")
+async def stream_progreso_trabajo(
+    request: Request,
+    trabajo_id: str,
+    db: Session = Depends(get_db),
+    current_user: Dict = Depends(get_current_user)
+):
+    """
+    Progreso del trabajo como Server-Sent Events: "progreso" (conteos,
+    constancias por minuto y segundos estimados para terminar), "items"
+    (constancias que cambiaron de estado) y "fin". Los eventos se agrupan
+    cada TRABAJOS_EVENTOS_INTERVALO segundos y el stream solo lee de la BD.
+    """
+    trabajo = obtener_trabajo_autorizado(db, trabajo_id, current_user)
+    creado = trabajo.created_at
+    # El stream usa sus propias sesiones; no retener una conexión mientras dure
+    db.close()
+
+    return StreamingResponse(
+        eventos_trabajo(request, trabajo_id, creado),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/jobs/{trabajo_id}/items/{item_id}/pdf")
+async def descargar_pdf_item(
+    trabajo_id: str,
+    item_id: int,
+    db: Session = Depends(get_db),
+    current_user: Dict = Depends(get_current_user)
+):
+    """Descargar el PDF generado por una constancia del trabajo"""
+    obtener_trabajo_autorizado(db, trabajo_id, current_user)
+    item = db.query(models.TrabajoItem).filter(
+        models.TrabajoItem.id == item_id,
+        models.TrabajoItem.trabajo_id == trabajo_id
+    ).first()
+    if not item:
+        raise HTTPException(status_code=404, detail="Constancia no encontrada en el trabajo")
+    if item.estado != "completado" or not item.archivo_pdf or not os.path.exists(item.archivo_pdf):
+        raise HTTPException(status_code=404, detail="El PDF de esta constancia no está disponible")
+
+    return FileResponse(
+        path=item.archivo_pdf,
+        filename=os.path.basename(item.archivo_pdf),
+        media_type="application/pdf"
+    )
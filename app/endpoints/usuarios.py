@@ -1,8 +1,12 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 from typing import List
 from database.database import get_db
 from models import models
+from core.auth import invalidar_usuario
+from core.serializacion import filas_a_dicts
 from schemas.schemas import (
     User, UserCreate, UserUpdate
 )
@@ -14,17 +18,23 @@ async def prueba():
     return {"message": "¡Esta es una prueba desde FastAPI SALUDEEEN!"}
 
 # ENDPOINTS PARA USUARIOS
-@router.get("/usuarios", response_model=List[User])
+@router.get("/usuarios", response_model=List[User], response_class=ORJSONResponse)
 async def listar_usuarios(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     """Listar todos los usuarios"""
-    usuarios = db.query(models.User).offset(skip).limit(limit).all()
-    return usuarios
+    # Solo las columnas del esquema User, en su orden
+    resultado = db.execute(
+        select(
+            models.User.nombre, models.User.email, models.User.genero, models.User.grado_academico,
+            models.User.id, models.User.admin, models.User.created_at, models.User.updated_at
+        ).offset(skip).limit(limit)
+    )
+    return ORJSONResponse(filas_a_dicts(resultado))
 
 @router.post("/usuarios", response_model=User)
 async def crear_usuario(usuario: UserCreate, db: Session = Depends(get_db)):
     """Crear un nuevo usuario"""
     # Verificar si el email ya existe
-    db_usuario = db.query(models.User).filter(models.User.email == usuario.email).first()
+    db_usuario = db.query(models.User).filter(func.lower(models.User.email) == usuario.email.lower()).first()
     if db_usuario:
         raise HTTPException(status_code=400, detail="El email ya está registrado")
     
@@ -54,6 +64,7 @@ async def actualizar_usuario(usuario_id: int, usuario: UserUpdate, db: Session =
     
     db.commit()
     db.refresh(db_usuario)
+    invalidar_usuario(usuario_id)
     return db_usuario
 
 @router.delete("/usuarios/{usuario_id}")
@@ -65,5 +76,6 @@ async def eliminar_usuario(usuario_id: int, db: Session = Depends(get_db)):
     
     db.delete(db_usuario)
     db.commit()
+    invalidar_usuario(usuario_id)
     return {"mensaje": "Usuario eliminado exitosamente"}
 
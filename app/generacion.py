@@ -0,0 +1,308 @@
+# generacion.py
+import os
+import secrets
+import string
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from sqlalchemy.orm import Session, joinedload
+from pdf_generator import PDFGenerator
+from config.config import settings
+from database.database import SessionLocal
+from models.models import Solicitud, ConstanciaGenerada
+from cache.datos_fijos import datos_fijos_cache
+from cache.referencias import referencias_cache
+from core.metrics import medir_etapa
+from core.tiempos import TiemposServidor
+
+# Lógica de generación de constancias compartida por los endpoints y por los
+# trabajos en segundo plano
+
+class ErrorGeneracion(Exception):
+    """La constancia no se puede generar (solicitud inexistente, no aceptada, sin datos fijos)"""
+
+def contenido_desde_categorias(idcategoria: str):
+    """
+    Resolver el asunto y la plantilla de una categoría desde la tabla categorias.
+    Usa la cache de referencias (invalidada al escribir categorías); la sesión
+    solo abre conexión si la cache necesita recargarse.
+    """
+    with SessionLocal() as db:
+        categoria = referencias_cache.categoria_por_codigo(db, idcategoria)
+    if categoria is None or not categoria.activo or not categoria.descripcion:
+        return None
+    # Mismo formato que el contenido predeterminado: el asunto va en su propia línea
+    return f"ASUNTO: \n{categoria.asunto}", categoria.descripcion
+
+pdf_generator = PDFGenerator(resolver_contenido=contenido_desde_categorias)
+
+def renderizar_constancia(idqrcode: str, archivo_pdf: str, datos_fijos,
+                          tiempos: Optional[TiemposServidor] = None, **variables) -> None:
+    """
+    Generar el QR y el PDF de una constancia. Es trabajo de CPU síncrono:
+    los endpoints lo ejecutan en el threadpool, dentro de un turno del
+    limitador, para no bloquear el event loop.
+    """
+    with medir_etapa("qr", tiempos):
+        pdf_generator.generar_qrcode(idqrcode)
+    with medir_etapa("pdf_build", tiempos):
+        pdf_generator.generar_constancia_simplificada(
+            idqrcode=idqrcode,
+            archivo_pdf=archivo_pdf,
+            texto_aqc=datos_fijos.texto_aqc,
+            texto_remitente=datos_fijos.texto_remitente,
+            texto_apeticion=datos_fijos.texto_apeticion,
+            texto_atte=datos_fijos.texto_atte,
+            texto_sursum=datos_fijos.texto_sursum,
+            texto_nombrefirma=datos_fijos.texto_nombrefirma,
+            texto_cargo=datos_fijos.texto_cargo,
+            texto_msgdigital=datos_fijos.texto_msgdigital,
+            texto_ccp=datos_fijos.texto_ccp,
+            **variables
+        )
+
+def generar_id_compatible(longitud=20):
+    """Generar ID compatible con el sistema original"""
+    caracteres = string.ascii_letters + string.digits
+    return ''.join(secrets.choice(caracteres) for _ in range(longitud))
+
+def asignar_qr_id(db: Session, tiempos: Optional[TiemposServidor] = None) -> str:
+    """Generar un ID compatible que no exista ya en la BD (por si acaso)"""
+    with medir_etapa("id", tiempos):
+        idqrcode = generar_id_compatible(20)  # Genera algo como: vyBjmTqw4EwapcC6FuWg
+        existing = db.query(ConstanciaGenerada).filter(ConstanciaGenerada.qr_id == idqrcode).first()
+        while existing:
+            idqrcode = generar_id_compatible(20)
+            existing = db.query(ConstanciaGenerada).filter(ConstanciaGenerada.qr_id == idqrcode).first()
+        return idqrcode
+
+def formatear_fecha(fecha_str: str) -> str:
+    """Convertir fecha de dd/mm/yyyy a formato textual completo"""
+    # ... tu función existente de formateo de fecha ...
+    try:
+        fecha_obj = datetime.strptime(fecha_str, "%d/%m/%Y")
+        
+        meses = {
+            1: "enero", 2: "febrero", 3: "marzo", 4: "abril",
+            5: "mayo", 6: "junio", 7: "julio", 8: "agosto",
+            9: "septiembre", 10: "octubre", 11: "noviembre", 12: "diciembre"
+        }
+        
+        unidades = {
+            0: "", 1: "un", 2: "dos", 3: "tres", 4: "cuatro", 5: "cinco",
+            6: "seis", 7: "siete", 8: "ocho", 9: "nueve"
+        }
+        
+        decenas = {
+            10: "diez", 11: "once", 12: "doce", 13: "trece", 14: "catorce",
+            15: "quince", 16: "dieciséis", 17: "diecisiete", 18: "dieciocho",
+            19: "diecinueve", 20: "veinte", 30: "treinta"
+        }
+        
+        def numero_a_texto(num):
+            if num == 0:
+                return "cero"
+            elif 1 <= num <= 9:
+                return unidades[num]
+            elif 10 <= num <= 20:
+                return decenas[num]
+            elif 21 <= num <= 29:
+                return f"veinti{unidades[num - 20]}"
+            elif num == 30:
+                return "treinta"
+            elif 31 <= num <= 31:
+                return f"treinta y {unidades[num - 30]}"
+            else:
+                return str(num)
+        
+        def año_a_texto(año):
+            if año >= 2000 and año <= 2099:
+                decena = año - 2000
+                if decena == 0:
+                    return "dos mil"
+                elif 1 <= decena <= 9:
+                    return f"dos mil {unidades[decena]}"
+                elif decena == 10:
+                    return "dos mil diez"
+                elif 11 <= decena <= 19:
+                    return f"dos mil {decenas[decena]}"
+                elif decena == 20:
+                    return "dos mil veinte"
+                elif 21 <= decena <= 29:
+                    return f"dos mil veinti{unidades[decena - 20]}"
+                elif decena == 30:
+                    return "dos mil treinta"
+                elif 31 <= decena <= 39:
+                    return f"dos mil treinta y {unidades[decena - 30]}"
+                elif decena == 40:
+                    return "dos mil cuarenta"
+                elif 41 <= decena <= 49:
+                    return f"dos mil cuarenta y {unidades[decena - 40]}"
+                elif decena == 50:
+                    return "dos mil cincuenta"
+                elif 51 <= decena <= 59:
+                    return f"dos mil cincuenta y {unidades[decena - 50]}"
+                elif decena == 60:
+                    return "dos mil sesenta"
+                elif 61 <= decena <= 69:
+                    return f"dos mil sesenta y {unidades[decena - 60]}"
+                elif decena == 70:
+                    return "dos mil setenta"
+                elif 71 <= decena <= 79:
+                    return f"dos mil setenta y {unidades[decena - 70]}"
+                elif decena == 80:
+                    return "dos mil ochenta"
+                elif 81 <= decena <= 89:
+                    return f"dos mil ochenta y {unidades[decena - 80]}"
+                elif decena == 90:
+                    return "dos mil noventa"
+                elif 91 <= decena <= 99:
+                    return f"dos mil noventa y {unidades[decena - 90]}"
+            return str(año)
+        
+        dia = fecha_obj.day
+        mes = fecha_obj.month
+        año = fecha_obj.year
+        
+        dia_texto = numero_a_texto(dia)
+        mes_texto = meses[mes]
+        año_texto = año_a_texto(año)
+        
+        dia_palabra = "día" if dia == 1 else "días"
+        
+        return f"{dia_texto} {dia_palabra} del mes de {mes_texto} del año {año_texto}"
+        
+    except ValueError:
+        return fecha_str
+
+def pseudonimo_por_genero(genero: Optional[str]) -> str:
+    """Determinar pseudónimo basado en género"""
+    if genero and genero.lower() == 'masculino':
+        return "el"
+    elif genero and genero.lower() == 'femenino':
+        return "la"
+    return "el/la"
+
+def datos_constancia_solicitud(solicitud: Solicitud) -> Dict:
+    """
+    Variables de la constancia de una solicitud (con usuario, categoría y
+    edición cargados), listas para renderizar_constancia
+    """
+    # Formatear la fecha de emisión (usar fecha actual)
+    fecha_formateada = formatear_fecha(datetime.now().strftime("%d/%m/%Y"))
+    
+    # Generar texto de constancia basado en la descripción de la solicitud
+    texto_consta = solicitud.descripcion or f"Constancia para {solicitud.categoria.nombre} - {solicitud.edicion.nombre} - {solicitud.periodo}"
+    
+    return {
+        "pseudonimo": pseudonimo_por_genero(solicitud.usuario.genero),
+        # Usar el grado académico de la solicitud o del usuario
+        "grado": (solicitud.grado_academico or solicitud.usuario.grado_academico or "").upper(),
+        "nombre": solicitud.usuario.nombre.upper(),
+        # Formatear el asunto usando el asunto de la categoría
+        "texto_asunto": f"ASUNTO: {solicitud.categoria.asunto}",
+        "texto_consta": texto_consta,
+        "fecha_emision": fecha_formateada
+    }
+
+def datos_constancia_individual(datos: Dict) -> Dict:
+    """Variables de una constancia individual a partir de los datos capturados"""
+    return {
+        "pseudonimo": datos["pseudonimo"],
+        "grado": (datos.get("grado") or "").upper(),
+        "nombre": (datos.get("nombre") or "").upper(),
+        "texto_asunto": f"ASUNTO: {datos['texto_asunto']}",
+        "texto_consta": datos["texto_consta"],
+        "fecha_emision": formatear_fecha(datos["fecha_emision"])
+    }
+
+def cargar_solicitud(db: Session, solicitud_id: int) -> Optional[Solicitud]:
+    """Buscar la solicitud con sus relaciones"""
+    return db.query(Solicitud).options(
+        joinedload(Solicitud.usuario),
+        joinedload(Solicitud.categoria),
+        joinedload(Solicitud.edicion)
+    ).filter(Solicitud.id == solicitud_id).first()
+
+def renderizar_en_directorio(db: Session, variables: Dict, directorio: str, prefijo: str) -> Tuple[str, str]:
+    """
+    Asigna el QR y renderiza el PDF en directorio, sin registrar la
+    constancia. Retorna (qr_id, archivo_pdf). El PNG del QR se borra al
+    terminar (queda embebido en el PDF).
+    """
+    datos_fijos = datos_fijos_cache.obtener(db)
+    if not datos_fijos:
+        raise ErrorGeneracion("No se encontraron datos fijos en la base de datos")
+    
+    idqrcode = asignar_qr_id(db)
+    os.makedirs(directorio, exist_ok=True)
+    archivo_pdf = f"{directorio}/{prefijo}_{idqrcode}.pdf"
+    qr_path = f"{settings.QR_DIR}/{idqrcode}.png"
+    
+    try:
+        renderizar_constancia(idqrcode, archivo_pdf, datos_fijos, **variables)
+    except Exception:
+        if os.path.exists(archivo_pdf):
+            os.remove(archivo_pdf)
+        raise
+    finally:
+        if os.path.exists(qr_path):
+            os.remove(qr_path)
+    return idqrcode, archivo_pdf
+
+def generar_y_registrar(db: Session, variables: Dict, directorio: str, prefijo: str) -> ConstanciaGenerada:
+    """
+    Pipeline completo y síncrono para trabajos en segundo plano: asigna el
+    QR, renderiza el PDF en directorio y registra la constancia.
+    """
+    idqrcode, archivo_pdf = renderizar_en_directorio(db, variables, directorio, prefijo)
+    try:
+        constancia = ConstanciaGenerada(
+            qr_id=idqrcode,
+            archivo_pdf=archivo_pdf,
+            es_valida=True,
+            **variables
+        )
+        with medir_etapa("db_insert"):
+            db.add(constancia)
+            db.commit()
+    except Exception:
+        db.rollback()
+        if os.path.exists(archivo_pdf):
+            os.remove(archivo_pdf)
+        raise
+    return constancia
+
+def cargar_solicitud_aceptada(db: Session, solicitud_id: int) -> Solicitud:
+    solicitud = cargar_solicitud(db, solicitud_id)
+    if not solicitud:
+        raise ErrorGeneracion("Solicitud no encontrada")
+    if (solicitud.estado or "").lower() != 'aceptado':
+        raise ErrorGeneracion("La constancia solo está disponible para solicitudes aceptadas")
+    return solicitud
+
+def generar_constancia_de_solicitud(db: Session, solicitud_id: int, directorio: str) -> ConstanciaGenerada:
+    """Generar y registrar la constancia de una solicitud aceptada"""
+    solicitud = cargar_solicitud_aceptada(db, solicitud_id)
+    return generar_y_registrar(
+        db, datos_constancia_solicitud(solicitud), directorio, f"Constancia_Solicitud_{solicitud_id}"
+    )
+
+def pregenerar_constancia_de_solicitud(db: Session, solicitud_id: int, directorio: str) -> Tuple[str, str, Dict]:
+    """
+    Renderizar la constancia de una solicitud aceptada sin registrarla.
+    Retorna (qr_id, archivo_pdf, variables); la constancia se registra con
+    esas variables cuando se reclama el PDF (tomar_prerender), así un PDF
+    que nunca se descarga no deja un QR válido.
+    """
+    solicitud = cargar_solicitud_aceptada(db, solicitud_id)
+    variables = datos_constancia_solicitud(solicitud)
+    idqrcode, archivo_pdf = renderizar_en_directorio(
+        db, variables, directorio, f"Constancia_Solicitud_{solicitud_id}"
+    )
+    return idqrcode, archivo_pdf, variables
+
+def generar_constancia_individual(db: Session, datos: Dict, directorio: str) -> ConstanciaGenerada:
+    """Generar y registrar una constancia individual"""
+    variables = datos_constancia_individual(datos)
+    prefijo = "Constancia_" + "".join(c if c.isalnum() else "_" for c in variables["nombre"])[:80]
+    return generar_y_registrar(db, variables, directorio, prefijo)
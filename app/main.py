@@ -1,13 +1,25 @@
 # main.py
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 import os
 
+# Logging estructurado antes de importar el resto de módulos
+from core.logging_config import configurar_logging
+configurar_logging()
+
 # Importar configuración y modelos
 from models import models
 from database.database import engine
 from config.config import settings
 from pdf_generator import PDFGenerator
+from core.metrics import CONTENT_TYPE_LATEST, MetricasMiddleware, generar_metricas
+from core.profiler import PerfiladorMiddleware
+from core.contexto import ContextoSolicitudMiddleware
+from core.slow_queries import consultas_lentas
+from core.trabajos import gestor_trabajos
+from core.scheduler import programador
+from mantenimiento import registrar_tareas
 from endpoints.auth import router as auth_router
 from endpoints.categorias import router as categorias_router
 from endpoints.constancias import router as constancias_router
@@ -16,6 +28,10 @@ from endpoints.programas import router as programas_router
 from endpoints.solicitudes import router as solicitudes_router
 from endpoints.usuarios import router as usuarios_router
 from endpoints.datos_fijos import router as datos_fijos_router
+from endpoints.exportaciones import router as exportaciones_router
+from endpoints.importaciones import router as importaciones_router
+from endpoints.diagnostico import router as diagnostico_router
+from endpoints.trabajos import router as trabajos_router
 
 
 # Crear directorios necesarios
@@ -23,12 +39,28 @@ os.makedirs("qrs", exist_ok=True)
 os.makedirs("constancias", exist_ok=True)
 os.makedirs("uploads", exist_ok=True)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Hilos que generan las constancias de los trabajos en segundo plano
+    gestor_trabajos.iniciar()
+    # Tareas de mantenimiento por calendario (un solo worker toma el lock)
+    if settings.PROGRAMADOR_ACTIVO:
+        programador.iniciar()
+    yield
+    programador.detener()
+    gestor_trabajos.detener()
+
 app = FastAPI(
     title="API de Constancias UAS",
     description="API para generar constancias académicas de la Universidad Autónoma de Sinaloa",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Perfilado bajo demanda (administradores) y por muestreo; queda dentro de
+# CORS para que el navegador pueda leer el archivo del perfil
+app.add_middleware(PerfiladorMiddleware)
+
 # Configurar CORS
 app.add_middleware(
     CORSMiddleware,
@@ -38,9 +70,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Latencia por plantilla de ruta y estado para /metrics
+app.add_middleware(MetricasMiddleware)
+
+# Request id para logs y X-Request-ID (el más externo, para que todo lo vea)
+app.add_middleware(ContextoSolicitudMiddleware)
+
+# Registrar las consultas que superen el umbral
+consultas_lentas.instalar(engine)
+
 # Crear tablas en la base de datos
 models.Base.metadata.create_all(bind=engine)
 
+# Tareas del programador; el estado de las ediciones se sincroniza en su
+# primera vuelta, ya no en el arranque de cada worker
+registrar_tareas(programador)
+
 # Incluir routers
 app.include_router(auth_router, tags=["auth"])
 app.include_router(categorias_router, tags=["categorias"])
@@ -50,6 +95,10 @@ app.include_router(programas_router, tags=["programas"])
 app.include_router(solicitudes_router, tags=["solicitudes"])
 app.include_router(usuarios_router, tags=["usuarios"])
 app.include_router(datos_fijos_router, tags=["datos_fijos"])
+app.include_router(exportaciones_router, tags=["exportaciones"])
+app.include_router(importaciones_router, tags=["importaciones"])
+app.include_router(diagnostico_router, tags=["diagnostico"])
+app.include_router(trabajos_router, tags=["trabajos"])
 
 @app.get("/")
 async def root():
@@ -59,6 +108,11 @@ async def root():
 async def health_check():
     return {"status": "healthy", "version": "1.0.0"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Métricas en formato Prometheus (agregadas entre workers si PROMETHEUS_MULTIPROC_DIR está definido)"""
+    return Response(content=generar_metricas(), media_type=CONTENT_TYPE_LATEST)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
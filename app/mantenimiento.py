@@ -0,0 +1,169 @@
+# mantenimiento.py
+import logging
+import os
+import time
+from datetime import timedelta
+from typing import Iterable, List, Set
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+from config.config import settings
+from models.models import ConstanciaGenerada, TrabajoItem
+from cache.datos_fijos import datos_fijos_cache
+from cache.edicion_actual import edicion_actual_cache
+from cache.referencias import referencias_cache
+from core.scheduler import Programador
+from core.trabajos import soltar_prerenders, vigente_desde_prerender
+from endpoints.periodos import sincronizar_estados_ediciones, invalidar_caches_ediciones
+
+# Tareas de mantenimiento que dependen del calendario; las ejecuta el
+# programador fuera del camino de las solicitudes
+
+logger = logging.getLogger(__name__)
+
+def sincronizar_ediciones(db: Session) -> None:
+    """Guardar el estado por fechas de las ediciones que cambiaron (inicio o fin)"""
+    actualizadas = sincronizar_estados_ediciones(db)
+    if actualizadas:
+        invalidar_caches_ediciones()
+        logger.info("Estado actualizado en %d ediciones", actualizadas, extra={"ediciones": actualizadas})
+
+# Consultas de referencias por bloques, para no armar un IN enorme
+BLOQUE_REFERENCIAS = 1000
+
+def _archivos_viejos(directorio: str, limite: float) -> List[str]:
+    """Rutas de los archivos (no subdirectorios) modificados antes de limite"""
+    if not os.path.isdir(directorio):
+        return []
+    viejos = []
+    with os.scandir(directorio) as entradas:
+        for entrada in entradas:
+            try:
+                if entrada.is_file(follow_symlinks=False) and entrada.stat().st_mtime < limite:
+                    # Mismo formato con el que los endpoints guardan archivo_pdf
+                    viejos.append(f"{directorio}/{entrada.name}")
+            except FileNotFoundError:
+                pass
+    return viejos
+
+def _referenciados(db: Session, columna, valores: List[str]) -> Set[str]:
+    """Valores de la lista que aparecen en la columna (de constancias_generadas o trabajos_items)"""
+    encontrados = set()
+    for i in range(0, len(valores), BLOQUE_REFERENCIAS):
+        bloque = valores[i:i + BLOQUE_REFERENCIAS]
+        encontrados.update(db.execute(select(columna).where(columna.in_(bloque))).scalars())
+    return encontrados
+
+def _eliminar(rutas: Iterable[str]) -> int:
+    eliminados = 0
+    for ruta in rutas:
+        try:
+            os.remove(ruta)
+            eliminados += 1
+        except FileNotFoundError:
+            # Otro proceso lo eliminó primero (por ejemplo, tras una descarga)
+            pass
+    return eliminados
+
+def _eliminar_pdfs_huerfanos(db: Session, directorio: str, limite: float,
+                             columna=ConstanciaGenerada.archivo_pdf) -> int:
+    """PDFs viejos que no aparecen en columna (por omisión, los de constancias registradas)"""
+    viejos = _archivos_viejos(directorio, limite)
+    if not viejos:
+        return 0
+    registrados = _referenciados(db, columna, viejos)
+    return _eliminar(ruta for ruta in viejos if ruta not in registrados)
+
+def _eliminar_qrs_huerfanos(db: Session, limite: float) -> int:
+    """QRs viejos ({qr_id}.png) de constancias que no están registradas"""
+    viejos = {
+        os.path.splitext(os.path.basename(ruta))[0]: ruta
+        for ruta in _archivos_viejos(settings.QR_DIR, limite)
+    }
+    if not viejos:
+        return 0
+    registrados = _referenciados(db, ConstanciaGenerada.qr_id, list(viejos))
+    return _eliminar(ruta for qr_id, ruta in viejos.items() if qr_id not in registrados)
+
+def _expirar_pdfs_trabajos(db: Session, dias: float) -> int:
+    """
+    Quitar de los trabajos los PDFs con más de dias (registrados o no) y los
+    pre-generados que quedaron viejos porque cambió algo de lo que muestran
+    """
+    limite = func.now() - timedelta(days=dias)
+    vencidos = db.execute(
+        update(TrabajoItem)
+        .where(
+            TrabajoItem.archivo_pdf.isnot(None),
+            func.coalesce(TrabajoItem.updated_at, TrabajoItem.created_at) < limite
+        )
+        .values(archivo_pdf=None)
+        .returning(TrabajoItem.archivo_pdf)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    viejos = [f.archivo_pdf for f in soltar_prerenders(db, TrabajoItem.updated_at < vigente_desde_prerender())]
+    db.commit()
+    return _eliminar(vencidos + viejos)
+
+def _eliminar_trabajos_huerfanos(db: Session, limite: float) -> int:
+    """
+    PDFs de trabajos sin cambios desde limite que ningún item tiene como
+    archivo_pdf (expirados o restos de un render interrumpido); el directorio
+    del trabajo se elimina solo cuando queda vacío
+    """
+    eliminados = 0
+    if not os.path.isdir(settings.TRABAJOS_DIR):
+        return 0
+    with os.scandir(settings.TRABAJOS_DIR) as entradas:
+        directorios = [
+            f"{settings.TRABAJOS_DIR}/{entrada.name}" for entrada in entradas
+            if entrada.is_dir(follow_symlinks=False)
+        ]
+    for directorio in directorios:
+        eliminados += _eliminar_pdfs_huerfanos(db, directorio, limite, TrabajoItem.archivo_pdf)
+        try:
+            if os.stat(directorio).st_mtime < limite and not os.listdir(directorio):
+                os.rmdir(directorio)
+        except OSError:
+            # Un worker acaba de escribir en él o ya no existe
+            pass
+    return eliminados
+
+def limpiar_temporales(db: Session) -> None:
+    """
+    Eliminar archivos temporales:
+    - en qrs/ y constancias/, los PDFs y QRs con más de TEMPORALES_MAX_HORAS
+      que no aparecen en constancias_generadas (los de las constancias
+      registradas solo se eliminan con DELETE /constancia/{qr_id});
+    - los archivos subidos con más de TEMPORALES_MAX_HORAS;
+    - en los trabajos, todos los PDFs con más de TRABAJOS_RETENCION_DIAS
+      (la constancia sigue registrada y válida, pero su PDF ya no se
+      descarga) y los pre-generados que quedaron viejos.
+    """
+    ahora = time.time()
+    limite = ahora - settings.TEMPORALES_MAX_HORAS * 3600
+    eliminados = {
+        settings.QR_DIR: _eliminar_qrs_huerfanos(db, limite),
+        settings.CONSTANCIAS_DIR: _eliminar_pdfs_huerfanos(db, settings.CONSTANCIAS_DIR, limite),
+        settings.UPLOADS_DIR: _eliminar(_archivos_viejos(settings.UPLOADS_DIR, limite)),
+        "trabajos": _expirar_pdfs_trabajos(db, settings.TRABAJOS_RETENCION_DIAS)
+                    + _eliminar_trabajos_huerfanos(db, ahora - settings.TRABAJOS_RETENCION_DIAS * 86400)
+    }
+    if any(eliminados.values()):
+        logger.info("Archivos temporales eliminados: %s", eliminados, extra={"eliminados": eliminados})
+
+def calentar_caches(db: Session) -> None:
+    """
+    Recargar las caches en memoria de este worker si expiraron, para que la
+    primera solicitud después de que abre una edición (o de que vence el TTL)
+    no pague la consulta
+    """
+    edicion_actual_cache.obtener(db)
+    referencias_cache.categorias(db)
+    referencias_cache.ediciones(db)
+    datos_fijos_cache.obtener(db)
+
+def registrar_tareas(programador: Programador) -> None:
+    programador.agregar("sincronizar_ediciones", sincronizar_ediciones, settings.PROGRAMADOR_EDICIONES_INTERVALO)
+    programador.agregar("limpiar_temporales", limpiar_temporales, settings.PROGRAMADOR_LIMPIEZA_INTERVALO)
+    # Las caches son de cada worker: esta tarea no depende del lock
+    programador.agregar("calentar_caches", calentar_caches, settings.PROGRAMADOR_CACHES_INTERVALO, solo_lider=False)
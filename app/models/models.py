@@ -1,11 +1,25 @@
-from sqlalchemy import Boolean, Column, Integer, String, Text, Date, DateTime, ForeignKey, BigInteger
+from sqlalchemy import Boolean, Column, Integer, String, Text, Date, DateTime, ForeignKey, BigInteger, JSON, Index, case
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-from datetime import datetime
+from datetime import datetime, date
+from typing import Optional
 
 Base = declarative_base()
 
+def estado_por_fechas(fecha_inicio: date, fecha_fin: date, hoy: Optional[date] = None) -> str:
+    """
+    Estado de una edición según sus fechas. Es la única implementación en
+    Python de la regla; Edicion.estado_actual.expression es su versión SQL.
+    """
+    hoy = hoy or date.today()
+    if hoy < fecha_inicio:
+        return "programado"
+    elif hoy <= fecha_fin:
+        return "activo"
+    return "finalizado"
+
 class User(Base):
     __tablename__ = "users"
     
@@ -20,6 +34,12 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    __table_args__ = (
+        # Un email por usuario sin importar mayúsculas; es el destino del
+        # ON CONFLICT de la importación del padrón
+        Index("ux_users_email_lower", func.lower(email), unique=True),
+    )
+    
     # Relaciones
     solicitudes = relationship("Solicitud", back_populates="usuario")
 
@@ -67,6 +87,19 @@ class Edicion(Base):
     
     # Agregar esta relación
     solicitudes = relationship("Solicitud", back_populates="edicion")
+    
+    @hybrid_property
+    def estado_actual(self):
+        """Estado según las fechas de la edición, calculado al consultar"""
+        return estado_por_fechas(self.fecha_inicio, self.fecha_fin)
+    
+    @estado_actual.expression
+    def estado_actual(cls):
+        return case(
+            (func.current_date() < cls.fecha_inicio, "programado"),
+            (func.current_date() <= cls.fecha_fin, "activo"),
+            else_="finalizado"
+        )
 
 class Solicitud(Base):
     __tablename__ = "solicitudes"
@@ -122,4 +155,46 @@ class ConstanciaGenerada(Base):
     es_valida = Column(Boolean, default=True)
     
     def __repr__(self):
-        return f"<ConstanciaGenerada(qr_id='{self.qr_id}', nombre='{self.nombre}')>"
\ No newline at end of file
+        return f"<ConstanciaGenerada(qr_id='{self.qr_id}', nombre='{self.nombre}')>"
+
+
+class TrabajoGeneracion(Base):
+    """Lote de constancias que se generan en segundo plano"""
+    __tablename__ = "trabajos_generacion"
+    
+    id = Column(String(32), primary_key=True)  # uuid4 en hexadecimal
+    tipo = Column(String(20), nullable=False)  # solicitudes / individuales / prerender
+    total = Column(Integer, nullable=False, default=0)
+    creado_por = Column(BigInteger, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Relaciones
+    items = relationship("TrabajoItem", back_populates="trabajo", order_by="TrabajoItem.posicion")
+
+
+class TrabajoItem(Base):
+    """Una constancia dentro de un trabajo; la cola de los workers es esta tabla"""
+    __tablename__ = "trabajos_items"
+    __table_args__ = (
+        # Para que tomar el siguiente pendiente sea un recorrido de índice
+        Index("ix_trabajos_items_cola", "estado", "prioridad", "id"),
+    )
+    
+    id = Column(BigInteger, primary_key=True, index=True)
+    trabajo_id = Column(String(32), ForeignKey("trabajos_generacion.id"), nullable=False, index=True)
+    posicion = Column(Integer, nullable=False)
+    prioridad = Column(Integer, nullable=False, default=0)  # Mayor = se atiende primero
+    estado = Column(String(20), nullable=False, default="pendiente")  # pendiente/en_proceso/completado/fallido
+    solicitud_id = Column(BigInteger, ForeignKey("solicitudes.id"), nullable=True, index=True)
+    datos = Column(JSON, nullable=True)  # Datos capturados de una constancia individual
+    qr_id = Column(String(255), nullable=True)
+    archivo_pdf = Column(String(500), nullable=True)
+    error = Column(Text, nullable=True)
+    intentos = Column(Integer, nullable=False, default=0)
+    worker = Column(String(100), nullable=True)
+    tomado_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    # Relaciones
+    trabajo = relationship("TrabajoGeneracion", back_populates="items")
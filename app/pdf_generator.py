@@ -2,7 +2,7 @@
 import os
 import uuid
 import qrcode
-from typing import Optional
+from typing import Callable, Optional, Tuple
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageTemplate, BaseDocTemplate
 from reportlab.platypus.frames import Frame
@@ -11,9 +11,71 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib.enums import TA_JUSTIFY, TA_LEFT, TA_RIGHT, TA_CENTER
 from config.config import settings
+from plantillas import compilar_plantilla
+
+# Contenido predeterminado por categoría: (asunto, plantilla con marcadores {campo}).
+# Se usa cuando la categoría no está registrada en la base de datos.
+CONTENIDO_PREDETERMINADO = {
+    '1.1.1.2.1': (
+        "ASUNTO: \nConstancia de curso de actualización<br/>disciplinar con evaluación",
+        "Participó y acreditó el curso de actualización disciplinar <b>{curso}</b> de acuerdo con los criterios para la formulación y aprobación de planes y programas de estudio; impartido por {instructor}, {periodo}, con una duración de 30 horas."
+    ),
+    '1.1.1.2.2': (
+        "ASUNTO: \nConstancia de curso de formación<br/>docente con evaluación",
+        "Participó y acreditó el curso de formación docente <b>{curso}</b> de acuerdo con los criterios para la formulación y aprobación de planes y programas de estudio; impartido por {instructor}, {periodo}, con una duración de 30 horas."
+    ),
+    '1.2.2.4': (
+        "ASUNTO: \nConstancia de publicación de antologías",
+        "Diseñó y elaboró antología para facilitar el aprendizaje de la asignatura <b>{asignatura}</b> del programa de <b>{programa}</b> que se impartió en el <b>{semestre} semestre</b> del ciclo escolar <b>{ciclo_escolar}</b>, según consta en los archivos de esta Unidad Académica."
+    ),
+    '1.2.2.5': (
+        "ASUNTO: \nConstancia de elaboración de apuntes",
+        "Diseñó y elaboró apuntes para facilitar el aprendizaje de la asignatura <b>{asignatura}</b> del programa de <b>{programa}</b> que se impartió en el <b>{semestre} semestre</b> del ciclo escolar <b>{ciclo_escolar}</b>, según consta en los archivos de esta Unidad Académica."
+    ),
+    '1.2.2.8': (
+        "ASUNTO: \nConstancia de elaboración de<br/>manual de prácticas",
+        "Diseñó y elaboró el manual de prácticas de laboratorio para facilitar el aprendizaje de la asignatura <b>{asignatura}</b> del programa de <b>{programa}</b> que se impartió en el <b>{semestre} semestre</b> del ciclo escolar <b>{ciclo_escolar}</b>, según consta en los archivos de esta Unidad Académica."
+    ),
+    '1.2.3.3': (
+        "ASUNTO: \nConstancia de programas de<br/>unidad de aprendizaje",
+        "Participó de manera oportuna en la elaboración y actualización de programas de unidad de aprendizaje de los programas de estudio de la asignatura <b>{asignatura}</b> del programa de <b>{programa}</b> que se impartió en el <b>{semestre} semestre</b> del ciclo escolar <b>{ciclo_escolar}</b>, según consta en los archivos de esta Unidad Académica."
+    ),
+    '1.2.4.2': (
+        "ASUNTO: \nConstancia diseño e impartición de programa<br/>de cursos en modalidades no escolarizada y dual",
+        "Diseñó e impartió el curso <b>{curso}</b> en modalidad no escolarizada, con lineamientos de diseño institucional, el cual se impartió en el <b>{semestre} semestre</b> del ciclo escolar <b>{ciclo_escolar}</b>, según consta en los archivos de esta Unidad Académica."
+    ),
+    '1.2.4.3': (
+        "ASUNTO: \nConstancia Material pedagógico<br/>innovador con nuevas tecnologías",
+        "Diseñó y elaboró material pedagógico innovador utilizando las nuevas tecnologías de la asignatura <b>{asignatura}</b> del programa de <b>{programa}</b> que se impartió en el <b>{semestre}</b> semestre del ciclo escolar <b>{ciclo_escolar}</b>, según consta en los archivos de esta Unidad Académica."
+    ),
+    '1.4.1.10': (
+        "ASUNTO: \nConstancia de cursos de regularización",
+        "Participó de manera oportuna en la impartición de cursos de regularización académica para exámenes extraordinarios dirigidos a estudiantes no remunerado en la asignatura <b>{asignatura}</b> del programa de <b>{programa}</b> que se impartió en el <b>{semestre} semestre</b> del ciclo escolar <b>{ciclo_escolar}</b>, según consta en los archivos de esta Unidad Académica."
+    ),
+    '1.5.1.3': (
+        "ASUNTO: \nConstancia de organización de eventos académicos",
+        "Participó colegiadamente en el diseño y elaboración de exámenes departamentales del área de <b>{area}</b> del programa de <b>{programa}</b>, en asignaturas del semestre <b>{semestre}</b> del ciclo escolar <b>{ciclo_escolar}</b>, según consta en los archivos de esta Unidad Académica."
+    ),
+    '1.5.1.8': (
+        "ASUNTO: \nConstancia de elaboración de<br/>exámenes departamentales",
+        "Participó colegiadamente en el diseño y elaboración de exámenes departamentales del área de <b>{area}</b> del programa de <b>{programa}</b>, en asignaturas del <b>semestre {semestre}</b> del ciclo escolar <b>{ciclo_escolar}</b>, según consta en los archivos de esta Unidad Académica."
+    ),
+    '1.5.1.19': (
+        "ASUNTO: \nCoordinación de academia<br/>",
+        "Fungió como Coordinador de Academia en el área <b>{area}</b> del programa de <b>{programa}</b> en el <b>{semestre} semestre</b> del ciclo escolar <b>{ciclo_escolar}</b>, según consta en los archivos de esta Unidad Académica."
+    )
+}
+
+CONTENIDO_INCORRECTO = (
+    "ASUNTO: \nInformación incorrecta.",
+    "Información incorrecta"
+)
 
 class PDFGenerator:
-    def __init__(self):
+    def __init__(self, resolver_contenido: Optional[Callable[[str], Optional[Tuple[str, str]]]] = None):
+        # Función opcional que recibe el código de categoría y retorna
+        # (asunto, plantilla) o None para usar el contenido predeterminado
+        self.resolver_contenido = resolver_contenido
         self.styles = getSampleStyleSheet()
         self._setup_custom_styles()
     
@@ -95,62 +157,40 @@ class PDFGenerator:
             pass
     
     def _get_constancia_content(self, idcategoria: str, **kwargs) -> tuple[str, str]:
-        """Obtener contenido específico según la categoría"""
-        content_map = {
-            '1.1.1.2.1': (
-                "ASUNTO: \nConstancia de curso de actualización<br/>disciplinar con evaluación",
-                f"Participó y acreditó el curso de actualización disciplinar <b>{kwargs.get('curso', '')}</b> de acuerdo con los criterios para la formulación y aprobación de planes y programas de estudio; impartido por {kwargs.get('instructor', '')}, {kwargs.get('periodo', '')}, con una duración de 30 horas."
-            ),
-            '1.1.1.2.2': (
-                "ASUNTO: \nConstancia de curso de formación<br/>docente con evaluación",
-                f"Participó y acreditó el curso de formación docente <b>{kwargs.get('curso', '')}</b> de acuerdo con los criterios para la formulación y aprobación de planes y programas de estudio; impartido por {kwargs.get('instructor', '')}, {kwargs.get('periodo', '')}, con una duración de 30 horas."
-            ),
-            '1.2.2.4': (
-                "ASUNTO: \nConstancia de publicación de antologías",
-                f"Diseñó y elaboró antología para facilitar el aprendizaje de la asignatura <b>{kwargs.get('asignatura', '')}</b> del programa de <b>{kwargs.get('programa', '')}</b> que se impartió en el <b>{kwargs.get('semestre', '')} semestre</b> del ciclo escolar <b>{kwargs.get('ciclo_escolar', '')}</b>, según consta en los archivos de esta Unidad Académica."
-            ),
-            '1.2.2.5': (
-                "ASUNTO: \nConstancia de elaboración de apuntes",
-                f"Diseñó y elaboró apuntes para facilitar el aprendizaje de la asignatura <b>{kwargs.get('asignatura', '')}</b> del programa de <b>{kwargs.get('programa', '')}</b> que se impartió en el <b>{kwargs.get('semestre', '')} semestre</b> del ciclo escolar <b>{kwargs.get('ciclo_escolar', '')}</b>, según consta en los archivos de esta Unidad Académica."
-            ),
-            '1.2.2.8': (
-                "ASUNTO: \nConstancia de elaboración de<br/>manual de prácticas",
-                f"Diseñó y elaboró el manual de prácticas de laboratorio para facilitar el aprendizaje de la asignatura <b>{kwargs.get('asignatura', '')}</b> del programa de <b>{kwargs.get('programa', '')}</b> que se impartió en el <b>{kwargs.get('semestre', '')} semestre</b> del ciclo escolar <b>{kwargs.get('ciclo_escolar', '')}</b>, según consta en los archivos de esta Unidad Académica."
-            ),
-            '1.2.3.3': (
-                "ASUNTO: \nConstancia de programas de<br/>unidad de aprendizaje",
-                f"Participó de manera oportuna en la elaboración y actualización de programas de unidad de aprendizaje de los programas de estudio de la asignatura <b>{kwargs.get('asignatura', '')}</b> del programa de <b>{kwargs.get('programa', '')}</b> que se impartió en el <b>{kwargs.get('semestre', '')} semestre</b> del ciclo escolar <b>{kwargs.get('ciclo_escolar', '')}</b>, según consta en los archivos de esta Unidad Académica."
-            ),
-            '1.2.4.2': (
-                "ASUNTO: \nConstancia diseño e impartición de programa<br/>de cursos en modalidades no escolarizada y dual",
-                f"Diseñó e impartió el curso <b>{kwargs.get('curso', '')}</b> en modalidad no escolarizada, con lineamientos de diseño institucional, el cual se impartió en el <b>{kwargs.get('semestre', '')} semestre</b> del ciclo escolar <b>{kwargs.get('ciclo_escolar', '')}</b>, según consta en los archivos de esta Unidad Académica."
-            ),
-            '1.2.4.3': (
-                "ASUNTO: \nConstancia Material pedagógico<br/>innovador con nuevas tecnologías",
-                f"Diseñó y elaboró material pedagógico innovador utilizando las nuevas tecnologías de la asignatura <b>{kwargs.get('asignatura', '')}</b> del programa de <b>{kwargs.get('programa', '')}</b> que se impartió en el <b>{kwargs.get('semestre', '')}</b> semestre del ciclo escolar <b>{kwargs.get('ciclo_escolar', '')}</b>, según consta en los archivos de esta Unidad Académica."
-            ),
-            '1.4.1.10': (
-                "ASUNTO: \nConstancia de cursos de regularización",
-                f"Participó de manera oportuna en la impartición de cursos de regularización académica para exámenes extraordinarios dirigidos a estudiantes no remunerado en la asignatura <b>{kwargs.get('asignatura', '')}</b> del programa de <b>{kwargs.get('programa', '')}</b> que se impartió en el <b>{kwargs.get('semestre', '')} semestre</b> del ciclo escolar <b>{kwargs.get('ciclo_escolar', '')}</b>, según consta en los archivos de esta Unidad Académica."
-            ),
-            '1.5.1.3': (
-                "ASUNTO: \nConstancia de organización de eventos académicos",
-                f"Participó colegiadamente en el diseño y elaboración de exámenes departamentales del área de <b>{kwargs.get('area', '')}</b> del programa de <b>{kwargs.get('programa', '')}</b>, en asignaturas del semestre <b>{kwargs.get('semestre', '')}</b> del ciclo escolar <b>{kwargs.get('ciclo_escolar', '')}</b>, según consta en los archivos de esta Unidad Académica."
-            ),
-            '1.5.1.8': (
-                "ASUNTO: \nConstancia de elaboración de<br/>exámenes departamentales",
-                f"Participó colegiadamente en el diseño y elaboración de exámenes departamentales del área de <b>{kwargs.get('area', '')}</b> del programa de <b>{kwargs.get('programa', '')}</b>, en asignaturas del <b>semestre {kwargs.get('semestre', '')}</b> del ciclo escolar <b>{kwargs.get('ciclo_escolar', '')}</b>, según consta en los archivos de esta Unidad Académica."
-            ),
-            '1.5.1.19': (
-                "ASUNTO: \nCoordinación de academia<br/>",
-                f"Fungió como Coordinador de Academia en el área <b>{kwargs.get('area', '')}</b> del programa de <b>{kwargs.get('programa', '')}</b> en el <b>{kwargs.get('semestre', '')} semestre</b> del ciclo escolar <b>{kwargs.get('ciclo_escolar', '')}</b>, según consta en los archivos de esta Unidad Académica."
-            )
-        }
-        
-        return content_map.get(idcategoria, (
-            "ASUNTO: \nInformación incorrecta.",
-            "Información incorrecta"
-        ))
+        """
+        Obtener contenido específico según la categoría.
+        Primero se consulta el resolvedor (categorías de la base de datos) y si
+        no tiene la categoría se usa el contenido predeterminado. Solo se
+        renderiza la plantilla de la categoría solicitada.
+        Si la plantilla de la base de datos usa campos que no se recibieron se
+        prefiere el contenido predeterminado; los campos que aun así falten
+        quedan vacíos, nunca como {campo} en el PDF.
+        """
+        contenido = self.resolver_contenido(idcategoria) if self.resolver_contenido else None
+        if contenido is not None:
+            texto_asunto, plantilla = contenido
+            texto_consta, faltantes = compilar_plantilla(plantilla).renderizar(kwargs)
+            if not faltantes:
+                return texto_asunto, texto_consta
+            if idcategoria not in CONTENIDO_PREDETERMINADO:
+                return texto_asunto, self._renderizar_sin_faltantes(plantilla, faltantes, kwargs)
+        
+        contenido = CONTENIDO_PREDETERMINADO.get(idcategoria)
+        if contenido is None:
+            return CONTENIDO_INCORRECTO
+        
+        texto_asunto, plantilla = contenido
+        texto_consta, faltantes = compilar_plantilla(plantilla).renderizar(kwargs)
+        if faltantes:
+            texto_consta = self._renderizar_sin_faltantes(plantilla, faltantes, kwargs)
+        return texto_asunto, texto_consta
+    
+    @staticmethod
+    def _renderizar_sin_faltantes(plantilla: str, faltantes: list, kwargs: dict) -> str:
+        """Renderizar con los campos faltantes como texto vacío"""
+        datos = {**dict.fromkeys(faltantes, ''), **kwargs}
+        texto_consta, _ = compilar_plantilla(plantilla).renderizar(datos)
+        return texto_consta
 
     def generar_constancia_simplificada(self, idqrcode: str, archivo_pdf: str,
                                     texto_aqc: str, texto_remitente: str, texto_apeticion: str,
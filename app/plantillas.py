@@ -0,0 +1,57 @@
+# plantillas.py
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+# Marcadores con formato {campo}
+PATRON_CAMPO = re.compile(r'\{([^}]+)\}')
+
+class PlantillaCompilada:
+    """
+    Plantilla con marcadores {campo} separada una sola vez en segmentos
+    (texto literal, campo). El renderizado recorre los segmentos en una sola
+    pasada, así un valor que contenga {otro} nunca se vuelve a sustituir.
+    """
+    __slots__ = ("texto", "segmentos", "cola", "campos")
+
+    def __init__(self, texto: str):
+        self.texto = texto or ""
+        segmentos = []
+        posicion = 0
+        for coincidencia in PATRON_CAMPO.finditer(self.texto):
+            segmentos.append((self.texto[posicion:coincidencia.start()], coincidencia.group(1)))
+            posicion = coincidencia.end()
+        self.segmentos: Tuple[Tuple[str, str], ...] = tuple(segmentos)
+        self.cola = self.texto[posicion:]
+        # Campos en el orden en que aparecen (igual que re.findall)
+        self.campos: Tuple[str, ...] = tuple(campo for _, campo in segmentos)
+
+    def renderizar(self, datos: Dict) -> Tuple[str, List[str]]:
+        """
+        Sustituye los campos con los valores de datos.
+        Retorna el texto y la lista de campos que no venían en datos;
+        esos marcadores se dejan sin reemplazar.
+        """
+        partes = []
+        faltantes = []
+        for literal, campo in self.segmentos:
+            partes.append(literal)
+            if campo in datos:
+                partes.append(str(datos[campo]))
+            else:
+                partes.append(f"{{{campo}}}")
+                faltantes.append(campo)
+        partes.append(self.cola)
+        return "".join(partes), faltantes
+
+    def renderizar_lote(self, lista_datos: Iterable[Dict]) -> List[Tuple[str, List[str]]]:
+        """Renderiza la misma plantilla para muchos conjuntos de datos"""
+        return [self.renderizar(datos) for datos in lista_datos]
+
+@lru_cache(maxsize=512)
+def compilar_plantilla(texto: str) -> PlantillaCompilada:
+    """
+    Compila la plantilla una sola vez. La llave es el texto completo, así cada
+    versión de la descripción de una categoría tiene su propia entrada.
+    """
+    return PlantillaCompilada(texto)
@@ -17,7 +17,7 @@
 
 
 # schemas/schemas.py
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, constr
 from typing import Optional, List
 from datetime import datetime, date
 
@@ -269,12 +269,28 @@ class SolicitudFormulario(BaseModel):
     periodo: str
     datos_dinamicos: dict  # Aquí van los valores para reemplazar en la plantilla
 
+# Esquema para crear muchas solicitudes con la misma plantilla
+class SolicitudFormularioLote(BaseModel):
+    categoria_id: int
+    edicion_id: int
+    periodo: str
+    datos: List[dict]  # Un diccionario de datos dinámicos por solicitud
+
 # Esquema para obtener campos dinámicos de una categoría
 class CamposDinamicos(BaseModel):
     categoria_id: int
     campos: List[str]  # Lista de campos extraídos de la descripción
     plantilla: str     # La descripción original con los marcadores
 
+# Esquema para cambiar el estado de varias solicitudes a la vez
+class SolicitudesEstadoUpdate(BaseModel):
+    estado: str
+    ids: Optional[List[int]] = None  # Si no se envían ids, se usan los filtros
+    edicion_id: Optional[int] = None
+    categoria_id: Optional[int] = None
+    estado_actual: Optional[str] = None
+
+
 
 
 
@@ -284,6 +300,35 @@ class CamposDinamicos(BaseModel):
 
 
 
+# Esquemas para importación masiva
+class UsuarioImportacion(BaseModel):
+    nombre: constr(strip_whitespace=True, min_length=1)
+    email: EmailStr
+    genero: Optional[constr(pattern=r'^(Masculino|Femenino)$')] = None
+    tipo_empleado: Optional[constr(pattern=r'^(Docente|Administrativo)$')] = None
+    grado_academico: Optional[str] = None
+
+class SolicitudImportacion(BaseModel):
+    email: EmailStr
+    codigo_categoria: constr(strip_whitespace=True, min_length=1)
+    edicion_id: int
+    periodo: constr(strip_whitespace=True, min_length=1)
+    grado_academico: Optional[str] = None
+    descripcion: Optional[str] = None
+    estado: Optional[constr(pattern=r'^(pendiente|aceptado|rechazado)$')] = None
+
+class FilaRechazada(BaseModel):
+    fila: int
+    email: Optional[str] = None
+    errores: List[str]
+
+class ResultadoImportacion(BaseModel):
+    mensaje: str
+    procesadas: int
+    insertados: int
+    actualizados: int = 0
+    rechazados: List[FilaRechazada]
+
 
 ##DATOS FIJOS
 class DatosFijosBase(BaseModel):
@@ -309,4 +354,47 @@ class DatosFijos(DatosFijosBase):
         from_attributes = True
 
 
-##DATOS FIJOS
\ No newline at end of file
+##DATOS FIJOS
+
+##TRABAJOS DE GENERACIÓN
+class TrabajoConstanciaDatos(BaseModel):
+    pseudonimo: str
+    grado: str
+    nombre: constr(strip_whitespace=True, min_length=1)
+    texto_asunto: str
+    texto_consta: str
+    fecha_emision: str
+
+class TrabajoConstanciasCreate(BaseModel):
+    solicitud_ids: Optional[List[int]] = None
+    edicion_id: Optional[int] = None  # Todas las solicitudes aceptadas de la edición
+    constancias: Optional[List[TrabajoConstanciaDatos]] = None
+
+class TrabajoCreado(BaseModel):
+    id: str
+    estado: str
+    total: int
+    url_estado: str
+
+class TrabajoItemEstado(BaseModel):
+    id: int
+    posicion: int
+    estado: str
+    solicitud_id: Optional[int] = None
+    qr_id: Optional[str] = None
+    url_pdf: Optional[str] = None
+    error: Optional[str] = None
+    intentos: int
+    updated_at: Optional[datetime] = None
+
+class TrabajoEstado(BaseModel):
+    id: str
+    tipo: str
+    estado: str
+    total: int
+    pendientes: int
+    en_proceso: int
+    completados: int
+    fallidos: int
+    created_at: datetime
+    items: List[TrabajoItemEstado]
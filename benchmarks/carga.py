@@ -0,0 +1,420 @@
+# benchmarks/carga.py
+"""
+Pruebas de carga de punta a punta con escenarios de tráfico realistas.
+
+Levanta la API con uvicorn contra una base de datos local, siembra datos
+sintéticos (usuarios, categorías, una edición, solicitudes y constancias)
+y reproduce estos escenarios, en orden:
+
+    login        apertura de la edición: tormenta de logins
+    formularios  todos los docentes envían su solicitud a la vez
+    revision     el administrador lista y aprueba en lotes
+    descargas    ola de descargas de constancias aceptadas
+    qr           ráfaga de validaciones de QR
+
+Reporta rendimiento y p50/p95/p99 por endpoint, guarda el resultado en
+benchmarks/resultados/ y lo compara con la base si existe.
+
+Usar SIEMPRE una base de datos desechable: los datos sembrados no se borran.
+
+Uso:
+    python benchmarks/carga.py --database-url postgresql://localhost/constancias_bench
+    python benchmarks/carga.py --database-url ... --escenarios login,qr --guardar-base
+    python benchmarks/carga.py --database-url ... --url http://localhost:8000   # servidor ya levantado
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+import jwt
+
+from comun import comparar_con_base, imprimir_resumen, resumir
+
+RAIZ = Path(__file__).resolve().parent.parent
+APP_DIR = RAIZ / "app"
+RESULTADOS_DIR = Path(__file__).resolve().parent / "resultados"
+BASE = RESULTADOS_DIR / "carga_base.json"
+
+ESCENARIOS = ("login", "formularios", "revision", "descargas", "qr")
+
+PLANTILLA = (
+    "Que {nombre} con grado de {grado} participó como {rol} en el proyecto "
+    "\"{proyecto}\" durante el periodo {periodo_texto}, cumpliendo con las "
+    "actividades asignadas por la {dependencia}."
+)
+
+
+@dataclass
+class DatosSembrados:
+    etiqueta: str
+    admin_id: int
+    usuarios: List[int]
+    categorias: List[int]
+    edicion_id: int
+    periodo: str
+    pendientes: List[int] = field(default_factory=list)
+    aceptadas: List[int] = field(default_factory=list)
+    qr_ids: List[str] = field(default_factory=list)
+
+
+def sembrar(database_url: str, usuarios: int, solicitudes_por_usuario: int, qrs: int) -> DatosSembrados:
+    """Inserta los datos sintéticos con los modelos de la aplicación"""
+    os.environ["DATABASE_URL"] = database_url
+    sys.path.insert(0, str(APP_DIR))
+    from sqlalchemy import insert, select
+    from database.database import SessionLocal, engine
+    from models import models
+
+    models.Base.metadata.create_all(bind=engine)
+    etiqueta = uuid.uuid4().hex[:8]
+    hoy = date.today()
+
+    with SessionLocal() as db:
+        admin_id = db.execute(insert(models.User).values(
+            sub=f"bench:{etiqueta}:admin", nombre="ADMIN CARGA", email=f"admin.{etiqueta}@bench.local",
+            admin=True
+        ).returning(models.User.id)).scalar_one()
+
+        ids_usuarios = list(db.execute(insert(models.User).returning(models.User.id), [
+            {
+                "sub": f"bench:{etiqueta}:{i}",
+                "nombre": f"DOCENTE {i} CARGA",
+                "email": f"docente{i}.{etiqueta}@bench.local",
+                "genero": random.choice(["Masculino", "Femenino"]),
+                "tipo_empleado": "Docente",
+                "grado_academico": random.choice(["Dr", "Mtro", "Ing"]),
+                "admin": False
+            }
+            for i in range(usuarios)
+        ]).scalars())
+
+        ids_categorias = list(db.execute(insert(models.Categoria).returning(models.Categoria.id), [
+            {
+                "codigo_categoria": f"B{etiqueta[:6]}{i}",
+                "nombre": f"Categoría de carga {i}",
+                "asunto": f"Constancia de participación {i}",
+                "descripcion": PLANTILLA,
+                "activo": True
+            }
+            for i in range(3)
+        ]).scalars())
+
+        edicion_id = db.execute(insert(models.Edicion).values(
+            nombre=f"Edición de carga {etiqueta}", periodo1="2025-1", periodo2="2025-2",
+            fecha_inicio=hoy - timedelta(days=7), fecha_fin=hoy + timedelta(days=30),
+            estado="activo", activa=True
+        ).returning(models.Edicion.id)).scalar_one()
+
+        if db.execute(select(models.DatosFijos.id).limit(1)).first() is None:
+            db.execute(insert(models.DatosFijos).values(
+                texto_aqc="A QUIEN CORRESPONDA", texto_remitente="El suscrito hace constar",
+                texto_apeticion="A petición del interesado", texto_atte="ATENTAMENTE",
+                texto_sursum="SURSUM VERSUS", texto_nombrefirma="DIRECTOR DE PRUEBA",
+                texto_cargo="DIRECTOR", texto_msgdigital="Documento firmado digitalmente",
+                texto_ccp="C.c.p. Archivo"
+            ))
+
+        filas = []
+        for user_id in ids_usuarios:
+            for _ in range(solicitudes_por_usuario):
+                filas.append({
+                    "user_id": user_id,
+                    "categoria_id": random.choice(ids_categorias),
+                    "edicion_id": edicion_id,
+                    "periodo": "2025-1",
+                    "grado_academico": "Dr.",
+                    "descripcion": PLANTILLA,
+                    "fecha_solicitud": hoy,
+                    # Una de cada cuatro ya aceptada, para las descargas
+                    "estado": "aceptado" if random.random() < 0.25 else "pendiente"
+                })
+        ids_solicitudes = list(db.execute(
+            insert(models.Solicitud).returning(models.Solicitud.id, models.Solicitud.estado), filas
+        )) if filas else []
+
+        qr_ids = [f"bench{etiqueta}{i:07d}" for i in range(qrs)]
+        if qr_ids:
+            db.execute(insert(models.ConstanciaGenerada), [
+                {
+                    "qr_id": qr_id, "nombre": "DOCENTE CARGA", "grado": "DR.", "pseudonimo": "el",
+                    "texto_asunto": "ASUNTO: Constancia de carga", "texto_consta": PLANTILLA,
+                    "fecha_emision": "uno días del mes de enero del año dos mil veinticinco",
+                    "fecha_creacion": datetime.utcnow(), "archivo_pdf": "", "es_valida": True
+                }
+                for qr_id in qr_ids
+            ])
+        db.commit()
+
+    return DatosSembrados(
+        etiqueta=etiqueta,
+        admin_id=admin_id,
+        usuarios=ids_usuarios,
+        categorias=ids_categorias,
+        edicion_id=edicion_id,
+        periodo="2025-1",
+        pendientes=[fila.id for fila in ids_solicitudes if fila.estado == "pendiente"],
+        aceptadas=[fila.id for fila in ids_solicitudes if fila.estado == "aceptado"],
+        qr_ids=qr_ids
+    )
+
+
+class ServidorLocal:
+    """Levanta uvicorn en un subproceso y espera a que /health responda"""
+
+    def __init__(self, database_url: str, secret_key: str, puerto: int, workers: int):
+        self.url = f"http://127.0.0.1:{puerto}"
+        self.comando = [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1", "--port", str(puerto),
+            "--workers", str(workers), "--log-level", "warning"
+        ]
+        self.entorno = dict(os.environ, DATABASE_URL=database_url, SECRET_KEY=secret_key, LOG_LEVEL="WARNING")
+        self.proceso: Optional[subprocess.Popen] = None
+
+    def __enter__(self):
+        self.proceso = subprocess.Popen(self.comando, cwd=APP_DIR, env=self.entorno)
+        limite = time.monotonic() + 60
+        while time.monotonic() < limite:
+            if self.proceso.poll() is not None:
+                raise RuntimeError("uvicorn terminó antes de arrancar")
+            try:
+                if httpx.get(f"{self.url}/health", timeout=1).status_code == 200:
+                    return self
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.5)
+        self.__exit__(None, None, None)
+        raise RuntimeError("La API no respondió en /health")
+
+    def __exit__(self, *args):
+        if self.proceso and self.proceso.poll() is None:
+            self.proceso.terminate()
+            try:
+                self.proceso.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.proceso.kill()
+
+
+class Medidor:
+    """Latencias y estados agrupados por etiqueta de endpoint"""
+
+    def __init__(self):
+        self.latencias: Dict[str, List[float]] = defaultdict(list)
+        self.estados: Dict[str, List] = defaultdict(list)
+        self.inicio: Dict[str, float] = {}
+        self.fin: Dict[str, float] = {}
+
+    async def peticion(self, cliente: httpx.AsyncClient, etiqueta: str, metodo: str, ruta: str, **kwargs):
+        ahora = time.perf_counter()
+        self.inicio.setdefault(etiqueta, ahora)
+        respuesta = None
+        try:
+            respuesta = await cliente.request(metodo, ruta, **kwargs)
+            self.estados[etiqueta].append(respuesta.status_code)
+        except httpx.HTTPError as e:
+            self.estados[etiqueta].append(type(e).__name__)
+        final = time.perf_counter()
+        self.latencias[etiqueta].append(final - ahora)
+        self.fin[etiqueta] = final
+        return respuesta
+
+    def resumen(self) -> Dict:
+        return {
+            etiqueta: resumir(self.latencias[etiqueta], self.estados[etiqueta],
+                              self.fin[etiqueta] - self.inicio[etiqueta])
+            for etiqueta in self.latencias
+        }
+
+
+async def en_paralelo(tareas, concurrencia: int) -> None:
+    """Ejecuta las corrutinas con un máximo de concurrencia simultáneas"""
+    semaforo = asyncio.Semaphore(concurrencia)
+
+    async def con_turno(tarea):
+        async with semaforo:
+            await tarea
+
+    await asyncio.gather(*(con_turno(t) for t in tareas))
+
+
+def token_acceso(secret_key: str, user_id: int, admin: bool) -> Dict[str, str]:
+    token = jwt.encode({"user_id": user_id, "admin": admin, "sub": f"bench:{user_id}", "type": "access"},
+                       secret_key, algorithm="HS256")
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def escenario_login(cliente, medidor, datos: DatosSembrados, args):
+    credenciales = [
+        jwt.encode({"sub": f"bench-login-{datos.etiqueta}-{i}", "email": f"login{i}.{datos.etiqueta}@bench.local",
+                    "given_name": f"Usuario{i}", "family_name": "Carga"}, "llave-de-prueba", algorithm="HS256")
+        for i in range(args.usuarios)
+    ]
+    # Cada usuario entra dos veces: el primer login crea, el segundo es repetido
+    tareas = [
+        medidor.peticion(cliente, "POST /verify-credential", "POST", "/verify-credential", json={"credential": c})
+        for c in credenciales * 2
+    ]
+    tareas += [
+        medidor.peticion(cliente, "GET /periodos/edicion-actual", "GET", "/periodos/edicion-actual")
+        for _ in range(args.usuarios)
+    ]
+    random.shuffle(tareas)
+    await en_paralelo(tareas, args.concurrencia)
+
+
+async def escenario_formularios(cliente, medidor, datos: DatosSembrados, args):
+    async def enviar(user_id: int):
+        await medidor.peticion(cliente, "GET /categorias", "GET", "/categorias",
+                               headers=token_acceso(args.secret_key, user_id, False))
+        respuesta = await medidor.peticion(cliente, "POST /solicitudes/formulario", "POST", "/solicitudes/formulario", json={
+            "categoria_id": random.choice(datos.categorias),
+            "edicion_id": datos.edicion_id,
+            "periodo": datos.periodo,
+            "datos_dinamicos": {
+                "user_id": user_id, "nombre": f"DOCENTE {user_id}", "grado": "Dr", "rol": "colaborador",
+                "proyecto": "Proyecto de carga", "periodo_texto": "enero-junio", "dependencia": "Dirección"
+            }
+        })
+        if respuesta is not None and respuesta.status_code == 200:
+            datos.pendientes.append(respuesta.json()["solicitud_id"])
+
+    await en_paralelo([enviar(user_id) for user_id in datos.usuarios], args.concurrencia)
+
+
+async def escenario_revision(cliente, medidor, datos: DatosSembrados, args):
+    # El administrador pagina el listado varias veces mientras revisa
+    lecturas = [
+        medidor.peticion(cliente, "GET /solicitudes", "GET", "/solicitudes", params={"skip": skip, "limit": 100})
+        for _ in range(5) for skip in range(0, max(len(datos.pendientes), 100), 100)
+    ]
+    lecturas += [
+        medidor.peticion(cliente, "GET /solicitudes/{solicitud_id}", "GET", f"/solicitudes/{solicitud_id}")
+        for solicitud_id in random.sample(datos.pendientes, min(len(datos.pendientes), 200))
+    ]
+    await en_paralelo(lecturas, args.concurrencia)
+
+    # Aprobación en lotes de 50
+    lotes = [datos.pendientes[i:i + 50] for i in range(0, len(datos.pendientes), 50)]
+    await en_paralelo([
+        medidor.peticion(cliente, "PATCH /solicitudes/estado", "PATCH", "/solicitudes/estado",
+                         json={"estado": "aceptado", "ids": lote})
+        for lote in lotes
+    ], max(1, args.concurrencia // 10))
+    datos.aceptadas.extend(datos.pendientes)
+    datos.pendientes = []
+
+
+async def escenario_descargas(cliente, medidor, datos: DatosSembrados, args):
+    if not datos.aceptadas:
+        return
+    objetivos = [random.choice(datos.aceptadas) for _ in range(args.descargas)]
+    await en_paralelo([
+        medidor.peticion(cliente, "GET /solicitudes/{solicitud_id}/constancia", "GET",
+                         f"/solicitudes/{solicitud_id}/constancia")
+        for solicitud_id in objetivos
+    ], args.concurrencia)
+
+
+async def escenario_qr(cliente, medidor, datos: DatosSembrados, args):
+    tareas = []
+    for _ in range(args.validaciones):
+        # Uno de cada diez es un código inexistente (QR mal leído o falso)
+        qr_id = random.choice(datos.qr_ids) if datos.qr_ids and random.random() < 0.9 else uuid.uuid4().hex[:20]
+        tareas.append(medidor.peticion(cliente, "GET /validar/{qr_id}", "GET", f"/validar/{qr_id}"))
+    await en_paralelo(tareas, args.concurrencia)
+
+
+FUNCIONES = {
+    "login": escenario_login,
+    "formularios": escenario_formularios,
+    "revision": escenario_revision,
+    "descargas": escenario_descargas,
+    "qr": escenario_qr,
+}
+
+
+async def ejecutar_escenarios(url: str, datos: DatosSembrados, args) -> Dict:
+    resultados = {}
+    limites = httpx.Limits(max_connections=args.concurrencia, max_keepalive_connections=args.concurrencia)
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limites) as cliente:
+        for nombre in args.escenarios:
+            medidor = Medidor()
+            inicio = time.perf_counter()
+            await FUNCIONES[nombre](cliente, medidor, datos, args)
+            print(f"\n### escenario {nombre} ({time.perf_counter() - inicio:.1f} s)")
+            resultados[nombre] = medidor.resumen()
+            for etiqueta, resumen in resultados[nombre].items():
+                imprimir_resumen(etiqueta, resumen)
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pruebas de carga de punta a punta")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"),
+                        help="Base de datos desechable (o BENCH_DATABASE_URL)")
+    parser.add_argument("--url", help="Usar un servidor ya levantado en lugar de iniciar uno")
+    parser.add_argument("--secret-key", default=os.getenv("SECRET_KEY", "bench-secret"),
+                        help="SECRET_KEY del servidor (para firmar tokens de acceso)")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--escenarios", default=",".join(ESCENARIOS),
+                        help=f"Lista separada por comas de: {', '.join(ESCENARIOS)}")
+    parser.add_argument("--usuarios", type=int, default=300)
+    parser.add_argument("--solicitudes-por-usuario", type=int, default=2)
+    parser.add_argument("--descargas", type=int, default=200)
+    parser.add_argument("--validaciones", type=int, default=3000)
+    parser.add_argument("--qrs", type=int, default=1000, help="Constancias sembradas para validar")
+    parser.add_argument("--concurrencia", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--guardar-base", action="store_true", help="Guardar este resultado como la nueva base")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error("Se requiere --database-url (o BENCH_DATABASE_URL)")
+    args.escenarios = [e.strip() for e in args.escenarios.split(",") if e.strip()]
+    desconocidos = set(args.escenarios) - set(ESCENARIOS)
+    if desconocidos:
+        parser.error(f"Escenarios desconocidos: {', '.join(sorted(desconocidos))}")
+
+    print("Sembrando datos sintéticos...")
+    datos = sembrar(args.database_url, args.usuarios, args.solicitudes_por_usuario, args.qrs)
+    print(f"  etiqueta {datos.etiqueta}: {len(datos.usuarios)} usuarios, "
+          f"{len(datos.pendientes)} pendientes, {len(datos.aceptadas)} aceptadas, {len(datos.qr_ids)} QR")
+
+    if args.url:
+        resultados = asyncio.run(ejecutar_escenarios(args.url, datos, args))
+    else:
+        with ServidorLocal(args.database_url, args.secret_key, args.puerto, args.workers) as servidor:
+            resultados = asyncio.run(ejecutar_escenarios(servidor.url, datos, args))
+
+    RESULTADOS_DIR.mkdir(exist_ok=True)
+    corrida = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "parametros": {k: v for k, v in vars(args).items() if k not in ("database_url", "secret_key")},
+        "resultados": resultados
+    }
+    archivo = RESULTADOS_DIR / f"carga_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    archivo.write_text(json.dumps(corrida, indent=2, ensure_ascii=False))
+    print(f"\nResultados guardados en {archivo}")
+
+    if BASE.exists():
+        comparar_con_base(resultados, json.loads(BASE.read_text())["resultados"])
+    if args.guardar_base:
+        BASE.write_text(json.dumps(corrida, indent=2, ensure_ascii=False))
+        print(f"Base actualizada: {BASE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# benchmarks/comun.py
+"""Utilidades compartidas por los scripts de medición"""
+import math
+from collections import Counter
+from typing import Dict, Iterable, List
+
+
+def percentil(valores: List[float], p: float) -> float:
+    """Percentil por rango más cercano; valores debe venir ordenado"""
+    if not valores:
+        return 0.0
+    rango = max(1, math.ceil(p / 100 * len(valores)))
+    return valores[min(rango, len(valores)) - 1]
+
+
+def resumir(latencias: Iterable[float], estados: Iterable, duracion: float) -> Dict:
+    """Resumen de una corrida: latencias en segundos, estados HTTP o nombres de error"""
+    ordenadas = sorted(latencias)
+    conteo = Counter(estados)
+    total = sum(conteo.values())
+    return {
+        "solicitudes": total,
+        "duracion_s": round(duracion, 3),
+        "rendimiento_rps": round(total / duracion, 2) if duracion > 0 else 0.0,
+        "p50_ms": round(percentil(ordenadas, 50) * 1000, 2),
+        "p95_ms": round(percentil(ordenadas, 95) * 1000, 2),
+        "p99_ms": round(percentil(ordenadas, 99) * 1000, 2),
+        "max_ms": round(ordenadas[-1] * 1000, 2) if ordenadas else 0.0,
+        "estados": {str(k): v for k, v in sorted(conteo.items(), key=lambda i: str(i[0]))},
+    }
+
+
+def imprimir_resumen(titulo: str, resumen: Dict) -> None:
+    print(f"\n== {titulo} ==")
+    print(f"  solicitudes : {resumen['solicitudes']} en {resumen['duracion_s']} s "
+          f"({resumen['rendimiento_rps']} req/s)")
+    print(f"  latencia    : p50={resumen['p50_ms']} ms  p95={resumen['p95_ms']} ms  "
+          f"p99={resumen['p99_ms']} ms  max={resumen['max_ms']} ms")
+    estados = ", ".join(f"{k}: {v}" for k, v in resumen["estados"].items())
+    print(f"  estados     : {estados}")
+
+
+def comparar_con_base(actual: Dict, base: Dict) -> None:
+    """
+    Imprime la variación de p95 y rendimiento de cada grupo de resultados
+    contra una corrida base con la misma estructura ({grupo: {etiqueta: resumen}}).
+    """
+    print("\n== comparación con la base ==")
+    for grupo, etiquetas in actual.items():
+        for etiqueta, resumen in etiquetas.items():
+            anterior = base.get(grupo, {}).get(etiqueta)
+            if not anterior:
+                print(f"  {grupo} / {etiqueta}: sin base")
+                continue
+            print(f"  {grupo} / {etiqueta}: "
+                  f"p95 {anterior['p95_ms']} -> {resumen['p95_ms']} ms ({_variacion(anterior['p95_ms'], resumen['p95_ms'])}), "
+                  f"rps {anterior['rendimiento_rps']} -> {resumen['rendimiento_rps']} "
+                  f"({_variacion(anterior['rendimiento_rps'], resumen['rendimiento_rps'])})")
+
+
+def _variacion(antes: float, despues: float) -> str:
+    if not antes:
+        return "n/a"
+    return f"{(despues - antes) / antes * 100:+.1f}%"
@@ -0,0 +1,91 @@
+# benchmarks/login_storm.py
+"""
+Tormenta de logins contra /verify-credential.
+
+Simula el inicio de un periodo de registro: muchos usuarios entran al mismo
+tiempo y una parte repite el login (doble clic, varias pestañas). Las
+credenciales de Google se generan sin firmar, igual que las acepta el
+endpoint, con sub y email aleatorios por usuario.
+
+Uso:
+    python benchmarks/login_storm.py --url http://localhost:8000 \
+        --usuarios 500 --concurrencia 50 --rondas 2
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+import jwt
+
+from comun import imprimir_resumen, resumir
+
+
+def credencial_falsa(indice: int, semilla: str) -> str:
+    """JWT con la forma del de Google, firmado con una llave cualquiera"""
+    return jwt.encode(
+        {
+            "sub": f"bench-{semilla}-{indice}",
+            "email": f"bench.{semilla}.{indice}@example.com",
+            "given_name": f"Usuario{indice}",
+            "family_name": "Prueba",
+            "iat": int(time.time()),
+        },
+        "llave-de-prueba",
+        algorithm="HS256",
+    )
+
+
+async def ejecutar(url: str, usuarios: int, concurrencia: int, rondas: int, timeout: float):
+    semilla = uuid.uuid4().hex[:8]
+    credenciales = [credencial_falsa(i, semilla) for i in range(usuarios)]
+    # Cada ronda repite los mismos usuarios: la primera crea, las demás son logins repetidos
+    trabajos = [c for _ in range(rondas) for c in credenciales]
+
+    cola: asyncio.Queue = asyncio.Queue()
+    for credencial in trabajos:
+        cola.put_nowait(credencial)
+
+    latencias = []
+    estados = []
+
+    async def trabajador(cliente: httpx.AsyncClient):
+        while True:
+            try:
+                credencial = cola.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            inicio = time.perf_counter()
+            try:
+                respuesta = await cliente.post("/verify-credential", json={"credential": credencial})
+                estados.append(respuesta.status_code)
+            except httpx.HTTPError as e:
+                estados.append(type(e).__name__)
+            latencias.append(time.perf_counter() - inicio)
+
+    limites = httpx.Limits(max_connections=concurrencia, max_keepalive_connections=concurrencia)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limites) as cliente:
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabajador(cliente) for _ in range(concurrencia)))
+        duracion = time.perf_counter() - inicio
+
+    return resumir(latencias, estados, duracion)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tormenta de logins contra /verify-credential")
+    parser.add_argument("--url", default="http://localhost:8000", help="URL base de la API")
+    parser.add_argument("--usuarios", type=int, default=200, help="Usuarios distintos")
+    parser.add_argument("--concurrencia", type=int, default=50, help="Solicitudes simultáneas")
+    parser.add_argument("--rondas", type=int, default=2, help="Veces que entra cada usuario")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Timeout por solicitud (s)")
+    args = parser.parse_args()
+
+    resumen = asyncio.run(ejecutar(args.url, args.usuarios, args.concurrencia, args.rondas, args.timeout))
+    imprimir_resumen(f"login storm ({args.usuarios} usuarios x {args.rondas} rondas, "
+                     f"concurrencia {args.concurrencia})", resumen)
+
+
+if __name__ == "__main__":
+    main()
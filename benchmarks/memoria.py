@@ -0,0 +1,147 @@
+# benchmarks/memoria.py
+"""
+Perfil de memoria de la generación masiva de constancias.
+
+Genera N constancias a través de los endpoints reales (con TestClient, en
+este mismo proceso) contra una base de datos desechable, toma un snapshot
+de tracemalloc cada K documentos y reporta los sitios de asignación que
+más crecieron. Termina con código 1 si la memoria retenida por documento
+(pendiente de la memoria trazada entre snapshots) supera el presupuesto.
+
+Uso:
+    python benchmarks/memoria.py --database-url postgresql://localhost/constancias_bench \
+        --documentos 300 --cada 25 --presupuesto-kb 32
+    python benchmarks/memoria.py --database-url ... --ruta individual
+"""
+import argparse
+import gc
+import os
+import resource
+import sys
+import tracemalloc
+from pathlib import Path
+from typing import List, Tuple
+
+from carga import APP_DIR, sembrar
+
+FILTROS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+def rss_kb() -> int:
+    """RSS actual en KB (Linux); si no está disponible, el pico del proceso"""
+    try:
+        with open("/proc/self/statm") as archivo:
+            paginas = int(archivo.read().split()[1])
+        return paginas * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def pendiente(puntos: List[Tuple[int, int]]) -> float:
+    """Pendiente por mínimos cuadrados de bytes contra documentos"""
+    n = len(puntos)
+    if n < 2:
+        return 0.0
+    media_x = sum(x for x, _ in puntos) / n
+    media_y = sum(y for _, y in puntos) / n
+    numerador = sum((x - media_x) * (y - media_y) for x, y in puntos)
+    denominador = sum((x - media_x) ** 2 for x, _ in puntos)
+    return numerador / denominador if denominador else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perfil de memoria de la generación masiva")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"),
+                        help="Base de datos desechable (o BENCH_DATABASE_URL)")
+    parser.add_argument("--ruta", choices=("solicitud", "individual"), default="solicitud",
+                        help="GET /solicitudes/{id}/constancia o POST /constancia/individual")
+    parser.add_argument("--documentos", type=int, default=200)
+    parser.add_argument("--cada", type=int, default=20, help="Documentos entre snapshots")
+    parser.add_argument("--calentamiento", type=int, default=10,
+                        help="Documentos antes del snapshot base (caches, imports, fuentes)")
+    parser.add_argument("--presupuesto-kb", type=float, default=32.0,
+                        help="Memoria retenida máxima por documento")
+    parser.add_argument("--top", type=int, default=15, help="Sitios de crecimiento a reportar")
+    parser.add_argument("--marcos", type=int, default=8, help="Marcos de pila guardados por asignación")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("Se requiere --database-url (o BENCH_DATABASE_URL)")
+
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("SECRET_KEY", "bench-secret")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.chdir(APP_DIR)
+
+    datos = sembrar(args.database_url, usuarios=20, solicitudes_por_usuario=5, qrs=0)
+
+    from fastapi.testclient import TestClient
+    from main import app
+
+    cliente = TestClient(app)
+    ids = datos.pendientes + datos.aceptadas
+    cliente.patch("/solicitudes/estado", json={"estado": "aceptado", "ids": ids}).raise_for_status()
+
+    def generar(indice: int) -> None:
+        if args.ruta == "solicitud":
+            respuesta = cliente.get(f"/solicitudes/{ids[indice % len(ids)]}/constancia")
+            respuesta.raise_for_status()
+            return
+        respuesta = cliente.post("/constancia/individual", json={
+            "pseudonimo": "el", "grado": "Dr.", "nombre": f"Docente {indice}",
+            "texto_asunto": "Constancia de prueba de memoria",
+            "texto_consta": "Participó en la prueba de memoria de la generación masiva de constancias.",
+            "fecha_emision": "15/07/2025"
+        })
+        respuesta.raise_for_status()
+        # Este endpoint deja los archivos en disco: se borran para no medir el disco
+        cuerpo = respuesta.json()
+        for ruta in (cuerpo["archivo_pdf"], cuerpo["qr_code"]):
+            if os.path.exists(ruta):
+                os.remove(ruta)
+
+    tracemalloc.start(args.marcos)
+    for i in range(args.calentamiento):
+        generar(i)
+    gc.collect()
+    base = tracemalloc.take_snapshot().filter_traces(FILTROS)
+    trazada_base = tracemalloc.get_traced_memory()[0]
+    rss_base = rss_kb()
+
+    puntos = [(0, trazada_base)]
+    print(f"{'docs':>6} {'trazada KB':>12} {'delta KB':>10} {'KB/doc':>8} {'RSS KB':>10}")
+    for n in range(1, args.documentos + 1):
+        generar(args.calentamiento + n)
+        if n % args.cada == 0 or n == args.documentos:
+            gc.collect()
+            trazada = tracemalloc.get_traced_memory()[0]
+            puntos.append((n, trazada))
+            print(f"{n:6} {trazada // 1024:12} {(trazada - trazada_base) // 1024:10} "
+                  f"{(trazada - trazada_base) / n / 1024:8.2f} {rss_kb():10}")
+
+    final = tracemalloc.take_snapshot().filter_traces(FILTROS)
+    tracemalloc.stop()
+
+    print(f"\nTop {args.top} sitios de crecimiento (desde el snapshot base):")
+    for estadistica in final.compare_to(base, "traceback")[:args.top]:
+        if estadistica.size_diff <= 0:
+            break
+        print(f"\n  +{estadistica.size_diff / 1024:.1f} KB en {estadistica.count_diff:+d} bloques")
+        for linea in estadistica.traceback.format(limit=args.marcos, most_recent_first=True):
+            print(f"    {linea}")
+
+    por_documento_kb = pendiente(puntos) / 1024
+    print(f"\nRetenido por documento (pendiente): {por_documento_kb:.2f} KB "
+          f"(presupuesto {args.presupuesto_kb} KB); RSS {rss_base} -> {rss_kb()} KB")
+    if por_documento_kb > args.presupuesto_kb:
+        print("FALLA: la memoria retenida por documento supera el presupuesto")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
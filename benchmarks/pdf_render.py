@@ -0,0 +1,328 @@
+# benchmarks/pdf_render.py
+"""
+Micro-benchmark y regresión visual de PDFGenerator.
+
+Mide latencia (p50/p95), rendimiento, tamaño del PDF y RSS pico de
+generar_qrcode, generar_constancia y generar_constancia_simplificada para
+cada código de categoría y para textos cortos, medios, largos y que
+desbordan a una segunda página; en un solo proceso y repartido en N
+procesos.
+
+Con --golden rasteriza con PyMuPDF un conjunto fijo de documentos y los
+compara contra las imágenes de benchmarks/golden/, para verificar que una
+optimización del render no cambió el documento; una imagen golden que falta
+cuenta como falla. --actualizar-golden regenera esas imágenes (revisarlas
+antes de hacer commit).
+
+Uso:
+    python benchmarks/pdf_render.py --repeticiones 20 --procesos 4
+    python benchmarks/pdf_render.py --golden
+    python benchmarks/pdf_render.py --golden --actualizar-golden
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from comun import percentil
+
+RAIZ = Path(__file__).resolve().parent.parent
+APP_DIR = RAIZ / "app"
+GOLDEN_DIR = Path(__file__).resolve().parent / "golden"
+RESULTADOS_DIR = Path(__file__).resolve().parent / "resultados"
+
+# Las rutas de settings (qrs/, ../assets) son relativas al directorio app/
+os.chdir(APP_DIR)
+sys.path.insert(0, str(APP_DIR))
+
+from config.config import settings  # noqa: E402
+from pdf_generator import CONTENIDO_PREDETERMINADO, PDFGenerator  # noqa: E402
+
+# Longitud aproximada (en caracteres) de los campos variables
+LONGITUDES = {"corto": 12, "medio": 60, "largo": 250, "desborde": 2500}
+# Un código que no existe usa el contenido de "información incorrecta"
+CODIGOS = list(CONTENIDO_PREDETERMINADO) + ["0.0.0.0"]
+
+PALABRAS = ("sistemas", "ingeniería", "aprendizaje", "programa", "académico",
+            "evaluación", "laboratorio", "desarrollo", "software", "redes")
+
+ID_QR_BENCH = "benchQRfijo000000000"
+
+
+def texto(longitud: int) -> str:
+    """Texto determinista de aproximadamente la longitud pedida"""
+    palabras = []
+    total = 0
+    i = 0
+    while total < longitud:
+        palabra = PALABRAS[i % len(PALABRAS)]
+        palabras.append(palabra)
+        total += len(palabra) + 1
+        i += 1
+    return " ".join(palabras).capitalize()
+
+
+def kwargs_constancia(codigo: str, longitud: int, archivo_pdf: str, idqrcode: str = ID_QR_BENCH) -> Dict:
+    campo = texto(longitud)
+    return dict(
+        idqrcode=idqrcode, pseudonimo="el", grado="DR.", nombre="JUAN PÉREZ LÓPEZ",
+        area=campo, programa=campo, semestre="7mo", ciclo_escolar="2024-2025",
+        fecha_emision="quince días del mes de julio del año dos mil veinticinco",
+        archivo_pdf=archivo_pdf, idcategoria=codigo, asignatura=campo,
+        email="juan.perez@uas.edu.mx", curso=campo, instructor=campo, periodo="enero-junio 2025"
+    )
+
+
+def kwargs_simplificada(longitud: int, archivo_pdf: str, idqrcode: str = ID_QR_BENCH) -> Dict:
+    return dict(
+        idqrcode=idqrcode, archivo_pdf=archivo_pdf,
+        texto_aqc="A QUIEN CORRESPONDA", texto_remitente=settings.REMITENTE_TEXT,
+        texto_apeticion="A petición de la parte interesada", texto_atte="A T E N T A M E N T E",
+        texto_sursum="SURSUM VERSUS", texto_nombrefirma=settings.DIRECTOR_NAME,
+        texto_cargo=settings.DIRECTOR_TITLE, texto_msgdigital="Documento firmado electrónicamente",
+        texto_ccp="C.c.p. Archivo", pseudonimo="la", grado="MTRA.", nombre="MARÍA LÓPEZ GARCÍA",
+        texto_asunto="ASUNTO: Constancia de prueba",
+        texto_consta=f"Participó en <b>{texto(longitud)}</b>, según consta en los archivos de esta Unidad Académica.",
+        fecha_emision="quince días del mes de julio del año dos mil veinticinco"
+    )
+
+
+def casos() -> List[Tuple[str, str, object]]:
+    """(función, etiqueta del caso, parámetro) para todos los casos medidos"""
+    lista = [("generar_qrcode", "qr", None)]
+    for nombre_longitud, longitud in LONGITUDES.items():
+        lista.append(("generar_constancia_simplificada", nombre_longitud, longitud))
+        for codigo in CODIGOS:
+            lista.append(("generar_constancia", f"{codigo}/{nombre_longitud}", (codigo, longitud)))
+    return lista
+
+
+def qr_del_proceso() -> str:
+    # Cada proceso usa su propio QR para no borrárselo a los demás
+    return f"benchQRproc{os.getpid():09d}"
+
+
+def ejecutar_caso(generador: PDFGenerator, funcion: str, parametro, salida: Path, indice: int) -> int:
+    """Genera un documento y retorna el tamaño en bytes del archivo producido"""
+    if funcion == "generar_qrcode":
+        ruta = generador.generar_qrcode(f"benchQR{os.getpid()}x{indice:010d}")
+        tamano = os.path.getsize(ruta)
+        os.remove(ruta)
+        return tamano
+    archivo_pdf = str(salida / f"{os.getpid()}_{indice}.pdf")
+    if funcion == "generar_constancia":
+        codigo, longitud = parametro
+        generador.generar_constancia(**kwargs_constancia(codigo, longitud, archivo_pdf, qr_del_proceso()))
+    else:
+        generador.generar_constancia_simplificada(**kwargs_simplificada(parametro, archivo_pdf, qr_del_proceso()))
+    tamano = os.path.getsize(archivo_pdf)
+    os.remove(archivo_pdf)
+    return tamano
+
+
+def rss_pico_kb() -> int:
+    # En Linux ru_maxrss viene en KB (en macOS en bytes)
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico // 1024 if sys.platform == "darwin" else pico
+
+
+def medir(repeticiones: int, calentamiento: int, filtro: str = "") -> Dict:
+    """
+    Corre todos los casos en este proceso; retorna métricas por caso.
+    "duracion_s" es solo la fase medida (sin calentamiento ni preparación).
+    """
+    generador = PDFGenerator()
+    generador.generar_qrcode(qr_del_proceso())
+    salida = Path(tempfile.mkdtemp(prefix="bench_pdf_"))
+    resultados = {}
+    indice = 0
+    try:
+        for funcion, etiqueta, parametro in casos():
+            clave = f"{funcion}:{etiqueta}"
+            if filtro and filtro not in clave:
+                continue
+            for _ in range(calentamiento):
+                indice += 1
+                ejecutar_caso(generador, funcion, parametro, salida, indice)
+            latencias = []
+            tamano = 0
+            inicio_caso = time.perf_counter()
+            for _ in range(repeticiones):
+                indice += 1
+                inicio = time.perf_counter()
+                tamano = ejecutar_caso(generador, funcion, parametro, salida, indice)
+                latencias.append(time.perf_counter() - inicio)
+            duracion = time.perf_counter() - inicio_caso
+            latencias.sort()
+            resultados[clave] = {
+                "p50_ms": round(percentil(latencias, 50) * 1000, 2),
+                "p95_ms": round(percentil(latencias, 95) * 1000, 2),
+                "docs_por_s": round(repeticiones / duracion, 2) if duracion else 0.0,
+                "duracion_s": round(duracion, 4),
+                "bytes": tamano,
+                "rss_pico_kb": rss_pico_kb()
+            }
+    finally:
+        shutil.rmtree(salida, ignore_errors=True)
+        ruta_qr = Path(settings.QR_DIR) / f"{qr_del_proceso()}.png"
+        if ruta_qr.exists():
+            ruta_qr.unlink()
+    return resultados
+
+
+def _trabajador(argumentos) -> Dict:
+    repeticiones, calentamiento, filtro = argumentos
+    resultados = medir(repeticiones, calentamiento, filtro)
+    # Solo el tiempo de los documentos medidos; el calentamiento y el
+    # arranque del proceso no cuentan
+    duracion = sum(r["duracion_s"] for r in resultados.values())
+    return {"duracion": duracion, "rss_pico_kb": rss_pico_kb(), "casos": resultados}
+
+
+def medir_multiproceso(procesos: int, repeticiones: int, calentamiento: int, filtro: str) -> Dict:
+    """
+    Todos los procesos corren la misma carga a la vez: mide el escalamiento.
+    El rendimiento agregado es la suma del de cada proceso en su fase medida.
+    """
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        salidas = list(pool.map(_trabajador, [(repeticiones, calentamiento, filtro)] * procesos))
+    documentos = sum(len(s["casos"]) * repeticiones for s in salidas)
+    docs_por_s = sum(len(s["casos"]) * repeticiones / s["duracion"] for s in salidas if s["duracion"])
+    return {
+        "procesos": procesos,
+        "documentos": documentos,
+        "duracion_s": round(max(s["duracion"] for s in salidas), 2),
+        "docs_por_s": round(docs_por_s, 2),
+        "rss_pico_kb_por_proceso": max(s["rss_pico_kb"] for s in salidas),
+        "p95_ms_por_caso": {
+            clave: max(s["casos"][clave]["p95_ms"] for s in salidas) for clave in salidas[0]["casos"]
+        }
+    }
+
+
+# Documentos fijos de la regresión visual
+CASOS_GOLDEN = (
+    [("generar_constancia", codigo, "medio") for codigo in CODIGOS]
+    + [("generar_constancia", CODIGOS[0], "desborde")]
+    + [("generar_constancia_simplificada", None, nombre) for nombre in ("corto", "desborde")]
+)
+
+
+def regresion_visual(actualizar: bool, dpi: int, tolerancia: float) -> bool:
+    """Rasteriza los documentos fijos y los compara con las imágenes golden"""
+    import fitz  # PyMuPDF
+    from PIL import Image, ImageChops
+
+    generador = PDFGenerator()
+    generador.generar_qrcode(ID_QR_BENCH)
+    salida = Path(tempfile.mkdtemp(prefix="golden_pdf_"))
+    GOLDEN_DIR.mkdir(exist_ok=True)
+    correcto = True
+    try:
+        for funcion, codigo, nombre_longitud in CASOS_GOLDEN:
+            longitud = LONGITUDES[nombre_longitud]
+            nombre = f"{funcion}_{codigo or 'simplificada'}_{nombre_longitud}".replace(".", "-")
+            archivo_pdf = str(salida / f"{nombre}.pdf")
+            if funcion == "generar_constancia":
+                generador.generar_constancia(**kwargs_constancia(codigo, longitud, archivo_pdf))
+            else:
+                generador.generar_constancia_simplificada(**kwargs_simplificada(longitud, archivo_pdf))
+
+            with fitz.open(archivo_pdf) as documento:
+                for numero, pagina in enumerate(documento):
+                    imagen = pagina.get_pixmap(dpi=dpi)
+                    actual = Image.frombytes("RGB", (imagen.width, imagen.height), imagen.samples)
+                    golden = GOLDEN_DIR / f"{nombre}_p{numero + 1}.png"
+                    if actualizar:
+                        actual.save(golden)
+                        print(f"  {golden.name}: actualizada")
+                        continue
+                    if not golden.exists():
+                        # Sin imagen de referencia no hay nada que comparar
+                        print(f"  {golden.name}: FALTA la imagen golden (generarla con --actualizar-golden)")
+                        correcto = False
+                        continue
+                    esperada = Image.open(golden).convert("RGB")
+                    if esperada.size != actual.size:
+                        print(f"  {golden.name}: DIFERENTE tamaño {actual.size} vs {esperada.size}")
+                        correcto = False
+                        continue
+                    diferencia = ImageChops.difference(actual, esperada).convert("L")
+                    distintos = sum(1 for valor in diferencia.getdata() if valor > 16)
+                    proporcion = distintos / (actual.width * actual.height)
+                    estado = "ok" if proporcion <= tolerancia else "DIFERENTE"
+                    print(f"  {golden.name}: {estado} ({proporcion:.5%} pixeles distintos)")
+                    if proporcion > tolerancia:
+                        correcto = False
+                        actual.save(salida.parent / f"{nombre}_p{numero + 1}_actual.png")
+                # Una página golden de más indica que antes el documento era más largo
+                sobrantes = sorted(GOLDEN_DIR.glob(f"{nombre}_p*.png"))[len(documento):]
+                for sobrante in sobrantes:
+                    if actualizar:
+                        sobrante.unlink()
+                    else:
+                        print(f"  {sobrante.name}: página faltante en el documento actual")
+                        correcto = False
+    finally:
+        shutil.rmtree(salida, ignore_errors=True)
+        ruta_qr = Path(settings.QR_DIR) / f"{ID_QR_BENCH}.png"
+        if ruta_qr.exists():
+            ruta_qr.unlink()
+    return correcto
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark y regresión visual de PDFGenerator")
+    parser.add_argument("--repeticiones", type=int, default=10, help="Documentos medidos por caso")
+    parser.add_argument("--calentamiento", type=int, default=2, help="Documentos descartados por caso")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 2,
+                        help="Procesos para la medición multiproceso (1 para omitirla)")
+    parser.add_argument("--filtro", default="", help="Solo casos cuyo nombre contenga este texto")
+    parser.add_argument("--golden", action="store_true", help="Correr la regresión visual en lugar del benchmark")
+    parser.add_argument("--actualizar-golden", action="store_true", help="Regenerar las imágenes golden")
+    parser.add_argument("--dpi", type=int, default=72)
+    parser.add_argument("--tolerancia", type=float, default=0.0005,
+                        help="Proporción máxima de pixeles distintos por página")
+    args = parser.parse_args()
+    os.makedirs(settings.QR_DIR, exist_ok=True)
+
+    if args.golden or args.actualizar_golden:
+        print("Regresión visual contra", GOLDEN_DIR)
+        sys.exit(0 if regresion_visual(args.actualizar_golden, args.dpi, args.tolerancia) else 1)
+
+    print(f"Un proceso: {args.repeticiones} repeticiones por caso")
+    un_proceso = medir(args.repeticiones, args.calentamiento, args.filtro)
+    print(f"{'caso':58} {'p50 ms':>9} {'p95 ms':>9} {'docs/s':>8} {'bytes':>8} {'RSS KB':>9}")
+    for clave, r in un_proceso.items():
+        print(f"{clave:58} {r['p50_ms']:9} {r['p95_ms']:9} {r['docs_por_s']:8} {r['bytes']:8} {r['rss_pico_kb']:9}")
+
+    multiproceso = None
+    if args.procesos > 1:
+        print(f"\n{args.procesos} procesos en paralelo...")
+        multiproceso = medir_multiproceso(args.procesos, args.repeticiones, args.calentamiento, args.filtro)
+        secuencial = sum(r["docs_por_s"] for r in un_proceso.values()) / max(len(un_proceso), 1)
+        print(f"  {multiproceso['documentos']} documentos en {multiproceso['duracion_s']} s "
+              f"= {multiproceso['docs_por_s']} docs/s (un proceso, promedio por caso: {secuencial:.2f} docs/s)")
+        print(f"  RSS pico por proceso: {multiproceso['rss_pico_kb_por_proceso']} KB")
+
+    RESULTADOS_DIR.mkdir(exist_ok=True)
+    archivo = RESULTADOS_DIR / f"pdf_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    archivo.write_text(json.dumps({
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "parametros": vars(args),
+        "un_proceso": un_proceso,
+        "multiproceso": multiproceso
+    }, indent=2, ensure_ascii=False))
+    print(f"\nResultados guardados en {archivo}")
+
+
+if __name__ == "__main__":
+    main()
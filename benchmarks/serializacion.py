@@ -0,0 +1,210 @@
+# benchmarks/serializacion.py
+"""
+Tiempo de serialización de las respuestas de listado, sin base de datos.
+
+Compara, para páginas de 1k y 10k filas sintéticas:
+- solicitudes: "anterior" son dicts armados a mano desde objetos ORM +
+  jsonable_encoder + JSONResponse (lo que hacía GET /solicitudes); "orjson"
+  son filas por columnas + solicitud_listado + ORJSONResponse.
+- categorias: "anterior" es la validación de response_model=List[Categoria]
+  (pydantic from_attributes) + JSONResponse; "orjson" es categoria_a_dict +
+  ORJSONResponse.
+
+Solo mide la serialización; las consultas quedan fuera.
+
+Uso:
+    python benchmarks/serializacion.py
+    python benchmarks/serializacion.py --filas 1000 10000 --repeticiones 30
+"""
+import argparse
+import json
+import sys
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+
+from comun import percentil
+
+RAIZ = Path(__file__).resolve().parent.parent
+APP_DIR = RAIZ / "app"
+RESULTADOS_DIR = Path(__file__).resolve().parent / "resultados"
+sys.path.insert(0, str(APP_DIR))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from core.serializacion import categoria_a_dict, solicitud_listado  # noqa: E402
+from schemas.schemas import Categoria  # noqa: E402
+
+COLUMNAS_SOLICITUD = (
+    "id", "user_id", "categoria_id", "edicion_id", "periodo", "grado_academico", "descripcion",
+    "fecha_solicitud", "estado", "created_at", "updated_at", "usuario_nombre", "usuario_email",
+    "usuario_genero", "usuario_grado_academico", "codigo_categoria", "categoria_nombre", "edicion_nombre"
+)
+FilaSolicitud = namedtuple("FilaSolicitud", COLUMNAS_SOLICITUD)
+
+BASE = datetime(2025, 1, 15, 9, 30, tzinfo=timezone.utc)
+
+
+def filas_solicitudes(n: int) -> List[FilaSolicitud]:
+    return [
+        FilaSolicitud(
+            id=i, user_id=i % 500 + 1, categoria_id=i % 12 + 1, edicion_id=1,
+            periodo="2025-1", grado_academico="Dr.",
+            descripcion=f"Participó como instructor del curso número {i} de la edición 2025",
+            fecha_solicitud=date(2025, 1, 15), estado=("pendiente", "aceptado", "rechazado")[i % 3],
+            created_at=BASE + timedelta(minutes=i), updated_at=None if i % 2 else BASE + timedelta(hours=i),
+            usuario_nombre=f"Docente Número {i % 500}", usuario_email=f"docente{i % 500}@uas.edu.mx",
+            usuario_genero="Femenino" if i % 2 else "Masculino", usuario_grado_academico="Dr.",
+            codigo_categoria=f"1.{i % 12}.1", categoria_nombre=f"Categoría {i % 12}", edicion_nombre="Edición 2025"
+        )
+        for i in range(n)
+    ]
+
+
+def objetos_solicitudes(filas: List[FilaSolicitud]) -> List[SimpleNamespace]:
+    """Imitación de los objetos ORM con sus relaciones ya cargadas"""
+    objetos = []
+    for f in filas:
+        objetos.append(SimpleNamespace(
+            id=f.id, user_id=f.user_id, categoria_id=f.categoria_id, edicion_id=f.edicion_id,
+            periodo=f.periodo, grado_academico=f.grado_academico, descripcion=f.descripcion,
+            fecha_solicitud=f.fecha_solicitud, estado=f.estado, created_at=f.created_at, updated_at=f.updated_at,
+            usuario=SimpleNamespace(nombre=f.usuario_nombre, email=f.usuario_email,
+                                    genero=f.usuario_genero, grado_academico=f.usuario_grado_academico),
+            categoria=SimpleNamespace(codigo_categoria=f.codigo_categoria, nombre=f.categoria_nombre),
+            edicion=SimpleNamespace(nombre=f.edicion_nombre)
+        ))
+    return objetos
+
+
+def solicitudes_anterior(objetos) -> bytes:
+    resultado = []
+    for solicitud in objetos:
+        resultado.append({
+            "id": solicitud.id,
+            "user_id": solicitud.user_id,
+            "categoria_id": solicitud.categoria_id,
+            "edicion_id": solicitud.edicion_id,
+            "periodo": solicitud.periodo,
+            "grado_academico": solicitud.grado_academico,
+            "descripcion": solicitud.descripcion,
+            "fecha_solicitud": solicitud.fecha_solicitud,
+            "estado": solicitud.estado,
+            "created_at": solicitud.created_at,
+            "updated_at": solicitud.updated_at,
+            "usuario": {
+                "nombre": solicitud.usuario.nombre,
+                "email": solicitud.usuario.email,
+                "genero": solicitud.usuario.genero,
+                "grado_academico": solicitud.usuario.grado_academico
+            },
+            "categoria": {
+                "codigo_categoria": solicitud.categoria.codigo_categoria,
+                "nombre": solicitud.categoria.nombre
+            },
+            "edicion": {
+                "nombre": solicitud.edicion.nombre
+            }
+        })
+    return JSONResponse(jsonable_encoder(resultado)).body
+
+
+def solicitudes_nuevo(filas) -> bytes:
+    return ORJSONResponse([solicitud_listado(fila) for fila in filas]).body
+
+
+def objetos_categorias(n: int) -> List[SimpleNamespace]:
+    return [
+        SimpleNamespace(
+            id=i, codigo_categoria=f"{i // 100}.{i % 100}", nombre=f"Categoría {i}",
+            asunto=f"Constancia de participación {i}", descripcion="Texto de la plantilla " * 8,
+            activo=bool(i % 5), created_at=BASE, updated_at=BASE + timedelta(days=i % 30)
+        )
+        for i in range(n)
+    ]
+
+
+ADAPTADOR_CATEGORIAS = TypeAdapter(List[Categoria])
+
+
+def categorias_anterior(objetos) -> bytes:
+    # Lo que hace FastAPI con response_model: validar y volver a serializar
+    validadas = ADAPTADOR_CATEGORIAS.validate_python(objetos, from_attributes=True)
+    return JSONResponse(ADAPTADOR_CATEGORIAS.dump_python(validadas, mode="json")).body
+
+
+def categorias_nuevo(objetos) -> bytes:
+    return ORJSONResponse([categoria_a_dict(c) for c in objetos]).body
+
+
+def medir(funcion: Callable, datos, repeticiones: int, calentamiento: int) -> Dict:
+    for _ in range(calentamiento):
+        funcion(datos)
+    tiempos = []
+    tamano = 0
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        cuerpo = funcion(datos)
+        tiempos.append(time.perf_counter() - inicio)
+        tamano = len(cuerpo)
+    tiempos.sort()
+    return {
+        "p50_ms": round(percentil(tiempos, 50) * 1000, 2),
+        "p95_ms": round(percentil(tiempos, 95) * 1000, 2),
+        "bytes": tamano,
+    }
+
+
+def verificar_equivalencia(anterior: bytes, nuevo: bytes, nombre: str) -> None:
+    """El contenido debe ser el mismo; solo puede cambiar el formato de UTC (Z / +00:00)"""
+    a = json.loads(anterior.decode().replace("Z\"", "+00:00\""))
+    b = json.loads(nuevo.decode().replace("Z\"", "+00:00\""))
+    if a != b:
+        raise SystemExit(f"FALLA: {nombre} produce un JSON distinto al anterior")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de serialización de los listados")
+    parser.add_argument("--filas", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--calentamiento", type=int, default=3)
+    parser.add_argument("--guardar", action="store_true", help="Guardar los resultados en benchmarks/resultados/")
+    args = parser.parse_args()
+
+    resultados = {}
+    print(f"{'caso':<28} {'filas':>6} {'p50 ms':>9} {'p95 ms':>9} {'KB':>8} {'mejora':>7}")
+    for n in args.filas:
+        filas = filas_solicitudes(n)
+        objetos = objetos_solicitudes(filas)
+        categorias = objetos_categorias(n)
+        verificar_equivalencia(solicitudes_anterior(objetos), solicitudes_nuevo(filas), "solicitudes")
+        verificar_equivalencia(categorias_anterior(categorias), categorias_nuevo(categorias), "categorias")
+
+        casos = {
+            "solicitudes": ((solicitudes_anterior, objetos), (solicitudes_nuevo, filas)),
+            "categorias": ((categorias_anterior, categorias), (categorias_nuevo, categorias)),
+        }
+        medidos = {}
+        for nombre, ((f_anterior, d_anterior), (f_nuevo, d_nuevo)) in casos.items():
+            anterior = medir(f_anterior, d_anterior, args.repeticiones, args.calentamiento)
+            nuevo = medir(f_nuevo, d_nuevo, args.repeticiones, args.calentamiento)
+            mejora = anterior["p50_ms"] / nuevo["p50_ms"] if nuevo["p50_ms"] else 0.0
+            for etiqueta, r, texto_mejora in (("anterior", anterior, ""), ("orjson", nuevo, f"{mejora:6.1f}x")):
+                print(f"{nombre + '/' + etiqueta:<28} {n:6} {r['p50_ms']:9.2f} {r['p95_ms']:9.2f} "
+                      f"{r['bytes'] / 1024:8.1f} {texto_mejora:>7}")
+            medidos[nombre] = {"anterior": anterior, "orjson": nuevo, "mejora_p50": round(mejora, 2)}
+        resultados[str(n)] = medidos
+
+    if args.guardar:
+        RESULTADOS_DIR.mkdir(exist_ok=True)
+        archivo = RESULTADOS_DIR / f"serializacion_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        archivo.write_text(json.dumps(resultados, indent=2))
+        print(f"\nResultados guardados en {archivo}")
+
+
+if __name__ == "__main__":
+    main()